@@ -1,2 +1,37 @@
+import importlib
+
 from .dynamixel_handler import *
 from .servo_group import *
+from .control_loop import *
+from .bus_poller import *
+from .multi_bus_group import *
+from .simulator import *
+from .metrics import *
+from .codec import *
+from .protocol1 import *
+from .register_cache import *
+from .trajectory import *
+from .telemetry import *
+from .scheduler import *
+from .discovery import *
+from .resilient import *
+from .bus_tuning import *
+
+# Names from modules that import asyncio or multiprocessing, only imported the first time one of them
+# is used
+_LAZY_NAMES = {
+    "AsyncServo": ".aio",
+    "AsyncServoGroup": ".aio",
+    "get_port_executor": ".aio",
+    "SharedStatePublisher": ".shared_state",
+    "SharedStateClient": ".shared_state",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
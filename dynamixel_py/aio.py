@@ -0,0 +1,115 @@
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple, Union
+
+from .dynamixel_handler import Servo
+from .servo_group import ServoGroup
+
+__all__ = ["get_port_executor", "AsyncServo", "AsyncServoGroup"]
+
+# One single threaded executor per port, so calls on the same port are serialized while calls on
+# different ports and the event loop itself keep running
+_port_executors = weakref.WeakKeyDictionary()
+_port_executors_lock = threading.Lock()
+
+
+def get_port_executor(port_handler) -> ThreadPoolExecutor:
+    with _port_executors_lock:
+        executor = _port_executors.get(port_handler)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"dxl-io-{port_handler.getPortName()}"
+            )
+            _port_executors[port_handler] = executor
+        return executor
+
+
+class _AsyncPortUser:
+    def __init__(self, port_handler, executor: ThreadPoolExecutor = None):
+        self.executor = executor if executor is not None else get_port_executor(port_handler)
+        # Reads with the same arguments that are awaited at the same time share one transaction
+        self._pending_reads: Dict[Tuple, asyncio.Future] = {}
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def _run_coalesced(self, func: Callable, *args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        future = self._pending_reads.get(key)
+
+        if future is None:
+            future = asyncio.ensure_future(self._run(func, *args, **kwargs))
+            self._pending_reads[key] = future
+            future.add_done_callback(lambda _: self._pending_reads.pop(key, None))
+
+        # Shielding so one cancelled awaiter does not cancel the read for everyone else
+        result = await asyncio.shield(future)
+        return list(result) if isinstance(result, list) else result
+
+
+class AsyncServo(_AsyncPortUser):
+    def __init__(self, servo: Servo, executor: ThreadPoolExecutor = None):
+        super().__init__(servo.port_handler, executor)
+        self.servo = servo
+
+    async def get_position(self, is_radian: bool = False) -> float:
+        return await self._run_coalesced(self.servo.get_position, is_radian=is_radian)
+
+    async def set_position(self, goal_pos, radian=False) -> None:
+        await self._run(self.servo.set_position, goal_pos, radian=radian)
+
+    async def torque_enabled(self, is_enabled: bool = False) -> None:
+        await self._run(self.servo.torque_enabled, is_enabled=is_enabled)
+
+    async def set_homing_offset(self, angle_offset: float = 0, radian: bool = False) -> None:
+        await self._run(self.servo.set_homing_offset, angle_offset, radian=radian)
+
+
+class AsyncServoGroup(_AsyncPortUser):
+    def __init__(self, group: ServoGroup, executor: ThreadPoolExecutor = None):
+        super().__init__(group._get_ref_servo().port_handler, executor)
+        self.group = group
+
+    async def sync_get_positions(self, is_radian: bool = False, fast: bool = False) -> List[float]:
+        return await self._run_coalesced(
+            self.group.sync_get_positions, is_radian=is_radian, fast=fast
+        )
+
+    async def sync_set_positions(self, goal_positions: List[float], is_radian: bool = False):
+        await self._run(self.group.sync_set_positions, list(goal_positions), is_radian=is_radian)
+
+    async def sync_torques_enabled(self, is_enabled: bool = False) -> None:
+        await self._run(self.group.sync_torques_enabled, is_enabled)
+
+    async def sync_write(self, registers: Union[str, List[str]], values: List) -> None:
+        await self._run(self.group.sync_write, registers, list(values))
+
+    async def bulk_read(
+        self, registers: Union[str, List[str]] = "PRESENT_POSITION", fast: bool = False
+    ) -> List[int]:
+        if not isinstance(registers, str):
+            registers = tuple(registers)
+        return await self._run_coalesced(self.group.bulk_read, registers, fast=fast)
+
+    async def bulk_write(self, registers: Union[str, List[str]], values: List[int]) -> None:
+        await self._run(self.group.bulk_write, registers, list(values))
+
+    async def bulk_get_positions(self, is_radian: bool = False, fast: bool = False) -> List[float]:
+        return await self._run_coalesced(
+            self.group.bulk_get_positions, is_radian=is_radian, fast=fast
+        )
+
+    async def bulk_set_positions(self, goal_positions: List[float], is_radian: bool = False):
+        await self._run(self.group.bulk_set_positions, list(goal_positions), is_radian=is_radian)
+
+    async def map_indirect_registers(self, registers: List[str]) -> None:
+        await self._run(self.group.map_indirect_registers, list(registers))
+
+    async def sync_read_indirect(self, fast: bool = False) -> List[Dict[str, int]]:
+        return await self._run_coalesced(self.group.sync_read_indirect, fast=fast)
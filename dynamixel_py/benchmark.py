@@ -0,0 +1,250 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+from importlib.metadata import PackageNotFoundError, version
+from typing import Callable, Dict, List
+
+from dynamixel_sdk import PortHandler
+
+from .dynamixel_handler import DxlComm, Servo
+from .servo_group import ServoGroup
+from .simulator import SimulatedPortHandler, SimulatedServo
+
+__all__ = [
+    "OPERATIONS",
+    "CountingPortHandler",
+    "measure",
+    "run_benchmark",
+    "format_results",
+    "main",
+]
+
+OPERATIONS = ["servo_get_position", "sync_get_positions", "sync_set_positions"]
+
+DEFAULT_CONTROL_TABLES = {1: "AX12", 2: "XL330"}
+
+
+class CountingPortHandler(PortHandler):
+    # Serial PortHandler that counts the bytes going over the wire, used when benchmarking hardware
+
+    def __init__(self, port_name):
+        super().__init__(port_name)
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.packets_written = 0
+
+    def readPort(self, length):
+        data = super().readPort(length)
+        self.bytes_read += len(data)
+        return data
+
+    def writePort(self, packet):
+        written = super().writePort(packet)
+        self.bytes_written += written
+        self.packets_written += 1
+        return written
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(operation: Callable, port_handler, cycles: int = 200, warmup: int = 10) -> Dict:
+    for _ in range(warmup):
+        operation()
+
+    start_written = port_handler.bytes_written
+    start_read = port_handler.bytes_read
+    start_packets = port_handler.packets_written
+
+    latencies = []
+    start_cpu_time = time.process_time()
+    start_time = time.perf_counter()
+    for _ in range(cycles):
+        cycle_start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - cycle_start)
+    total_time = time.perf_counter() - start_time
+    cpu_time = time.process_time() - start_cpu_time
+
+    latencies.sort()
+    return {
+        "cycles": cycles,
+        "achieved_hz": cycles / total_time,
+        "latency_p50_ms": _percentile(latencies, 50) * 1000,
+        "latency_p99_ms": _percentile(latencies, 99) * 1000,
+        "latency_max_ms": latencies[-1] * 1000,
+        "cpu_us_per_cycle": cpu_time / cycles * 1e6,
+        "tx_bytes_per_cycle": (port_handler.bytes_written - start_written) / cycles,
+        "rx_bytes_per_cycle": (port_handler.bytes_read - start_read) / cycles,
+        "packets_per_cycle": (port_handler.packets_written - start_packets) / cycles,
+    }
+
+
+def _make_operation(name: str, servos: List[Servo], group: ServoGroup) -> Callable:
+    if name == "servo_get_position":
+        return lambda: [servo.get_position() for servo in servos]
+    elif name == "sync_get_positions":
+        return group.sync_get_positions
+    elif name == "sync_set_positions":
+        goal_positions = [180.0] * len(servos)
+        return lambda: group.sync_set_positions(goal_positions)
+    raise ValueError(f"Unknown operation {name}, valid options are: {OPERATIONS}")
+
+
+def run_benchmark(
+    group_sizes: List[int] = (1, 4, 12),
+    baud_rates: List[int] = (57600, 1000000),
+    protocol_versions: List[int] = (2,),
+    operations: List[str] = OPERATIONS,
+    cycles: int = 200,
+    port: str = None,
+    servo_ids: List[int] = None,
+    control_table: str = None,
+    fast_codec: bool = False,
+) -> List[Dict]:
+    # Runs every combination against a simulated bus, or against the hardware on port when it is
+    # given. With hardware, the servos must already use the baud rates being swept and servo_ids
+    # must hold at least max(group_sizes) ids.
+    results = []
+
+    for protocol_version in protocol_versions:
+        table = control_table or DEFAULT_CONTROL_TABLES[protocol_version]
+
+        for baud_rate in baud_rates:
+            with contextlib.redirect_stdout(io.StringIO()):
+                if port is None:
+                    port_handler = SimulatedPortHandler()
+                    port_handler.add_servos(
+                        [
+                            SimulatedServo(i, table, protocol_version=protocol_version)
+                            for i in range(1, max(group_sizes) + 1)
+                        ]
+                    )
+                else:
+                    port_handler = CountingPortHandler(port)
+                comm = DxlComm(port_handler=port_handler, baud_rate=baud_rate)
+
+            ids = list(servo_ids) if servo_ids else list(range(1, max(group_sizes) + 1))
+
+            for group_size in group_sizes:
+                if group_size > len(ids):
+                    raise ValueError(f"Group size {group_size} is larger than the number of servo ids")
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    servos = [
+                        Servo(dxl_id, table, protocol_version=protocol_version, comm=comm)
+                        for dxl_id in ids[:group_size]
+                    ]
+                    group = ServoGroup()
+                    group.add_servos(servos)
+                    if fast_codec:
+                        group.enable_fast_codec()
+
+                for operation_name in operations:
+                    result = {
+                        "operation": operation_name,
+                        "group_size": group_size,
+                        "baud_rate": baud_rate,
+                        "protocol_version": protocol_version,
+                        "control_table": table,
+                        "simulated": port is None,
+                        "fast_codec": fast_codec,
+                    }
+                    operation = _make_operation(operation_name, servos, group)
+                    try:
+                        result.update(measure(operation, port_handler, cycles=cycles))
+                    except (RuntimeError, ValueError) as e:
+                        result["error"] = str(e).strip()
+                    results.append(result)
+
+            port_handler.closePort()
+
+    return results
+
+
+def format_results(results: List[Dict]) -> str:
+    header = (
+        f"{'operation':<20} {'proto':>5} {'baud':>8} {'servos':>6} {'hz':>9} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'cpu us':>8} {'tx B':>7} {'rx B':>7}"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        prefix = (
+            f"{result['operation']:<20} {result['protocol_version']:>5} {result['baud_rate']:>8} "
+            f"{result['group_size']:>6} "
+        )
+        if "error" in result:
+            lines.append(prefix + f"error: {result['error'].splitlines()[0]}")
+        else:
+            lines.append(
+                prefix
+                + f"{result['achieved_hz']:>9.1f} {result['latency_p50_ms']:>8.3f} "
+                f"{result['latency_p99_ms']:>8.3f} {result['cpu_us_per_cycle']:>8.1f} "
+                f"{result['tx_bytes_per_cycle']:>7.1f} "
+                f"{result['rx_bytes_per_cycle']:>7.1f}"
+            )
+    return "\n".join(lines)
+
+
+def _package_version() -> str:
+    try:
+        return version("dynamixel_py")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure single servo and group read/write throughput of dynamixel_py"
+    )
+    parser.add_argument("--port", help="Serial port of real hardware, a simulated bus is used if omitted")
+    parser.add_argument("--ids", type=int, nargs="+", help="Servo ids to use with real hardware")
+    parser.add_argument("--control-table", help="Control table of the servos, eg: XL330")
+    parser.add_argument("--group-sizes", type=int, nargs="+", default=[1, 4, 12])
+    parser.add_argument("--baud-rates", type=int, nargs="+", default=[57600, 1000000])
+    parser.add_argument("--protocols", type=int, nargs="+", default=[2], choices=[1, 2])
+    parser.add_argument("--operations", nargs="+", default=OPERATIONS, choices=OPERATIONS)
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument(
+        "--fast-codec", action="store_true", help="Use FastPacketHandler instead of the SDK's packet handler"
+    )
+    parser.add_argument("--output", help="Writes the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(
+        group_sizes=args.group_sizes,
+        baud_rates=args.baud_rates,
+        protocol_versions=args.protocols,
+        operations=args.operations,
+        cycles=args.cycles,
+        port=args.port,
+        servo_ids=args.ids,
+        control_table=args.control_table,
+        fast_codec=args.fast_codec,
+    )
+
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "dynamixel_py_version": _package_version(),
+                    "python_version": platform.python_version(),
+                    "platform": platform.platform(),
+                    "timestamp": time.time(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import queue
+import time
+from concurrent.futures import Future
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from .control_loop import ControlLoop
+from .servo_group import ServoGroup
+
+__all__ = ["GroupState", "BusPoller"]
+
+
+class GroupState(NamedTuple):
+    positions: Tuple[float, ...]
+    timestamp: float
+    sequence: int
+
+
+class BusPoller:
+    # Owns the port of a ServoGroup from a background thread. The group is sync read at a fixed rate
+    # and the newest positions are published through two alternating buffers, so any thread can get
+    # the current state without waiting on the serial port. Writes are handed over to the same thread
+    # so the port is never used concurrently.
+
+    def __init__(
+        self,
+        group: ServoGroup,
+        rate_hz: float,
+        is_radian: bool = False,
+        fast: bool = False,
+        busy_wait: float = 0.0,
+    ):
+        self.group = group
+        self.is_radian = is_radian
+        self.fast = fast
+
+        # Each buffer holds [sequence, timestamp, positions]. The poller only ever writes the back
+        # buffer and then flips _front, readers retry if the sequence moved while they were copying.
+        total_servos = group.get_total_servos()
+        self._buffers = [[0, 0.0, [0.0] * total_servos], [0, 0.0, [0.0] * total_servos]]
+        self._front = 0
+        self._sequence = 0
+
+        self._goal_positions: Optional[List[float]] = None
+        self._requests = queue.SimpleQueue()
+
+        self.errors = 0
+        self.last_error: Optional[Exception] = None
+
+        self.loop = ControlLoop(self._poll, rate_hz=rate_hz, busy_wait=busy_wait)
+
+    def _publish(self, positions: List[float], timestamp: float) -> None:
+        back = 1 - self._front
+        buffer = self._buffers[back]
+        self._sequence += 1
+
+        buffer[0] = 0  # Marks the buffer as being written
+        buffer[1] = timestamp
+        buffer[2][:] = positions
+        buffer[0] = self._sequence
+
+        self._front = back
+
+    def _poll(self, _) -> None:
+        try:
+            while True:
+                func, args, kwargs, future = self._requests.get_nowait()
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args, **kwargs))
+                    except Exception as e:
+                        future.set_exception(e)
+        except queue.Empty:
+            pass
+
+        try:
+            goal_positions, self._goal_positions = self._goal_positions, None
+            if goal_positions is not None:
+                self.group.sync_set_positions(goal_positions, is_radian=self.is_radian)
+
+            positions = self.group.sync_get_positions(is_radian=self.is_radian, fast=self.fast)
+        except Exception as e:
+            # Any error ending this call would end the polling thread and freeze the state
+            self.errors += 1
+            self.last_error = e
+            return
+
+        self._publish(positions, time.time())
+
+    def get_state(self) -> Optional[GroupState]:
+        while True:
+            buffer = self._buffers[self._front]
+            sequence = buffer[0]
+            if sequence == 0:
+                if self._sequence == 0:
+                    return None  # Nothing was published yet
+                continue
+
+            timestamp = buffer[1]
+            positions = tuple(buffer[2])
+
+            if buffer[0] == sequence:
+                return GroupState(positions, timestamp, sequence)
+
+    def get_positions(self) -> Optional[Tuple[float, ...]]:
+        state = self.get_state()
+        return None if state is None else state.positions
+
+    def set_positions(self, goal_positions: List[float]) -> None:
+        # Only the newest goal is kept, it is sent at the start of the next poll. Goals are checked
+        # here, so a bad one raises in the caller instead of failing on the polling thread.
+        self.group.check_goal_positions(goal_positions, is_radian=self.is_radian)
+        self._goal_positions = list(goal_positions)
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        # Runs any call that needs the port, eg: group.sync_torques_enabled, on the polling thread
+        future = Future()
+        self._requests.put((func, args, kwargs, future))
+        return future
+
+    def start(self) -> None:
+        self.loop.start()
+
+    def stop(self, timeout: float = None) -> None:
+        self.loop.stop(timeout)
+
+        try:
+            while True:
+                _, _, _, future = self._requests.get_nowait()
+                future.cancel()
+        except queue.Empty:
+            pass
+
+    def is_running(self) -> bool:
+        return self.loop.is_running()
+
+    def get_stats(self):
+        stats = self.loop.get_stats()
+        stats["errors"] += self.errors
+        return stats
@@ -0,0 +1,237 @@
+import os
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+from .discovery import (
+    DEFAULT_CACHE_PATH,
+    BusFingerprint,
+    _ping_servos,
+    build_group,
+    load_fingerprint,
+    save_fingerprint,
+)
+from .dynamixel_handler import DEFAULT_PROTOCOL_VERSION, DxlComm
+from .servo_group import ServoGroup
+
+__all__ = [
+    "TuningReport",
+    "get_latency_timer_path",
+    "read_latency_timer",
+    "set_latency_timer",
+    "measure_read_rate",
+    "tune_bus",
+]
+
+# Linux exposes the latency timer of FTDI based adapters (U2D2, USB2Dynamixel) in milliseconds here
+LATENCY_TIMER_PATH = "/sys/bus/usb-serial/devices/{}/latency_timer"
+
+
+class TuningReport(NamedTuple):
+    port: str
+    servo_ids: List[int]
+    baud_rate_before: int
+    baud_rate_after: int
+    # None if the port has no latency timer in sysfs, eg: not a USB serial adapter
+    latency_timer_before: Optional[int]
+    latency_timer_after: Optional[int]
+    # sync_get_positions calls per second
+    read_rate_before: float
+    read_rate_after: float
+
+    def get_speedup(self) -> float:
+        return self.read_rate_after / self.read_rate_before
+
+
+def get_latency_timer_path(port: str) -> Optional[str]:
+    # Symlinks like /dev/serial/by-id/... are resolved to the ttyUSB device first
+    if not port:
+        return None
+    path = LATENCY_TIMER_PATH.format(os.path.basename(os.path.realpath(port)))
+    return path if os.path.exists(path) else None
+
+
+def read_latency_timer(port: str) -> Optional[int]:
+    path = get_latency_timer_path(port)
+    if path is None:
+        return None
+    with open(path) as f:
+        return int(f.read())
+
+
+def set_latency_timer(port: str, latency_ms: int = 1) -> Optional[int]:
+    # Returns the latency timer after the write, which is unchanged without write access to sysfs
+    path = get_latency_timer_path(port)
+    if path is None:
+        return None
+    try:
+        with open(path, "w") as f:
+            f.write(str(latency_ms))
+    except PermissionError:
+        print(
+            f"No permission to write {path}, set it with: echo {latency_ms} | sudo tee {path} "
+            f"or a udev rule"
+        )
+    return read_latency_timer(port)
+
+
+def measure_read_rate(group: ServoGroup, cycles: int = 100) -> float:
+    start_time = time.perf_counter()
+    for _ in range(cycles):
+        group.sync_get_positions()
+    return cycles / (time.perf_counter() - start_time)
+
+
+def _is_reliable(group: ServoGroup, cycles: int) -> bool:
+    # True if every servo answered cycles reads in a row
+    try:
+        for _ in range(cycles):
+            group.sync_get_positions()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _switch_baud_rate(comm: DxlComm, group: ServoGroup, baud_rate: int) -> None:
+    # The servos switch as soon as they got the write, which has no status packet, and the port
+    # follows. writePort may return before the packet left the adapter, changing the baud rate
+    # right away would cut it off.
+    group.sync_write(
+        "BAUD_RATE",
+        [servo.control_table.BAUD_RATES[baud_rate] for servo in group.servos.values()],
+    )
+    time.sleep(0.05)
+    comm.baud_rate = baud_rate
+    comm.set_comm_baud_rate()
+
+
+def _get_baud_rate_candidates(
+    comm: DxlComm, group: ServoGroup, max_baud_rate: Optional[int]
+) -> List[int]:
+    # Baud rates above the current one that every servo and the port support, lowest first
+    supported = set.intersection(
+        *(set(servo.control_table.BAUD_RATES) for servo in group.servos.values())
+    )
+    return sorted(
+        baud_rate
+        for baud_rate in supported
+        if baud_rate > comm.baud_rate
+        and comm.port_handler.getCFlagBaud(baud_rate) > 0
+        and (max_baud_rate is None or baud_rate <= max_baud_rate)
+    )
+
+
+def _migrate_baud_rate(
+    comm: DxlComm,
+    group: ServoGroup,
+    max_baud_rate: Optional[int],
+    verify_reads: int,
+    revert_attempts: int,
+) -> int:
+    # Steps the bus up one baud rate at a time and stops below the first one that is not reliable.
+    # Going back has to be written at the failing baud rate, which is the most likely to still reach
+    # the servos when it is only one step above a working one.
+    working_baud_rate = comm.baud_rate
+    for baud_rate in _get_baud_rate_candidates(comm, group, max_baud_rate):
+        _switch_baud_rate(comm, group, baud_rate)
+        if _is_reliable(group, verify_reads):
+            print(f"Servos {list(group.servos)} answer reliably at baud rate {baud_rate}")
+            working_baud_rate = baud_rate
+            continue
+
+        print(f"Communication at baud rate {baud_rate} is not reliable, going back to {working_baud_rate}")
+        for _ in range(revert_attempts):
+            # Servos that already went back do not hear the write again
+            comm.baud_rate = baud_rate
+            comm.set_comm_baud_rate()
+            _switch_baud_rate(comm, group, working_baud_rate)
+            if _is_reliable(group, verify_reads):
+                break
+        else:
+            raise RuntimeError(
+                f"Failed to bring servos {list(group.servos)} on port {comm.port} back from baud rate "
+                f"{baud_rate} to {working_baud_rate}, they can be found again with scan_bus"
+            )
+        break
+
+    return working_baud_rate
+
+
+def tune_bus(
+    comm: DxlComm,
+    protocol_version: int = DEFAULT_PROTOCOL_VERSION,
+    servo_ids: Sequence[int] = range(253),
+    max_baud_rate: int = None,
+    return_delay_time: int = 0,
+    latency_timer: Optional[int] = 1,
+    verify_reads: int = 100,
+    measure_cycles: int = 100,
+    revert_attempts: int = 3,
+    cache_path: str = DEFAULT_CACHE_PATH,
+) -> TuningReport:
+    # Makes the bus as fast as the servos, the adapter and the wiring allow:
+    # - every servo found on the port is moved to the highest baud rate they all support and answer
+    #   verify_reads reads in a row at, up to max_baud_rate, and the port is reopened at it
+    # - Return Delay Time is written to return_delay_time (2 us per unit, 250 by default)
+    # - the adapter's latency timer (16 ms by default on Linux) is set to latency_timer ms, None
+    #   leaves it as it is
+    # Baud rate and Return Delay Time are EEPROM registers, so torque must be disabled on every servo.
+    # The servos keep both settings, afterwards the port has to be opened at the new baud rate, which
+    # is also written to the open_bus cache if the port has an entry there.
+    servos = _ping_servos(comm, protocol_version, set(servo_ids))
+    if not servos:
+        raise RuntimeError(
+            f"No servos found on port {comm.port} with Protocol {protocol_version}.0 at baud rate "
+            f"{comm.baud_rate}"
+        )
+    fingerprint = BusFingerprint(comm.port, comm.baud_rate, protocol_version, servos)
+    group = build_group(comm, fingerprint)
+
+    torque_enabled = [
+        dxl_id for dxl_id, value in zip(group.servos, group.bulk_read("TORQUE_ENABLE")) if value
+    ]
+    if torque_enabled:
+        raise RuntimeError(
+            f"Disable the torque of servos {torque_enabled} before tuning the bus, Baud Rate and "
+            f"Return Delay Time can only be written with torque disabled"
+        )
+
+    baud_rate_before = comm.baud_rate
+    latency_timer_before = read_latency_timer(comm.port)
+    read_rate_before = measure_read_rate(group, measure_cycles)
+
+    if latency_timer is not None and latency_timer_before not in (None, latency_timer):
+        set_latency_timer(comm.port, latency_timer)
+
+    # Written while the bus still runs at a baud rate known to work
+    group.sync_write("RETURN_DELAY_TIME", [return_delay_time] * group.total_servos)
+    if any(value != return_delay_time for value in group.bulk_read("RETURN_DELAY_TIME")):
+        raise RuntimeError(f"Failed to set the Return Delay Time of servos {list(group.servos)}")
+
+    baud_rate_after = _migrate_baud_rate(comm, group, max_baud_rate, verify_reads, revert_attempts)
+
+    if not _is_reliable(group, verify_reads):
+        raise RuntimeError(
+            f"Servos {list(group.servos)} on port {comm.port} do not answer reliably after tuning"
+        )
+
+    if baud_rate_after != baud_rate_before:
+        cached = load_fingerprint(comm.port, protocol_version, cache_path)
+        if cached is not None:
+            save_fingerprint(cached._replace(baud_rate=baud_rate_after), cache_path)
+
+    report = TuningReport(
+        comm.port,
+        list(group.servos),
+        baud_rate_before,
+        baud_rate_after,
+        latency_timer_before,
+        read_latency_timer(comm.port),
+        read_rate_before,
+        measure_read_rate(group, measure_cycles),
+    )
+    print(
+        f"Tuned port {comm.port}: baud rate {report.baud_rate_before} -> {report.baud_rate_after}, "
+        f"latency timer {report.latency_timer_before} -> {report.latency_timer_after} ms, "
+        f"sync_get_positions {report.read_rate_before:.1f} -> {report.read_rate_after:.1f} Hz"
+    )
+    return report
@@ -0,0 +1,294 @@
+import struct
+
+from dynamixel_sdk.protocol1_packet_handler import Protocol1PacketHandler
+from dynamixel_sdk.protocol2_packet_handler import (
+    RXPACKET_MAX_LEN,
+    TXPACKET_MAX_LEN,
+    Protocol2PacketHandler,
+)
+from dynamixel_sdk.robotis_def import (
+    BROADCAST_ID,
+    COMM_NOT_AVAILABLE,
+    COMM_PORT_BUSY,
+    COMM_RX_CORRUPT,
+    COMM_RX_TIMEOUT,
+    COMM_SUCCESS,
+    COMM_TX_ERROR,
+    COMM_TX_FAIL,
+    INST_BULK_READ,
+    INST_BULK_WRITE,
+    INST_FAST_BULK_READ,
+    INST_FAST_SYNC_READ,
+    INST_READ,
+    INST_STATUS,
+    INST_SYNC_READ,
+    INST_SYNC_WRITE,
+    INST_WRITE,
+    MAX_ID,
+)
+
+__all__ = ["crc16", "checksum", "FastProtocol2PacketHandler", "FastPacketHandler"]
+
+# CRC-16 (polynomial 0x8005) of every byte value, the same table the SDK uses
+_CRC_TABLE = []
+for _byte in range(256):
+    _crc = _byte << 8
+    for _ in range(8):
+        _crc = ((_crc << 1) ^ 0x8005) if _crc & 0x8000 else (_crc << 1)
+    _CRC_TABLE.append(_crc & 0xFFFF)
+
+# Protocol 2.0 packets start with FF FF FD 00, followed by id, length and instruction
+_HEADER = struct.Struct("<4sBHB")
+_HEADER_PREFIX = b"\xff\xff\xfd\x00"
+_ADDRESS = struct.Struct("<HH")  # start address, data length
+_CRC = struct.Struct("<H")
+_STUFFING = b"\xff\xff\xfd"
+_STUFFED = b"\xff\xff\xfd\xfd"
+
+
+def crc16(data, crc_accum: int = 0) -> int:
+    table = _CRC_TABLE
+    for byte in data:
+        crc_accum = ((crc_accum << 8) ^ table[((crc_accum >> 8) ^ byte) & 0xFF]) & 0xFFFF
+    return crc_accum
+
+
+def checksum(data) -> int:
+    return ~sum(data) & 0xFF
+
+
+class FastProtocol2PacketHandler(Protocol2PacketHandler):
+    # Protocol 2.0 packet handler building the packets used by Servo and ServoGroup (read, write,
+    # sync/bulk read and write) with struct into one preallocated buffer, and parsing status packets
+    # from one reusable buffer instead of lists of ints. Everything else is inherited from the SDK,
+    # which also gets the faster CRC. Like the port it talks to, a handler must not be used from two
+    # threads at once.
+    #
+    # The packets are the bytes the SDK sends, except for parameters containing FF FF FD. The codec
+    # byte stuffs them as the protocol requires, while the SDK's addStuffing builds the stuffed packet
+    # in a list txPacket never gets back, so the SDK sends them unstuffed.
+
+    def __init__(self):
+        self._tx_buffer = bytearray(TXPACKET_MAX_LEN + 2)
+        self._tx_view = memoryview(self._tx_buffer)
+        self._rx_buffer = bytearray(RXPACKET_MAX_LEN + 8)
+        self._rx_view = memoryview(self._rx_buffer)
+
+    def updateCRC(self, crc_accum, data_blk_ptr, data_blk_size):
+        return crc16(data_blk_ptr[:data_blk_size], crc_accum)
+
+    def _begin(self, dxl_id: int, length: int, instruction: int) -> bytearray:
+        # The tx buffer with the header written, or None if the packet would be too long
+        if length + 7 > TXPACKET_MAX_LEN:
+            return None
+        _HEADER.pack_into(self._tx_buffer, 0, _HEADER_PREFIX, dxl_id, length, instruction)
+        return self._tx_buffer
+
+    def _send(self, port, size: int) -> int:
+        # Sends the first size bytes of the tx buffer, which hold the packet up to the CRC
+        if port.is_using:
+            return COMM_PORT_BUSY
+        port.is_using = True
+
+        packet = self._tx_view
+        if self._tx_buffer.find(_STUFFING, 7, size) != -1:
+            # Byte stuffing only ever happens with parameters looking like a header
+            body = self._tx_buffer[7:size].replace(_STUFFING, _STUFFED)
+            if len(body) + 9 > TXPACKET_MAX_LEN:
+                port.is_using = False
+                return COMM_TX_ERROR
+            stuffed = bytearray(self._tx_buffer[:7])
+            stuffed += body
+            stuffed[5:7] = _CRC.pack(len(body) + 2)
+            stuffed += b"\0\0"
+            packet = memoryview(stuffed)
+            size = len(stuffed) - 2
+
+        _CRC.pack_into(packet, size, crc16(packet[:size]))
+
+        port.clearPort()
+        if port.writePort(packet[: size + 2]) != size + 2:
+            port.is_using = False
+            return COMM_TX_FAIL
+        return COMM_SUCCESS
+
+    def _send_and_receive(self, port, dxl_id: int, size: int, wait_length: int):
+        result = self._send(port, size)
+        if result != COMM_SUCCESS:
+            return None, result, 0
+
+        if dxl_id == BROADCAST_ID:
+            port.is_using = False
+            return None, result, 0
+
+        port.setPacketTimeout(wait_length)
+        while True:
+            rxpacket, result = self.rxPacket(port, False)
+            if result != COMM_SUCCESS or rxpacket[4] == dxl_id:
+                break
+
+        error = rxpacket[8] if result == COMM_SUCCESS else 0
+        return rxpacket, result, error
+
+    def rxPacket(self, port, fast_option):
+        max_id = BROADCAST_ID if fast_option else MAX_ID
+        buffer = self._rx_buffer
+        view = self._rx_view
+
+        result = COMM_TX_FAIL
+        rx_length = 0
+        wait_length = 11  # header, reserved, id, length, instruction, error and CRC
+
+        while True:
+            data = port.readPort(wait_length - rx_length)
+            buffer[rx_length : rx_length + len(data)] = data
+            rx_length += len(data)
+
+            if rx_length >= wait_length:
+                idx = self._find_header(rx_length)
+
+                if idx == 0:
+                    packet_length = buffer[5] | buffer[6] << 8
+                    if (
+                        buffer[3] != 0x00
+                        or buffer[4] > max_id
+                        or packet_length > RXPACKET_MAX_LEN
+                        or buffer[7] != INST_STATUS
+                    ):
+                        view[: rx_length - 1] = view[1:rx_length]
+                        rx_length -= 1
+                        continue
+
+                    if wait_length != packet_length + 7:
+                        wait_length = packet_length + 7
+                        continue
+
+                    if rx_length < wait_length:
+                        if port.isPacketTimeout():
+                            result = COMM_RX_CORRUPT
+                            break
+                        continue
+
+                    crc = buffer[wait_length - 2] | buffer[wait_length - 1] << 8
+                    result = COMM_SUCCESS if crc16(view[: wait_length - 2]) == crc else COMM_RX_CORRUPT
+                    break
+
+                else:
+                    view[: rx_length - idx] = view[idx:rx_length]
+                    rx_length -= idx
+
+            elif port.isPacketTimeout():
+                result = COMM_RX_TIMEOUT if rx_length == 0 else COMM_RX_CORRUPT
+                break
+
+        port.is_using = False
+
+        if result == COMM_SUCCESS and not fast_option and buffer.find(_STUFFED, 8, wait_length - 2) != -1:
+            body = buffer[7 : wait_length - 2].replace(_STUFFED, _STUFFING)
+            packet = bytearray(buffer[:7]) + body + buffer[wait_length - 2 : rx_length]
+            packet[5:7] = _CRC.pack(len(body) + 2)
+            return bytes(packet), result
+
+        return bytes(view[:rx_length]), result
+
+    def _find_header(self, rx_length: int) -> int:
+        # Index of the first FF FF FD not followed by a stuffed FD, or of the bytes that could still
+        # become one once more bytes arrive
+        buffer = self._rx_buffer
+        idx = buffer.find(_STUFFING, 0, rx_length)
+        while idx != -1 and idx + 3 < rx_length and buffer[idx + 3] == 0xFD:
+            idx = buffer.find(_STUFFING, idx + 1, rx_length)
+        return idx if idx != -1 else max(rx_length - 2, 0)
+
+    def readTxRx(self, port, dxl_id, address, length):
+        if dxl_id >= BROADCAST_ID:
+            return [], COMM_NOT_AVAILABLE, 0
+
+        buffer = self._begin(dxl_id, 7, INST_READ)
+        _ADDRESS.pack_into(buffer, 8, address, length)
+
+        rxpacket, result, error = self._send_and_receive(port, dxl_id, 12, length + 11)
+        if result != COMM_SUCCESS:
+            return [], result, error
+        return rxpacket[9 : 9 + length], result, error
+
+    def writeTxRx(self, port, dxl_id, address, length, data):
+        buffer = self._begin(dxl_id, length + 5, INST_WRITE)
+        if buffer is None:
+            return COMM_TX_ERROR
+        _CRC.pack_into(buffer, 8, address)
+        buffer[10 : 10 + length] = bytes(data[:length])
+
+        _, result, error = self._send_and_receive(port, dxl_id, length + 10, 11)
+        return result, error
+
+    def writeTxOnly(self, port, dxl_id, address, length, data):
+        buffer = self._begin(dxl_id, length + 5, INST_WRITE)
+        if buffer is None:
+            return COMM_TX_ERROR
+        _CRC.pack_into(buffer, 8, address)
+        buffer[10 : 10 + length] = bytes(data[:length])
+
+        result = self._send(port, length + 10)
+        port.is_using = False
+        return result
+
+    def syncReadTx(self, port, start_address, data_length, param, param_length, fast_option):
+        instruction = INST_FAST_SYNC_READ if fast_option else INST_SYNC_READ
+        buffer = self._begin(BROADCAST_ID, param_length + 7, instruction)
+        if buffer is None:
+            return COMM_TX_ERROR
+        _ADDRESS.pack_into(buffer, 8, start_address, data_length)
+        buffer[12 : 12 + param_length] = bytes(param[:param_length])
+
+        result = self._send(port, param_length + 12)
+        if result == COMM_SUCCESS:
+            port.setPacketTimeout((11 + data_length) * param_length)
+        return result
+
+    def syncWriteTxOnly(self, port, start_address, data_length, param, param_length):
+        buffer = self._begin(BROADCAST_ID, param_length + 7, INST_SYNC_WRITE)
+        if buffer is None:
+            return COMM_TX_ERROR
+        _ADDRESS.pack_into(buffer, 8, start_address, data_length)
+        buffer[12 : 12 + param_length] = bytes(param[:param_length])
+
+        result = self._send(port, param_length + 12)
+        port.is_using = False
+        return result
+
+    def bulkReadTx(self, port, param, param_length, fast_option):
+        instruction = INST_FAST_BULK_READ if fast_option else INST_BULK_READ
+        buffer = self._begin(BROADCAST_ID, param_length + 3, instruction)
+        if buffer is None:
+            return COMM_TX_ERROR
+        buffer[8 : 8 + param_length] = bytes(param[:param_length])
+
+        result = self._send(port, param_length + 8)
+        if result == COMM_SUCCESS:
+            # Bulk read parameters are [id, address, length] per servo
+            wait_length = sum(
+                (param[i + 3] | param[i + 4] << 8) + 10 for i in range(0, param_length, 5)
+            )
+            port.setPacketTimeout(wait_length)
+        return result
+
+    def bulkWriteTxOnly(self, port, param, param_length):
+        buffer = self._begin(BROADCAST_ID, param_length + 3, INST_BULK_WRITE)
+        if buffer is None:
+            return COMM_TX_ERROR
+        buffer[8 : 8 + param_length] = bytes(param[:param_length])
+
+        result = self._send(port, param_length + 8)
+        port.is_using = False
+        return result
+
+
+def FastPacketHandler(protocol_version):
+    # Drop-in replacement for dynamixel_sdk.PacketHandler
+    if protocol_version == 1.0:
+        # Protocol 1.0 packets are a few bytes with a plain checksum, the SDK's handler is as fast there
+        return Protocol1PacketHandler()
+    elif protocol_version == 2.0:
+        return FastProtocol2PacketHandler()
+    raise ValueError(f"Unsupported protocol version: {protocol_version}")
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+from statistics import pstdev
+from typing import Callable, Dict, List, Optional
+
+from .servo_group import ServoGroup
+
+__all__ = ["ControlLoop"]
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class ControlLoop:
+    # Runs callback at a fixed rate using absolute deadlines, so a slow cycle does not push every
+    # following cycle back. When a group is given, every cycle sync reads the positions, passes them
+    # to callback and sync writes the goal positions it returns (if any). Without a group, callback
+    # is called with None. A cycle that raises is counted in the "errors" stat and kept in
+    # last_error, the loop carries on with the next cycle.
+
+    def __init__(
+        self,
+        callback: Callable[[Optional[List[float]]], Optional[List[float]]],
+        rate_hz: float,
+        group: ServoGroup = None,
+        is_radian: bool = False,
+        busy_wait: float = 0.0,
+        history_size: int = 1000,
+    ):
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be greater than 0")
+        if busy_wait < 0:
+            raise ValueError("busy_wait must not be negative")
+
+        self.callback = callback
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.group = group
+        self.is_radian = is_radian
+        # Seconds before every deadline that are spent spinning instead of sleeping
+        self.busy_wait = busy_wait
+
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=history_size)
+        self._wake_errors = deque(maxlen=history_size)
+        self._cycles = 0
+        self._overruns = 0
+        self._missed_cycles = 0
+        # Cycles that raised, the loop keeps running after an error
+        self._errors = 0
+        self.last_error: Optional[Exception] = None
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _wait_until(self, deadline: float) -> None:
+        sleep_time = deadline - time.perf_counter() - self.busy_wait
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+        while time.perf_counter() < deadline:
+            pass
+
+    def _run_cycle(self) -> None:
+        if self.group is not None:
+            positions = self.group.sync_get_positions(is_radian=self.is_radian)
+            goal_positions = self.callback(positions)
+            if goal_positions is not None:
+                self.group.sync_set_positions(goal_positions, is_radian=self.is_radian)
+        else:
+            self.callback(None)
+
+    def reset(self) -> None:
+        # Forgets earlier calls to stop, so they do not end the next run
+        self._stop_event.clear()
+
+    def run(self, duration: float = None, cycles: int = None, reset: bool = True) -> None:
+        # Blocks until duration or cycles is reached, or until stop is called. With reset=False, a stop
+        # since the last reset ends the run right away, eg: stopping a thread that was just started.
+        if reset:
+            self.reset()
+
+        start_time = time.perf_counter()
+        deadline = start_time
+        cycle_count = 0
+
+        while not self._stop_event.is_set():
+            if cycles is not None and cycle_count >= cycles:
+                break
+            if duration is not None and deadline - start_time >= duration:
+                break
+
+            self._wait_until(deadline)
+            wake_time = time.perf_counter()
+            cycle_deadline = deadline
+
+            try:
+                self._run_cycle()
+                error = None
+            except Exception as e:
+                # Raising here would end the loop thread with nothing but its stats going stale
+                error = e
+                if self.last_error is None:
+                    print(f"Control loop cycle failed with {e!r}, see get_stats and last_error")
+                self.last_error = e
+            end_time = time.perf_counter()
+            cycle_count += 1
+
+            deadline += self.period
+            overrun = end_time > deadline
+            if overrun:
+                # Skipping the deadlines that already passed instead of running catch-up cycles
+                missed = int((end_time - deadline) / self.period)
+                deadline += missed * self.period
+
+            with self._stats_lock:
+                self._cycles += 1
+                self._latencies.append(end_time - wake_time)
+                self._wake_errors.append(wake_time - cycle_deadline)
+                if overrun:
+                    self._overruns += 1
+                    self._missed_cycles += missed
+                if error is not None:
+                    self._errors += 1
+
+    def start(self, duration: float = None, cycles: int = None) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("Control loop is already running")
+
+        # Reset before the thread exists, so a stop right after start is kept
+        self.reset()
+        self._thread = threading.Thread(
+            target=self.run,
+            kwargs={"duration": duration, "cycles": cycles, "reset": False},
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        self._stop_event.set()
+        # From the callback, the loop exits after the current cycle and cannot wait for itself
+        if self._thread is not None and threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._latencies.clear()
+            self._wake_errors.clear()
+            self._cycles = 0
+            self._overruns = 0
+            self._missed_cycles = 0
+            self._errors = 0
+            self.last_error = None
+
+    def get_stats(self) -> Dict[str, float]:
+        # Latencies are the time spent in a cycle (I/O and callback), jitter is how late each
+        # cycle woke up relative to its deadline. All times are in seconds.
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            wake_errors = list(self._wake_errors)
+            cycles = self._cycles
+            overruns = self._overruns
+            missed_cycles = self._missed_cycles
+            errors = self._errors
+
+        return {
+            "rate_hz": self.rate_hz,
+            "cycles": cycles,
+            "overruns": overruns,
+            "missed_cycles": missed_cycles,
+            "errors": errors,
+            "latency_p50": _percentile(latencies, 50),
+            "latency_p90": _percentile(latencies, 90),
+            "latency_p99": _percentile(latencies, 99),
+            "latency_max": latencies[-1] if latencies else 0.0,
+            "jitter_std": pstdev(wake_errors) if len(wake_errors) > 1 else 0.0,
+            "jitter_max": max(wake_errors, default=0.0),
+        }
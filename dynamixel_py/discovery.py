@@ -0,0 +1,244 @@
+import json
+import os
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+from dynamixel_sdk import GroupSyncRead
+from dynamixel_sdk.robotis_def import COMM_SUCCESS
+
+from .dynamixel_control_tables import control_tables, find_control_table
+from .dynamixel_handler import DEFAULT_PROTOCOL_VERSION, DxlComm, Servo
+from .servo_group import ServoGroup
+
+__all__ = [
+    "BusFingerprint",
+    "load_fingerprint",
+    "save_fingerprint",
+    "scan_bus",
+    "validate_fingerprint",
+    "build_group",
+    "open_bus",
+]
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "dynamixel_py", "buses.json")
+# Baud rates tried by scan_bus, most common first
+DEFAULT_BAUD_RATES = (57600, 1000000, 115200, 2000000, 3000000, 4000000, 9600)
+
+
+class BusFingerprint(NamedTuple):
+    port: str
+    baud_rate: int
+    protocol_version: int
+    # id -> (model number, firmware version)
+    servos: Dict[int, Tuple[int, int]]
+
+    def get_control_tables(self) -> Dict[int, str]:
+        return {
+            dxl_id: find_control_table(model_number, self.protocol_version)
+            for dxl_id, (model_number, _) in self.servos.items()
+        }
+
+
+def _cache_key(port: str, protocol_version: int) -> str:
+    return f"{port}@{protocol_version}"
+
+
+def load_fingerprint(
+    port: str, protocol_version: int = DEFAULT_PROTOCOL_VERSION, cache_path: str = DEFAULT_CACHE_PATH
+) -> Optional[BusFingerprint]:
+    try:
+        with open(cache_path) as f:
+            entry = json.load(f).get(_cache_key(port, protocol_version))
+    except (OSError, ValueError):
+        return None
+    if entry is None:
+        return None
+
+    return BusFingerprint(
+        port,
+        entry["baud_rate"],
+        protocol_version,
+        {int(dxl_id): tuple(servo) for dxl_id, servo in entry["servos"].items()},
+    )
+
+
+def save_fingerprint(fingerprint: BusFingerprint, cache_path: str = DEFAULT_CACHE_PATH) -> None:
+    # One file holds the fingerprints of every port, other ports are kept as they are
+    try:
+        with open(cache_path) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {}
+
+    entries[_cache_key(fingerprint.port, fingerprint.protocol_version)] = {
+        "baud_rate": fingerprint.baud_rate,
+        "servos": {str(dxl_id): list(servo) for dxl_id, servo in sorted(fingerprint.servos.items())},
+    }
+
+    # Written next to the cache and renamed over it, so a crash never leaves half a file behind
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+def _ping_servos(
+    comm: DxlComm, protocol_version: int, servo_ids: Sequence[int]
+) -> Dict[int, Tuple[int, int]]:
+    packet_handler = comm.get_packet_handler(protocol_version)
+
+    if protocol_version == 2:
+        # One broadcast ping, answered with [model number, firmware version] by every servo
+        dxl_data, _ = packet_handler.broadcastPing(comm.port_handler)
+        return {
+            dxl_id: (model_number, firmware_version)
+            for dxl_id, (model_number, firmware_version) in dxl_data.items()
+            if dxl_id in servo_ids
+        }
+
+    # Protocol 1.0 has no broadcast ping, every id is pinged and the firmware version read separately
+    found = {}
+    unknown = {}
+    for dxl_id in servo_ids:
+        model_number, comm_result, _ = packet_handler.ping(comm.port_handler, dxl_id)
+        if comm_result != COMM_SUCCESS:
+            continue
+
+        try:
+            control_table = find_control_table(model_number, protocol_version)
+        except ValueError:
+            unknown[dxl_id] = model_number
+            continue
+
+        reg = control_tables[protocol_version][control_table].get_register("FIRMWARE_VERSION")
+        data, comm_result, _ = packet_handler.readTxRx(comm.port_handler, dxl_id, reg.address, reg.size)
+        found[dxl_id] = (model_number, reg.decode(data) if comm_result == COMM_SUCCESS else 0)
+
+    if unknown:
+        raise ValueError(
+            f"No control table for the model numbers of servos {unknown} (id: model number) in protocol "
+            f"version {protocol_version}"
+        )
+    return found
+
+
+def scan_bus(
+    comm: DxlComm,
+    protocol_version: int = DEFAULT_PROTOCOL_VERSION,
+    baud_rates: Sequence[int] = DEFAULT_BAUD_RATES,
+    servo_ids: Sequence[int] = range(253),
+) -> BusFingerprint:
+    # Tries the baud rates in order and stops at the first one any servo answers at, the port is
+    # left at that baud rate. With Protocol 1.0 every id is pinged, so limiting servo_ids helps a lot.
+    servo_ids = set(servo_ids)
+    for baud_rate in baud_rates:
+        comm.baud_rate = baud_rate
+        comm.set_comm_baud_rate()
+
+        servos = _ping_servos(comm, protocol_version, servo_ids)
+        if servos:
+            print(f"Found servos {sorted(servos)} on port {comm.port} at baud rate {baud_rate}")
+            return BusFingerprint(comm.port, baud_rate, protocol_version, servos)
+
+    raise RuntimeError(
+        f"No servos found on port {comm.port} with Protocol {protocol_version}.0 at baud rates "
+        f"{list(baud_rates)}"
+    )
+
+
+def validate_fingerprint(comm: DxlComm, fingerprint: BusFingerprint) -> bool:
+    # True if every servo of the fingerprint still answers with the same model number and firmware
+    # version. With Protocol 2.0 they are read with a single sync read, a broadcast ping would always
+    # wait for all 253 ids to answer. New servos on the bus are not noticed, scan_bus finds them.
+    # A fingerprint with a model that has no control table is never valid.
+    try:
+        table_names = fingerprint.get_control_tables()
+    except ValueError:
+        return False
+
+    packet_handler = comm.get_packet_handler(fingerprint.protocol_version)
+    tables = {
+        dxl_id: control_tables[fingerprint.protocol_version][table]
+        for dxl_id, table in table_names.items()
+    }
+    blocks = {
+        dxl_id: (table.get_register("MODEL_NUMBER"), table.get_register("FIRMWARE_VERSION"))
+        for dxl_id, table in tables.items()
+    }
+
+    # Block from the model number up to the firmware version, read in one go per servo
+    start_addr = min(model_reg.address for model_reg, _ in blocks.values())
+    data_length = max(fw_reg.address + fw_reg.size for _, fw_reg in blocks.values()) - start_addr
+
+    if fingerprint.protocol_version == 2:
+        sync_read = GroupSyncRead(comm.port_handler, packet_handler, start_addr, data_length)
+        for dxl_id in blocks:
+            sync_read.addParam(dxl_id)
+        if sync_read.txRxPacket() != COMM_SUCCESS:
+            return False
+        data = {dxl_id: sync_read.data_dict[dxl_id] for dxl_id in blocks}
+    else:
+        data = {}
+        for dxl_id in blocks:
+            dxl_data, comm_result, _ = packet_handler.readTxRx(
+                comm.port_handler, dxl_id, start_addr, data_length
+            )
+            if comm_result != COMM_SUCCESS:
+                return False
+            data[dxl_id] = dxl_data
+
+    for dxl_id, (model_reg, fw_reg) in blocks.items():
+        model_offset = model_reg.address - start_addr
+        fw_offset = fw_reg.address - start_addr
+        found = (
+            model_reg.decode(data[dxl_id][model_offset : model_offset + model_reg.size]),
+            fw_reg.decode(data[dxl_id][fw_offset : fw_offset + fw_reg.size]),
+        )
+        if found != tuple(fingerprint.servos[dxl_id]):
+            return False
+    return True
+
+
+def build_group(comm: DxlComm, fingerprint: BusFingerprint) -> ServoGroup:
+    # Servos are created with their known control tables, so none of them has to be pinged
+    group = ServoGroup()
+    group.add_servos(
+        [
+            Servo(dxl_id, control_table, fingerprint.protocol_version, comm=comm)
+            for dxl_id, control_table in sorted(fingerprint.get_control_tables().items())
+        ]
+    )
+    return group
+
+
+def open_bus(
+    port: str = None,
+    protocol_version: int = DEFAULT_PROTOCOL_VERSION,
+    cache_path: str = DEFAULT_CACHE_PATH,
+    baud_rates: Sequence[int] = DEFAULT_BAUD_RATES,
+    servo_ids: Sequence[int] = range(253),
+    port_handler=None,
+    rescan: bool = False,
+) -> Tuple[DxlComm, ServoGroup]:
+    # Opens the port and returns a ServoGroup of every servo on it. The first time, or whenever the
+    # cached fingerprint of the port no longer matches the bus, the bus is scanned and the cache
+    # rewritten. Otherwise the port is opened at the cached baud rate and checked with one read.
+    port_name = port_handler.getPortName() if port_handler is not None else port
+    fingerprint = None if rescan else load_fingerprint(port_name, protocol_version, cache_path)
+
+    if fingerprint is not None:
+        comm = DxlComm(port, fingerprint.baud_rate, port_handler=port_handler)
+        if not validate_fingerprint(comm, fingerprint):
+            print(f"The servos on port {port_name} changed since they were cached, scanning the bus")
+            fingerprint = None
+    else:
+        comm = DxlComm(port, baud_rates[0], port_handler=port_handler)
+
+    if fingerprint is None:
+        fingerprint = scan_bus(comm, protocol_version, baud_rates, servo_ids)
+        # Only cached once every servo has a control table, otherwise every later call would fail
+        group = build_group(comm, fingerprint)
+        save_fingerprint(fingerprint, cache_path)
+        return comm, group
+
+    return comm, build_group(comm, fingerprint)
@@ -1,68 +1,274 @@
-class XL330:
-    # Control table addresses for XL330-M288-T
+import struct
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Tuple
+
+# Struct format characters by (size in bytes, signed), every register is little-endian on the wire
+_STRUCT_FORMATS = {
+    (1, False): "B",
+    (1, True): "b",
+    (2, False): "H",
+    (2, True): "h",
+    (4, False): "I",
+    (4, True): "i",
+}
+
+
+class Register(NamedTuple):
+    name: str
+    address: int
+    size: int
+    signed: bool = False
+    access: str = "RW"  # "R" or "RW"
+    area: str = "RAM"  # "EEPROM" registers can only be written while torque is disabled
+
+    def decode(self, data) -> int:
+        return get_struct((self,)).unpack_from(bytes(data))[0]
+
+    def encode(self, value: int) -> bytes:
+        try:
+            return get_struct((self,)).pack(int(value))
+        except struct.error:
+            raise ValueError(
+                f"Value {value} does not fit in register {self.name} "
+                f"({self.size} bytes, {'signed' if self.signed else 'unsigned'})"
+            )
 
-    # EEPROM Area - Permanently stored in memory once changed
-    ADDR_MODEL_NUMBER = 0
-    ADDR_MODEL_INFORMATION = 2
-    ADDR_FIRMWARE_VERSION = 6
-    ADDR_HOMING_OFFSET = 20
 
-    # RAM Area
-    ADDR_TORQUE_ENABLE = 64
-    ADDR_GOAL_POSITION = 116
-    ADDR_PRESENT_POSITION = 132
+@lru_cache(maxsize=None)
+def get_struct(registers: Tuple[Register, ...]) -> struct.Struct:
+    # Compiled decoder for the registers laid out back to back in the given order, like a contiguous
+    # block of the control table or the Indirect Data block
+    return struct.Struct(
+        "<" + "".join(_STRUCT_FORMATS[(register.size, register.signed)] for register in registers)
+    )
 
 
-class XC330:
-    # Control table addresses for XC330
-    # EEPROM Area - Permanently stored in memory once changed
-    ADDR_MODEL_NUMBER = 0
-    ADDR_MODEL_INFORMATION = 2
-    ADDR_FIRMWARE_VERSION = 6
-    ADDR_HOMING_OFFSET = 20
+class ControlTable:
+    # Base of the control tables below. Every register is also exposed as ADDR_<name> and LEN_<name>.
+    NAME: str = None
+    MODEL_NUMBER: int = None
+    PROTOCOL_VERSION: int = None
+    # Protocol 1.0 AX-series servos do not answer Bulk Read
+    SUPPORTS_BULK_READ: bool = True
+    # Baud rate in bps -> value of the BAUD_RATE register
+    BAUD_RATES: Dict[int, int] = {}
+    REGISTERS: Dict[str, Register] = {}
 
-    # RAM Area
-    ADDR_TORQUE_ENABLE = 64
-    ADDR_GOAL_POSITION = 116
-    ADDR_PRESENT_POSITION = 132
+    @classmethod
+    def get_register(cls, name: str) -> Register:
+        try:
+            return cls.REGISTERS[name]
+        except KeyError:
+            raise ValueError(f"Register {name} is not available in control table {cls.__name__}")
 
 
-class XL430:
-    # Control table addresses for XL430
-    # EEPROM Area - Permanently stored in memory once changed
-    ADDR_MODEL_NUMBER = 0
-    ADDR_MODEL_INFORMATION = 2
-    ADDR_FIRMWARE_VERSION = 6
-    ADDR_HOMING_OFFSET = 20
+def _make_control_table(
+    name: str, model_number: int, protocol_version: int, registers: List[Register], **attributes
+) -> type:
+    namespace = {
+        "NAME": name,
+        "MODEL_NUMBER": model_number,
+        "PROTOCOL_VERSION": protocol_version,
+        "REGISTERS": {register.name: register for register in registers},
+        **attributes,
+    }
+    for register in registers:
+        namespace[f"ADDR_{register.name}"] = register.address
+        namespace[f"LEN_{register.name}"] = register.size
 
-    # RAM Area
-    ADDR_TORQUE_ENABLE = 64
-    ADDR_GOAL_POSITION = 116
-    ADDR_PRESENT_POSITION = 132
+    return type(name, (ControlTable,), namespace)
 
 
-class AX12:
-    # Control table addresses for AX12
-    # EEPROM Area - Permanently stored in memory once changed
-    ADDR_MODEL_NUMBER = 0
-    ADDR_FIRMWARE_VERSION = 2
+# Indirect Address/Data pairs on X-series servos, every Indirect Address maps a single byte. The
+# Indirect Address table always starts at 168 and the Indirect Data block follows right after it:
+# (number of pairs, address of Indirect Data 1)
+_XL330_INDIRECT = (20, 208)
+_XL430_INDIRECT = (28, 224)
 
-    # RAM area
-    ADDR_TORQUE_ENABLE = 24
-    ADDR_GOAL_POSITION = 30
-    ADDR_PRESENT_POSITION = 36
 
+def _x_series_registers(has_current: bool, indirect: Tuple[int, int]) -> List[Register]:
+    # Protocol 2.0 X-series. The 330 models measure current, the XL430 only reports a load estimate
+    registers = [
+        # EEPROM Area - Permanently stored in memory once changed
+        Register("MODEL_NUMBER", 0, 2, access="R", area="EEPROM"),
+        Register("MODEL_INFORMATION", 2, 4, access="R", area="EEPROM"),
+        Register("FIRMWARE_VERSION", 6, 1, access="R", area="EEPROM"),
+        Register("ID", 7, 1, area="EEPROM"),
+        Register("BAUD_RATE", 8, 1, area="EEPROM"),
+        Register("RETURN_DELAY_TIME", 9, 1, area="EEPROM"),
+        Register("DRIVE_MODE", 10, 1, area="EEPROM"),
+        Register("OPERATING_MODE", 11, 1, area="EEPROM"),
+        Register("SECONDARY_ID", 12, 1, area="EEPROM"),
+        Register("PROTOCOL_TYPE", 13, 1, area="EEPROM"),
+        Register("HOMING_OFFSET", 20, 4, signed=True, area="EEPROM"),
+        Register("MOVING_THRESHOLD", 24, 4, area="EEPROM"),
+        Register("TEMPERATURE_LIMIT", 31, 1, area="EEPROM"),
+        Register("MAX_VOLTAGE_LIMIT", 32, 2, area="EEPROM"),
+        Register("MIN_VOLTAGE_LIMIT", 34, 2, area="EEPROM"),
+        Register("PWM_LIMIT", 36, 2, area="EEPROM"),
+        Register("VELOCITY_LIMIT", 44, 4, area="EEPROM"),
+        Register("MAX_POSITION_LIMIT", 48, 4, area="EEPROM"),
+        Register("MIN_POSITION_LIMIT", 52, 4, area="EEPROM"),
+        Register("SHUTDOWN", 63, 1, area="EEPROM"),
+        # RAM Area
+        Register("TORQUE_ENABLE", 64, 1),
+        Register("LED", 65, 1),
+        Register("STATUS_RETURN_LEVEL", 68, 1),
+        Register("REGISTERED_INSTRUCTION", 69, 1, access="R"),
+        Register("HARDWARE_ERROR_STATUS", 70, 1, access="R"),
+        Register("VELOCITY_I_GAIN", 76, 2),
+        Register("VELOCITY_P_GAIN", 78, 2),
+        Register("POSITION_D_GAIN", 80, 2),
+        Register("POSITION_I_GAIN", 82, 2),
+        Register("POSITION_P_GAIN", 84, 2),
+        Register("FEEDFORWARD_2ND_GAIN", 88, 2),
+        Register("FEEDFORWARD_1ST_GAIN", 90, 2),
+        Register("BUS_WATCHDOG", 98, 1),
+        Register("GOAL_PWM", 100, 2, signed=True),
+        Register("GOAL_VELOCITY", 104, 4, signed=True),
+        Register("PROFILE_ACCELERATION", 108, 4),
+        Register("PROFILE_VELOCITY", 112, 4),
+        Register("GOAL_POSITION", 116, 4, signed=True),
+        Register("REALTIME_TICK", 120, 2, access="R"),
+        Register("MOVING", 122, 1, access="R"),
+        Register("MOVING_STATUS", 123, 1, access="R"),
+        Register("PRESENT_PWM", 124, 2, signed=True, access="R"),
+        Register("PRESENT_VELOCITY", 128, 4, signed=True, access="R"),
+        Register("PRESENT_POSITION", 132, 4, signed=True, access="R"),
+        Register("VELOCITY_TRAJECTORY", 136, 4, signed=True, access="R"),
+        Register("POSITION_TRAJECTORY", 140, 4, signed=True, access="R"),
+        Register("PRESENT_INPUT_VOLTAGE", 144, 2, access="R"),
+        Register("PRESENT_TEMPERATURE", 146, 1, access="R"),
+    ]
 
-class MX12:
-    # Control table addresses for MX12
-    # EEPROM Area - Permanently stored in memory once changed
-    ADDR_MODEL_NUMBER = 0
-    ADDR_FIRMWARE_VERSION = 2
+    if has_current:
+        registers += [
+            Register("CURRENT_LIMIT", 38, 2, area="EEPROM"),
+            Register("GOAL_CURRENT", 102, 2, signed=True),
+            Register("PRESENT_CURRENT", 126, 2, signed=True, access="R"),
+        ]
+    else:
+        registers.append(Register("PRESENT_LOAD", 126, 2, signed=True, access="R"))
 
-    # RAM area
-    ADDR_TORQUE_ENABLE = 24
-    ADDR_GOAL_POSITION = 30
-    ADDR_PRESENT_POSITION = 36
+    indirect_count, indirect_data_addr = indirect
+    for i in range(indirect_count):
+        registers.append(Register(f"INDIRECT_ADDRESS_{i + 1}", 168 + 2 * i, 2))
+    for i in range(indirect_count):
+        registers.append(Register(f"INDIRECT_DATA_{i + 1}", indirect_data_addr + i, 1))
+
+    return sorted(registers, key=lambda register: register.address)
+
+
+def _ax_mx_registers(is_mx: bool) -> List[Register]:
+    # Protocol 1.0 AX/MX-series. Present speed and load use bit 10 as the direction bit instead of
+    # two's complement, so they are decoded as unsigned
+    registers = [
+        # EEPROM Area - Permanently stored in memory once changed
+        Register("MODEL_NUMBER", 0, 2, access="R", area="EEPROM"),
+        Register("FIRMWARE_VERSION", 2, 1, access="R", area="EEPROM"),
+        Register("ID", 3, 1, area="EEPROM"),
+        Register("BAUD_RATE", 4, 1, area="EEPROM"),
+        Register("RETURN_DELAY_TIME", 5, 1, area="EEPROM"),
+        Register("CW_ANGLE_LIMIT", 6, 2, area="EEPROM"),
+        Register("CCW_ANGLE_LIMIT", 8, 2, area="EEPROM"),
+        Register("TEMPERATURE_LIMIT", 11, 1, area="EEPROM"),
+        Register("MIN_VOLTAGE_LIMIT", 12, 1, area="EEPROM"),
+        Register("MAX_VOLTAGE_LIMIT", 13, 1, area="EEPROM"),
+        Register("MAX_TORQUE", 14, 2, area="EEPROM"),
+        Register("STATUS_RETURN_LEVEL", 16, 1, area="EEPROM"),
+        Register("ALARM_LED", 17, 1, area="EEPROM"),
+        Register("SHUTDOWN", 18, 1, area="EEPROM"),
+        # RAM area
+        Register("TORQUE_ENABLE", 24, 1),
+        Register("LED", 25, 1),
+        Register("GOAL_POSITION", 30, 2),
+        Register("MOVING_SPEED", 32, 2),
+        Register("TORQUE_LIMIT", 34, 2),
+        Register("PRESENT_POSITION", 36, 2, access="R"),
+        Register("PRESENT_SPEED", 38, 2, access="R"),
+        Register("PRESENT_LOAD", 40, 2, access="R"),
+        Register("PRESENT_VOLTAGE", 42, 1, access="R"),
+        Register("PRESENT_TEMPERATURE", 43, 1, access="R"),
+        Register("REGISTERED", 44, 1, access="R"),
+        Register("MOVING", 46, 1, access="R"),
+        Register("LOCK", 47, 1),
+        Register("PUNCH", 48, 2),
+    ]
+
+    if is_mx:
+        registers += [
+            Register("MULTI_TURN_OFFSET", 20, 2, signed=True, area="EEPROM"),
+            Register("RESOLUTION_DIVIDER", 22, 1, area="EEPROM"),
+            Register("D_GAIN", 26, 1),
+            Register("I_GAIN", 27, 1),
+            Register("P_GAIN", 28, 1),
+            Register("GOAL_ACCELERATION", 73, 1),
+        ]
+    else:
+        registers += [
+            Register("CW_COMPLIANCE_MARGIN", 26, 1),
+            Register("CCW_COMPLIANCE_MARGIN", 27, 1),
+            Register("CW_COMPLIANCE_SLOPE", 28, 1),
+            Register("CCW_COMPLIANCE_SLOPE", 29, 1),
+        ]
+
+    return sorted(registers, key=lambda register: register.address)
+
+
+_X_SERIES_BAUD_RATES = {
+    9600: 0, 57600: 1, 115200: 2, 1000000: 3, 2000000: 4, 3000000: 5, 4000000: 6
+}
+# AX/MX servos run at 2 Mbps / (value + 1), only the values with a documented error are listed
+_AX_BAUD_RATES = {
+    9600: 207, 19200: 103, 57600: 34, 115200: 16, 200000: 9, 250000: 7, 400000: 4, 500000: 3,
+    1000000: 1,
+}
+_MX_BAUD_RATES = {**_AX_BAUD_RATES, 2250000: 250, 2500000: 251, 3000000: 252}
+
+# Control table for XL330-M288-T
+XL330 = _make_control_table(
+    "XL330",
+    1200,
+    2,
+    _x_series_registers(has_current=True, indirect=_XL330_INDIRECT),
+    INDIRECT_DATA_COUNT=_XL330_INDIRECT[0],
+    BAUD_RATES=_X_SERIES_BAUD_RATES,
+)
+
+# Control table for XC330-M288-T
+XC330 = _make_control_table(
+    "XC330",
+    1240,
+    2,
+    _x_series_registers(has_current=True, indirect=_XL330_INDIRECT),
+    INDIRECT_DATA_COUNT=_XL330_INDIRECT[0],
+    BAUD_RATES=_X_SERIES_BAUD_RATES,
+)
+
+# Control table for XL430-W250-T
+XL430 = _make_control_table(
+    "XL430",
+    1060,
+    2,
+    _x_series_registers(has_current=False, indirect=_XL430_INDIRECT),
+    INDIRECT_DATA_COUNT=_XL430_INDIRECT[0],
+    BAUD_RATES={**_X_SERIES_BAUD_RATES, 4500000: 7},
+)
+
+# Control table for AX-12A
+AX12 = _make_control_table(
+    "AX12",
+    12,
+    1,
+    _ax_mx_registers(is_mx=False),
+    SUPPORTS_BULK_READ=False,
+    BAUD_RATES=_AX_BAUD_RATES,
+)
+
+# Control table for MX-12W
+MX12 = _make_control_table(
+    "MX12", 360, 1, _ax_mx_registers(is_mx=True), BAUD_RATES=_MX_BAUD_RATES
+)
 
 
 control_tables = {
@@ -70,6 +276,17 @@ control_tables = {
     2: {"XL330": XL330, "XC330": XC330, "XL430": XL430},
 }
 
+
+def find_control_table(model_number: int, protocol_version: int) -> str:
+    # Name of the control table of the model number reported by ping/broadcastPing
+    for name, control_table in control_tables.get(protocol_version, {}).items():
+        if control_table.MODEL_NUMBER == model_number:
+            return name
+    raise ValueError(
+        f"No control table for model number {model_number} in protocol version {protocol_version}"
+    )
+
+
 if __name__ == "__main__":
     for items in control_tables:
         print(items)
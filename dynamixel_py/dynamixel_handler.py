@@ -1,6 +1,10 @@
-from dynamixel_sdk import *
+from dynamixel_sdk import PacketHandler, PortHandler
+from dynamixel_sdk.robotis_def import BROADCAST_ID
 from .dynamixel_control_tables import *
 from .utilities import DxlUtils
+from .codec import FastPacketHandler
+from .metrics import BusMetrics, InstrumentedPacketHandler
+from .register_cache import RegisterCache
 from serial import SerialException
 from math import pi
 
@@ -13,12 +17,19 @@ utils = DxlUtils()
 
 class DxlComm:
 
-    def __init__(self, port: str = None, baud_rate: int = 57600):
+    def __init__(
+        self, port: str = None, baud_rate: int = 57600, port_handler: PortHandler = None
+    ):
+
+        # port_handler can replace the serial port, eg: with a SimulatedPortHandler
+        if port_handler is not None:
+            port = port_handler.getPortName()
 
         self.port = port
         self.baud_rate = baud_rate
 
-        self.port_handler = PortHandler(port)
+        self.port_handler = port_handler if port_handler is not None else PortHandler(port)
+        self.metrics = None
         global PORT_HANDLER
         PORT_HANDLER = self.port_handler
 
@@ -41,12 +52,56 @@ class DxlComm:
     def set_comm_baud_rate(self):
         self.port_handler.setBaudRate(baudrate=self.baud_rate)
 
-    def get_servo_ids(self) -> list:
+    def enable_metrics(self, metrics: BusMetrics) -> None:
+        self.metrics = metrics
+
+    def disable_metrics(self) -> None:
+        self.metrics = None
+
+    def get_packet_handler(self, protocol_version: int = DEFAULT_PROTOCOL_VERSION):
+        # Packet handler for calls that are not made by a Servo, reported to the metrics if enabled
+        packet_handler = PacketHandler(protocol_version)
+        if self.metrics is not None:
+            packet_handler = InstrumentedPacketHandler(packet_handler, self.metrics)
+        return packet_handler
+
+    def action(self, protocol_version: int = DEFAULT_PROTOCOL_VERSION) -> None:
+        # Broadcast ACTION, every servo on the port with a write staged by stage_register,
+        # stage_position or ServoGroup.stage_write applies it at the same time. The port does not know
+        # its servos, so their caches keep reading the staged registers from the servos until they
+        # send an ACTION themselves.
+        packet_handler = self.get_packet_handler(protocol_version)
+        comm_result = packet_handler.action(self.port_handler, BROADCAST_ID)
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_handler)
+
+    def tune_bus(
+        self,
+        protocol_version: int = DEFAULT_PROTOCOL_VERSION,
+        servo_ids=range(253),
+        max_baud_rate: int = None,
+        return_delay_time: int = 0,
+        latency_timer: int = 1,
+    ):
+        # Moves every servo on the port to the highest reliable baud rate, minimizes their Return
+        # Delay Time and the adapter's latency timer, see bus_tuning.tune_bus. Returns a TuningReport.
+        # Imported here, bus_tuning builds ServoGroups which import this module
+        from .bus_tuning import tune_bus
+
+        return tune_bus(
+            self,
+            protocol_version,
+            servo_ids,
+            max_baud_rate=max_baud_rate,
+            return_delay_time=return_delay_time,
+            latency_timer=latency_timer,
+        )
+
+    def get_servo_ids(self, protocol_version: int = DEFAULT_PROTOCOL_VERSION) -> list:
 
-        if DEFAULT_PROTOCOL_VERSION == 1:
+        if protocol_version == 1:
             raise RuntimeError("The method get_servo_ids only works with Protocol 2.0")
 
-        tmp_packet_handler = PacketHandler(DEFAULT_PROTOCOL_VERSION)
+        tmp_packet_handler = self.get_packet_handler(protocol_version)
 
         found_servos = []
         dxl_data, dxl_comm_result = tmp_packet_handler.broadcastPing(
@@ -60,6 +115,27 @@ class DxlComm:
             found_servos.append(ids)
         return found_servos
 
+    def get_servo_models(self, protocol_version: int = DEFAULT_PROTOCOL_VERSION) -> dict:
+        # Maps the id of every servo answering a broadcast ping to the name of its control table,
+        # which can be passed straight to Servo
+        if protocol_version == 1:
+            raise RuntimeError("The method get_servo_models only works with Protocol 2.0")
+
+        tmp_packet_handler = self.get_packet_handler(protocol_version)
+
+        dxl_data, dxl_comm_result = tmp_packet_handler.broadcastPing(
+            port=self.port_handler
+        )
+        utils.print_comm_error(
+            comm_result=dxl_comm_result, pack_h_instance=tmp_packet_handler
+        )
+
+        # broadcastPing returns {id: [model_number, firmware_version]}
+        return {
+            dxl_id: find_control_table(model_number, protocol_version)
+            for dxl_id, (model_number, _) in dxl_data.items()
+        }
+
     def __del__(self):
         self.port_handler.closePort()
 
@@ -69,16 +145,18 @@ class Servo:
     def __init__(
         self,
         servo_id: int,
-        control_table: str,
+        control_table: str = None,
         protocol_version: int = DEFAULT_PROTOCOL_VERSION,
+        comm: DxlComm = None,
     ):
 
         self.servo_id = servo_id
-        self.port_handler = PORT_HANDLER
+
+        # Servos are bound to the port of the given DxlComm, or to the last opened one if none is given
+        self.comm = comm
+        self.port_handler = comm.port_handler if comm is not None else PORT_HANDLER
 
         self.protocol_version = protocol_version
-        global DEFAULT_PROTOCOL_VERSION
-        DEFAULT_PROTOCOL_VERSION = self.protocol_version
 
         self.packet_handler = PacketHandler(self.protocol_version)
 
@@ -86,12 +164,20 @@ class Servo:
         self.middle_pos_val = 2048.0
         self.goal_pos = None
         self.is_torque_enabled = False
+        # Set by BusScheduler.attach, register access is then queued on the scheduler's thread
+        self.scheduler = None
+        # Shadow registers, only used once enable_cache is called
+        self.cache = None
 
         if self.protocol_version not in control_tables:
             raise ValueError(f"Unsupported protocol version: {self.protocol_version}")
 
         valid_tables = control_tables[self.protocol_version]
 
+        # Without a control table the model is detected from the model number the servo answers a ping with
+        if control_table is None:
+            control_table = self._detect_control_table()
+
         if control_table not in valid_tables:
             raise ValueError(
                 f"Invalid control table {control_table} for protocol version {self.protocol_version}"
@@ -109,6 +195,140 @@ class Servo:
     def _set_middle_pos_val(self, middle_value):
         self.middle_pos_val = middle_value
 
+    def _detect_control_table(self) -> str:
+        model_number, dxl_comm_result, dxl_error = self.packet_handler.ping(
+            self.port_handler, self.servo_id
+        )
+        utils.print_comm_hardware_error(
+            pack_h_instance=self.packet_handler,
+            comm_result=dxl_comm_result,
+            hardware_result=dxl_error,
+        )
+        control_table = find_control_table(model_number, self.protocol_version)
+        print(f"Detected model {control_table} for servo with id {self.servo_id}")
+        return control_table
+
+    def enable_metrics(self, metrics: BusMetrics) -> None:
+        # Every packet handler call of this servo is reported to metrics
+        self.disable_metrics()
+        self.packet_handler = InstrumentedPacketHandler(self.packet_handler, metrics)
+
+    def disable_metrics(self) -> None:
+        if isinstance(self.packet_handler, InstrumentedPacketHandler):
+            self.packet_handler = self.packet_handler.packet_handler
+
+    def enable_fast_codec(self) -> None:
+        # Swaps the SDK packet handler for a FastPacketHandler, which sends the same bytes using less CPU
+        self._set_packet_handler(FastPacketHandler(self.protocol_version))
+
+    def disable_fast_codec(self) -> None:
+        self._set_packet_handler(PacketHandler(self.protocol_version))
+
+    def _set_packet_handler(self, packet_handler) -> None:
+        # Metrics keep wrapping whichever packet handler is used. The wrapper is rebuilt, the one in use
+        # caches methods bound to the old packet handler.
+        if isinstance(self.packet_handler, InstrumentedPacketHandler):
+            self.packet_handler = InstrumentedPacketHandler(packet_handler, self.packet_handler.metrics)
+        else:
+            self.packet_handler = packet_handler
+
+    def enable_cache(self, ttl: float = 0.0) -> None:
+        # Writes that would not change a register are skipped and reads are served from the cache
+        # where RegisterCache allows it. ttl is how long read-only values like the present position
+        # can be served.
+        self.cache = RegisterCache(ttl)
+
+    def disable_cache(self) -> None:
+        self.cache = None
+
+    def _check_status(self, dxl_comm_result, dxl_error) -> None:
+        try:
+            utils.print_comm_hardware_error(
+                pack_h_instance=self.packet_handler,
+                comm_result=dxl_comm_result,
+                hardware_result=dxl_error,
+            )
+        except RuntimeError:
+            # A hardware error can turn the torque off, so nothing cached can be trusted anymore
+            if self.cache is not None:
+                self.cache.invalidate()
+            raise
+
+    def read_register(self, register: str) -> int:
+        # Reads a register with the size and signedness given by the control table
+        reg = self.control_table.get_register(register)
+        if self.cache is not None:
+            value = self.cache.read(reg)
+            if value is not None:
+                return value
+
+        if self.scheduler is not None and not self.scheduler.is_worker_thread():
+            return self.scheduler.read(self, register).result()
+
+        reg_data, dxl_comm_result, dxl_error = self.packet_handler.readTxRx(
+            self.port_handler, self.servo_id, reg.address, reg.size
+        )
+
+        self._check_status(dxl_comm_result, dxl_error)
+        value = reg.decode(reg_data)
+        if self.cache is not None:
+            self.cache.update(reg, value)
+        return value
+
+    def write_register(self, register: str, value: int) -> None:
+        reg = self.control_table.get_register(register)
+        if reg.access == "R":
+            raise ValueError(f"Register {register} is read only")
+        if self.cache is not None and self.cache.skip_write([reg], [value]):
+            return
+
+        if self.scheduler is not None and not self.scheduler.is_worker_thread():
+            self.scheduler.write(self, register, value).result()
+            return
+
+        dxl_comm_result, dxl_error = self.packet_handler.writeTxRx(
+            self.port_handler, self.servo_id, reg.address, reg.size, list(reg.encode(value))
+        )
+
+        self._check_status(dxl_comm_result, dxl_error)
+        if self.cache is not None:
+            self.cache.update(reg, value)
+
+    def stage_register(self, register: str, value: int) -> None:
+        # Loads the write with REG_WRITE, the servo only applies it on ACTION (Servo.action, or a
+        # broadcast from ServoGroup.action or DxlComm.action). A servo holds one staged write, staging
+        # again replaces it.
+        reg = self.control_table.get_register(register)
+        if reg.access == "R":
+            raise ValueError(f"Register {register} is read only")
+
+        if self.scheduler is not None and not self.scheduler.is_worker_thread():
+            self.scheduler.submit(self.stage_register, register, value).result()
+            return
+
+        dxl_comm_result, dxl_error = self.packet_handler.regWriteTxRx(
+            self.port_handler, self.servo_id, reg.address, reg.size, list(reg.encode(value))
+        )
+
+        self._check_status(dxl_comm_result, dxl_error)
+        if self.cache is not None:
+            self.cache.stage(reg)
+
+    def stage_position(self, goal_pos, radian=False) -> None:
+        self._set_goal_pos(angle=goal_pos, is_radian=radian)
+        self.stage_register("GOAL_POSITION", self.goal_pos)
+
+    def action(self) -> None:
+        # Applies the write staged on this servo only
+        if self.scheduler is not None and not self.scheduler.is_worker_thread():
+            self.scheduler.submit(self.action).result()
+            return
+
+        dxl_comm_result = self.packet_handler.action(self.port_handler, self.servo_id)
+        utils.print_comm_error(comm_result=dxl_comm_result, pack_h_instance=self.packet_handler)
+        if self.cache is not None:
+            self.cache.clear_staged()
+
     def set_homing_offset(
         self, angle_offset: float = HOMING_OFFSET, radian: bool = False
     ):
@@ -130,57 +350,19 @@ class Servo:
                 homing_pos = int(self.middle_pos_val * angle_offset / 180)
             else:
                 raise ValueError("Homing offset should be between -90 and 90 degrees")
-        dxl_comm_result, dxl_error = self.packet_handler.write4ByteTxRx(
-            self.port_handler,
-            self.servo_id,
-            self.control_table.ADDR_HOMING_OFFSET,
-            homing_pos,
-        )
 
-        utils.print_comm_hardware_error(
-            pack_h_instance=self.packet_handler,
-            comm_result=dxl_comm_result,
-            hardware_result=dxl_error,
-        )
+        self.write_register("HOMING_OFFSET", homing_pos)
         print(
             f"Homing offset for servo with id {self.servo_id} is set to: {angle_offset}"
         )
 
     def torque_enabled(self, is_enabled: bool = False) -> None:
-        dxl_comm_result, dxl_error = self.packet_handler.write1ByteTxRx(
-            self.port_handler,
-            self.servo_id,
-            self.control_table.ADDR_TORQUE_ENABLE,
-            is_enabled,
-        )
-
-        utils.print_comm_hardware_error(
-            pack_h_instance=self.packet_handler,
-            comm_result=dxl_comm_result,
-            hardware_result=dxl_error,
-        )
+        self.write_register("TORQUE_ENABLE", int(is_enabled))
         print(f"Torque for servo with id {self.servo_id} is set to: {is_enabled}")
         self.is_torque_enabled = is_enabled
 
     def get_position(self, is_radian: bool = False) -> float:
-        if self.protocol_version == 1:
-            reg_data, dxl_comm_result, dxl_error = self.packet_handler.read2ByteTxRx(
-                self.port_handler,
-                self.servo_id,
-                self.control_table.ADDR_PRESENT_POSITION,
-            )
-        else:
-            reg_data, dxl_comm_result, dxl_error = self.packet_handler.read4ByteTxRx(
-                self.port_handler,
-                self.servo_id,
-                self.control_table.ADDR_PRESENT_POSITION,
-            )
-
-        utils.print_comm_hardware_error(
-            pack_h_instance=self.packet_handler,
-            comm_result=dxl_comm_result,
-            hardware_result=dxl_error,
-        )
+        reg_data = self.read_register("PRESENT_POSITION")
 
         angle = utils.pulse_to_angle(
             pulse=reg_data, mid_val=self.middle_pos_val, is_radian=is_radian
@@ -195,25 +377,4 @@ class Servo:
     def set_position(self, goal_pos, radian=False) -> None:
 
         self._set_goal_pos(angle=goal_pos, is_radian=radian)
-
-        if self.protocol_version == 1:
-            dxl_comm_result, dxl_error = self.packet_handler.write2ByteTxRx(
-                self.port_handler,
-                self.servo_id,
-                self.control_table.ADDR_GOAL_POSITION,
-                self.goal_pos,
-            )
-
-        else:
-            dxl_comm_result, dxl_error = self.packet_handler.write4ByteTxRx(
-                self.port_handler,
-                self.servo_id,
-                self.control_table.ADDR_GOAL_POSITION,
-                self.goal_pos,
-            )
-
-        utils.print_comm_hardware_error(
-            pack_h_instance=self.packet_handler,
-            comm_result=dxl_comm_result,
-            hardware_result=dxl_error,
-        )
+        self.write_register("GOAL_POSITION", self.goal_pos)
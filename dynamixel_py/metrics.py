@@ -0,0 +1,246 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from dynamixel_sdk.robotis_def import COMM_SUCCESS
+
+__all__ = ["TransactionRecord", "BusMetrics", "InstrumentedPacketHandler"]
+
+# Upper bounds of the latency histogram buckets in milliseconds, the last bucket is unbounded
+LATENCY_BUCKETS_MS = (0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0)
+
+# PacketHandler method -> (instruction, index of the COMM result in the return value or None if the
+# method returns the result directly). Calls that only receive the status packets of an earlier
+# instruction, like the ones made by group sync/bulk reads, are recorded as STATUS.
+_INSTRUMENTED_METHODS: Dict[str, Tuple[str, Optional[int]]] = {
+    "ping": ("PING", 1),
+    "broadcastPing": ("BROADCAST_PING", 1),
+    "action": ("ACTION", None),
+    "reboot": ("REBOOT", 0),
+    "factoryReset": ("FACTORY_RESET", 0),
+    "readTx": ("READ", None),
+    "readRx": ("STATUS", 1),
+    "readTxRx": ("READ", 1),
+    "read1ByteTx": ("READ", None),
+    "read1ByteRx": ("STATUS", 1),
+    "read1ByteTxRx": ("READ", 1),
+    "read2ByteTx": ("READ", None),
+    "read2ByteRx": ("STATUS", 1),
+    "read2ByteTxRx": ("READ", 1),
+    "read4ByteTx": ("READ", None),
+    "read4ByteRx": ("STATUS", 1),
+    "read4ByteTxRx": ("READ", 1),
+    "writeTxOnly": ("WRITE", None),
+    "writeTxRx": ("WRITE", 0),
+    "write1ByteTxOnly": ("WRITE", None),
+    "write1ByteTxRx": ("WRITE", 0),
+    "write2ByteTxOnly": ("WRITE", None),
+    "write2ByteTxRx": ("WRITE", 0),
+    "write4ByteTxOnly": ("WRITE", None),
+    "write4ByteTxRx": ("WRITE", 0),
+    "regWriteTxOnly": ("REG_WRITE", None),
+    "regWriteTxRx": ("REG_WRITE", 0),
+    "syncReadTx": ("SYNC_READ", None),
+    "rxPacket": ("STATUS", 1),
+    "fastSyncReadRx": ("STATUS", 1),
+    "syncWriteTxOnly": ("SYNC_WRITE", None),
+    "bulkReadTx": ("BULK_READ", None),
+    "fastBulkReadRx": ("STATUS", 1),
+    "bulkWriteTxOnly": ("BULK_WRITE", None),
+}
+
+
+class TransactionRecord(NamedTuple):
+    instruction: str
+    method: str
+    servo_ids: Tuple[int, ...]
+    tx_bytes: int
+    rx_bytes: int
+    duration: float
+    result: int
+    error: int
+
+
+class BusMetrics:
+    # Collects one TransactionRecord per PacketHandler call into counters and latency histograms.
+    # callback, if given, is called with every record from the thread that made the call.
+
+    def __init__(self, callback: Callable[[TransactionRecord], None] = None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._instructions: Dict[str, Dict] = {}
+            self._results: Dict[int, int] = {}
+            self._servo_failures: Dict[int, int] = {}
+            self._tx_bytes = 0
+            self._rx_bytes = 0
+            self._transactions = 0
+            self._start_time = time.time()
+
+    def record(self, record: TransactionRecord) -> None:
+        with self._lock:
+            stats = self._instructions.get(record.instruction)
+            if stats is None:
+                stats = {
+                    "count": 0,
+                    "failures": 0,
+                    "tx_bytes": 0,
+                    "rx_bytes": 0,
+                    "total_time": 0.0,
+                    "max_time": 0.0,
+                    "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+                self._instructions[record.instruction] = stats
+
+            stats["count"] += 1
+            stats["tx_bytes"] += record.tx_bytes
+            stats["rx_bytes"] += record.rx_bytes
+            stats["total_time"] += record.duration
+            stats["max_time"] = max(stats["max_time"], record.duration)
+            stats["histogram"][bisect_left(LATENCY_BUCKETS_MS, record.duration * 1000)] += 1
+
+            if record.result != COMM_SUCCESS or record.error != 0:
+                stats["failures"] += 1
+                for servo_id in record.servo_ids:
+                    self._servo_failures[servo_id] = self._servo_failures.get(servo_id, 0) + 1
+
+            self._results[record.result] = self._results.get(record.result, 0) + 1
+            self._tx_bytes += record.tx_bytes
+            self._rx_bytes += record.rx_bytes
+            self._transactions += 1
+
+        if self.callback is not None:
+            self.callback(record)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            instructions = {}
+            for instruction, stats in self._instructions.items():
+                instructions[instruction] = dict(
+                    stats,
+                    histogram=list(stats["histogram"]),
+                    mean_time=stats["total_time"] / stats["count"],
+                )
+
+            return {
+                "since": self._start_time,
+                "transactions": self._transactions,
+                "tx_bytes": self._tx_bytes,
+                "rx_bytes": self._rx_bytes,
+                "results": dict(self._results),
+                "servo_failures": dict(self._servo_failures),
+                "instructions": instructions,
+                "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+            }
+
+
+class _CountingPort:
+    # Forwards everything to the real port while counting the bytes read and written through it
+
+    def __init__(self, port):
+        object.__setattr__(self, "_port", port)
+        object.__setattr__(self, "tx_bytes", 0)
+        object.__setattr__(self, "rx_bytes", 0)
+
+    def readPort(self, length):
+        data = self._port.readPort(length)
+        object.__setattr__(self, "rx_bytes", self.rx_bytes + len(data))
+        return data
+
+    def writePort(self, packet):
+        written = self._port.writePort(packet)
+        object.__setattr__(self, "tx_bytes", self.tx_bytes + written)
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._port, name, value)
+
+
+def _get_servo_ids(method: str, args: tuple, protocol_version: float) -> Tuple[int, ...]:
+    # args are the arguments after port
+    if method == "syncReadTx":
+        param, param_length = args[2], args[3]
+        return tuple(param[:param_length])
+    elif method == "syncWriteTxOnly":
+        data_length, param, param_length = args[1], args[2], args[3]
+        return tuple(param[0:param_length:data_length + 1])
+    elif method == "bulkReadTx":
+        param, param_length = args[0], args[1]
+        if protocol_version == 1.0:
+            return tuple(param[1:param_length:3])
+        return tuple(param[0:param_length:5])
+    elif method == "bulkWriteTxOnly":
+        param, param_length = args[0], args[1]
+        servo_ids = []
+        i = 0
+        while i + 5 <= param_length:
+            servo_ids.append(param[i])
+            i += 5 + (param[i + 3] | (param[i + 4] << 8))
+        return tuple(servo_ids)
+    elif method in ("broadcastPing", "rxPacket", "fastSyncReadRx", "fastBulkReadRx"):
+        return ()
+    elif args:
+        return (args[0],)
+    return ()
+
+
+def _split_result(returned, result_index: Optional[int]) -> Tuple[int, int]:
+    if result_index is None:
+        return returned, 0
+    result = returned[result_index]
+    error = returned[result_index + 1] if len(returned) > result_index + 1 else 0
+    return result, error if isinstance(error, int) else 0
+
+
+class InstrumentedPacketHandler:
+    # Wraps a Protocol 1.0/2.0 PacketHandler and reports every call to metrics
+
+    def __init__(self, packet_handler, metrics: BusMetrics):
+        self.packet_handler = packet_handler
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        attribute = getattr(self.packet_handler, name)
+        if name not in _INSTRUMENTED_METHODS:
+            return attribute
+
+        instruction, result_index = _INSTRUMENTED_METHODS[name]
+
+        def instrumented(port, *args, **kwargs):
+            if name in ("syncReadTx", "bulkReadTx") and (args[-1:] == (True,) or kwargs.get("fast_option")):
+                recorded_instruction = f"FAST_{instruction}"
+            else:
+                recorded_instruction = instruction
+
+            counting_port = _CountingPort(port)
+            start_time = time.perf_counter()
+            returned = attribute(counting_port, *args, **kwargs)
+            duration = time.perf_counter() - start_time
+
+            result, error = _split_result(returned, result_index)
+            self.metrics.record(
+                TransactionRecord(
+                    instruction=recorded_instruction,
+                    method=name,
+                    servo_ids=_get_servo_ids(
+                        name, args, self.packet_handler.getProtocolVersion()
+                    ),
+                    tx_bytes=counting_port.tx_bytes,
+                    rx_bytes=counting_port.rx_bytes,
+                    duration=duration,
+                    result=result,
+                    error=error,
+                )
+            )
+            return returned
+
+        # Caching the wrapper so later lookups skip __getattr__
+        setattr(self, name, instrumented)
+        return instrumented
@@ -0,0 +1,199 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Union
+
+from .dynamixel_handler import Servo
+from .servo_group import ServoGroup
+
+__all__ = ["MultiBusGroup"]
+
+
+class MultiBusGroup:
+    # Splits its servos into one ServoGroup per port and runs the group operations of every port in
+    # parallel, one worker thread per port. The serial I/O releases the GIL, so a cycle takes as long
+    # as the slowest bus instead of the sum of all of them. Values are passed and returned in the
+    # order the servos were added, like ServoGroup.
+
+    def __init__(self):
+        self.groups: Dict[object, ServoGroup] = {}
+        self.servos: List[Servo] = []
+        self.total_servos = 0
+
+        # For every bus, the positions of its servos in self.servos
+        self._layout: List[Tuple[ServoGroup, List[int]]] = []
+        self._executor = None
+
+    def _update_layout(self):
+        self._layout = []
+        for group in self.groups.values():
+            group_servos = list(group.servos.values())
+            indices = [self.servos.index(servo) for servo in group_servos]
+            self._layout.append((group, indices))
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=len(self.groups), thread_name_prefix="dxl-bus")
+            if self.groups
+            else None
+        )
+
+    def _add_servo(self, servo: Servo):
+        group = self.groups.get(servo.port_handler)
+        if group is None:
+            group = ServoGroup()
+            self.groups[servo.port_handler] = group
+
+        try:
+            group.add_servos(servo)
+        except Exception:
+            if group.get_total_servos() == 0:
+                del self.groups[servo.port_handler]
+            raise
+        self.servos.append(servo)
+        self.total_servos += 1
+
+    def add_servos(self, servo_list: Union[Servo, List[Servo]]):
+        # Either every servo of the list is added or none of them
+        if not isinstance(servo_list, list):
+            servo_list = [servo_list]
+        added = []
+        try:
+            for servo in servo_list:
+                self._add_servo(servo)
+                added.append(servo)
+        except Exception:
+            for servo in reversed(added):
+                self._remove_servo(servo)
+            raise
+        finally:
+            self._update_layout()
+
+    def _remove_servo(self, servo: Servo):
+        group = self.groups.get(servo.port_handler)
+        if group is None or servo not in self.servos:
+            raise ValueError(f"Unable to find servo with id {servo.servo_id}")
+
+        group.remove_servos(servo)
+        if group.get_total_servos() == 0:
+            del self.groups[servo.port_handler]
+
+        self.servos.remove(servo)
+        self.total_servos -= 1
+
+    def remove_servos(self, servo_list: Union[Servo, List[Servo]]):
+        if not isinstance(servo_list, list):
+            servo_list = [servo_list]
+        for servo in servo_list:
+            self._remove_servo(servo)
+        self._update_layout()
+
+    def remove_all_servos(self):
+        self.groups.clear()
+        self.servos.clear()
+        self.total_servos = 0
+        self._update_layout()
+
+    def get_total_servos(self):
+        return self.total_servos
+
+    def get_total_buses(self):
+        return len(self.groups)
+
+    def _check_values_length(self, values: List) -> None:
+        if len(values) != self.total_servos:
+            raise ValueError(
+                f"Expected {self.total_servos} values, one per servo, but got {len(values)}"
+            )
+
+    def _run_on_all_buses(
+        self, method: str, args: Tuple = (), split_args: Tuple[List, ...] = (), **kwargs
+    ) -> List:
+        # Starts method on every bus at once. Every list in split_args holds one value per servo and
+        # each bus gets the values of its own servos after args. Per-servo results are merged back.
+        for values in split_args:
+            self._check_values_length(values)
+
+        futures = []
+        for group, indices in self._layout:
+            bus_args = tuple([values[i] for i in indices] for values in split_args)
+            future = self._executor.submit(getattr(group, method), *args, *bus_args, **kwargs)
+            futures.append((future, indices))
+
+        merged = [None] * self.total_servos
+        errors = []
+        for future, indices in futures:
+            try:
+                results = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+
+            if results is not None:
+                for i, result in zip(indices, results):
+                    merged[i] = result
+
+        # Waiting for every bus before raising, so no worker is left using a port
+        if errors:
+            raise errors[0]
+
+        return merged
+
+    def sync_get_positions(self, is_radian: bool = False, fast: bool = False) -> List[float]:
+        return self._run_on_all_buses("sync_get_positions", is_radian=is_radian, fast=fast)
+
+    def sync_set_positions(self, goal_positions: List[float], is_radian: bool = False):
+        self._run_on_all_buses(
+            "sync_set_positions", split_args=(goal_positions,), is_radian=is_radian
+        )
+
+    def sync_torques_enabled(self, is_enabled: bool = False):
+        self._run_on_all_buses("sync_torques_enabled", args=(is_enabled,))
+
+    def sync_write(self, registers: Union[str, List[str]], values: List) -> None:
+        self._run_on_all_buses("sync_write", args=(registers,), split_args=(values,))
+
+    def bulk_read(
+        self, registers: Union[str, List[str]] = "PRESENT_POSITION", fast: bool = False
+    ) -> List[int]:
+        if isinstance(registers, str):
+            return self._run_on_all_buses("bulk_read", args=(registers,), fast=fast)
+        return self._run_on_all_buses("bulk_read", split_args=(registers,), fast=fast)
+
+    def bulk_write(self, registers: Union[str, List[str]], values: List[int]) -> None:
+        if isinstance(registers, str):
+            self._run_on_all_buses("bulk_write", args=(registers,), split_args=(values,))
+        else:
+            self._run_on_all_buses("bulk_write", split_args=(registers, values))
+
+    def bulk_get_positions(self, is_radian: bool = False, fast: bool = False) -> List[float]:
+        return self._run_on_all_buses("bulk_get_positions", is_radian=is_radian, fast=fast)
+
+    def bulk_set_positions(self, goal_positions: List[float], is_radian: bool = False):
+        self._run_on_all_buses(
+            "bulk_set_positions", split_args=(goal_positions,), is_radian=is_radian
+        )
+
+    def stage_write(self, registers: Union[str, List[str]], values: List) -> None:
+        self._run_on_all_buses("stage_write", args=(registers,), split_args=(values,))
+
+    def stage_positions(self, goal_positions: List[float], is_radian: bool = False) -> None:
+        self._run_on_all_buses(
+            "stage_positions", split_args=(goal_positions,), is_radian=is_radian
+        )
+
+    def action(self) -> None:
+        # The ACTION packets are written back to back from this thread instead of the workers, so the
+        # buses start within one USB write of each other
+        for group in self.groups.values():
+            group.action()
+
+    def map_indirect_registers(self, registers: List[str]) -> None:
+        self._run_on_all_buses("map_indirect_registers", args=(registers,))
+
+    def sync_read_indirect(self, fast: bool = False) -> List[Dict[str, int]]:
+        return self._run_on_all_buses("sync_read_indirect", fast=fast)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,78 @@
+from typing import Collection, Dict, List, Tuple
+
+from dynamixel_sdk.robotis_def import COMM_NOT_AVAILABLE, COMM_SUCCESS
+
+__all__ = ["Protocol1GroupRead"]
+
+
+class Protocol1GroupRead:
+    # Stands in for GroupSyncRead and GroupBulkRead on Protocol 1.0 buses. Protocol 1.0 has no sync
+    # read and only the servos in bulk_ids (MX series) answer a Bulk Read, the SDK's GroupBulkRead
+    # also fails there. layout holds (id, start address, data length) per servo. Servos in bulk_ids
+    # are read with one Bulk Read, every other servo with read requests sent back to back, each one
+    # as soon as the previous status packet is in. The bus is half duplex and the servos answer a
+    # read right away, so requests cannot overlap with status packets.
+    #
+    # Like GroupSyncRead, data_dict maps every id to the data read by the last txRxPacket.
+
+    def __init__(
+        self, port, ph, layout: Tuple[Tuple[int, int, int], ...], bulk_ids: Collection[int] = ()
+    ):
+        self.port = port
+        self.ph = ph
+        self.layout = layout
+
+        bulk_layout = [entry for entry in layout if entry[0] in bulk_ids]
+        # A Bulk Read of a single servo takes longer than a read
+        if len(bulk_layout) < 2:
+            bulk_layout = []
+        self._bulk_layout = bulk_layout
+        self._read_layout = [entry for entry in layout if entry not in bulk_layout]
+
+        # Bulk Read parameters are [length, id, address] per servo, the SDK adds the leading 0x00
+        self._bulk_param = []
+        for dxl_id, start_addr, data_length in bulk_layout:
+            self._bulk_param += (data_length, dxl_id, start_addr)
+
+        self.last_result = False
+        self.data_dict: Dict[int, List[int]] = {}
+
+    def txRxPacket(self) -> int:
+        self.last_result = False
+        if not self.layout:
+            return COMM_NOT_AVAILABLE
+
+        data_dict = self.data_dict
+        data_dict.clear()
+
+        if self._bulk_layout:
+            # The status packets come back in the order of the parameters, each servo waits for the one
+            # before it
+            comm_result = self.ph.bulkReadTx(self.port, self._bulk_param, len(self._bulk_param))
+            if comm_result != COMM_SUCCESS:
+                return comm_result
+            for dxl_id, _, data_length in self._bulk_layout:
+                data, comm_result, _ = self.ph.readRx(self.port, dxl_id, data_length)
+                if comm_result != COMM_SUCCESS:
+                    return comm_result
+                data_dict[dxl_id] = data
+
+        # Checked and decoded by the caller once every servo answered
+        read = self.ph.readTxRx
+        for dxl_id, start_addr, data_length in self._read_layout:
+            data, comm_result, _ = read(self.port, dxl_id, start_addr, data_length)
+            if comm_result != COMM_SUCCESS:
+                return comm_result
+            data_dict[dxl_id] = data
+
+        self.last_result = True
+        return COMM_SUCCESS
+
+    def isAvailable(self, dxl_id: int, address: int, data_length: int) -> bool:
+        if not self.last_result or dxl_id not in self.data_dict:
+            return False
+
+        for entry_id, start_addr, entry_length in self.layout:
+            if entry_id == dxl_id:
+                return start_addr <= address and address + data_length <= start_addr + entry_length
+        return False
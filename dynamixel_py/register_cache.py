@@ -0,0 +1,92 @@
+import time
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+from .dynamixel_control_tables import Register
+
+__all__ = ["RegisterCache"]
+
+# Writable registers the firmware changes by itself: a hardware error shutdown turns the torque off and
+# blinks the LED, without any status packet for a sync write to notice. They are treated like read-only
+# registers, so writes to them are always sent.
+SELF_CHANGING_REGISTERS = frozenset({"TORQUE_ENABLE", "LED"})
+# The firmware moves the goals to the present state when the torque changes, eg: after a shutdown
+GOAL_REGISTERS = ("GOAL_POSITION", "GOAL_VELOCITY", "GOAL_CURRENT", "GOAL_PWM")
+
+
+class RegisterCache:
+    # Shadow copy of the register values last written to or read from one servo.
+    # Writable registers only change when written, so their cached values are served until they are
+    # overwritten or invalidated. Read-only RAM registers (present position, temperature, ...) change
+    # on their own and are only served while they are younger than ttl seconds, so the default of 0
+    # always reads them from the servo. The same goes for SELF_CHANGING_REGISTERS.
+
+    def __init__(self, ttl: float = 0.0):
+        if ttl < 0:
+            raise ValueError("ttl must not be negative")
+        self.ttl = ttl
+        self._values: Dict[str, Tuple[int, float]] = {}
+        # Registers with a write staged by REG_WRITE, which the servo applies whenever an ACTION comes
+        self._staged: Set[str] = set()
+
+        self.hits = 0
+        self.suppressed_writes = 0
+
+    @staticmethod
+    def is_volatile(register: Register) -> bool:
+        return register.area == "RAM" and (
+            register.access == "R" or register.name in SELF_CHANGING_REGISTERS
+        )
+
+    def get(self, register: Register) -> Optional[int]:
+        if register.name in self._staged:
+            return None
+        entry = self._values.get(register.name)
+        if entry is None:
+            return None
+
+        value, timestamp = entry
+        if self.is_volatile(register) and time.perf_counter() - timestamp > self.ttl:
+            return None
+        return value
+
+    def update(self, register: Register, value: int) -> None:
+        self._values[register.name] = (value, time.perf_counter())
+        if register.name == "TORQUE_ENABLE":
+            for name in GOAL_REGISTERS:
+                self._values.pop(name, None)
+
+    def invalidate(self, register: str = None) -> None:
+        # Drops one register, or everything when called without one, eg: after a reboot or hardware error
+        if register is None:
+            self._values.clear()
+        else:
+            self._values.pop(register, None)
+
+    def stage(self, register: Register) -> None:
+        # Staged registers are never served until clear_staged is called after the ACTION
+        self._values.pop(register.name, None)
+        self._staged.add(register.name)
+
+    def clear_staged(self) -> None:
+        for name in self._staged:
+            self._values.pop(name, None)
+        self._staged.clear()
+
+    def read(self, register: Register) -> Optional[int]:
+        # Cached value for a read, or None if the servo has to be read
+        value = self.get(register)
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def is_unchanged(self, register: Register, value: int) -> bool:
+        # True if the register is known to hold value already. Read-only registers are never written.
+        return not self.is_volatile(register) and self.get(register) == value
+
+    def skip_write(self, registers: Sequence[Register], values: Sequence[int]) -> bool:
+        # True if writing values would not change any of the registers, the write is then counted as
+        # suppressed and should not be sent
+        if all(self.is_unchanged(register, value) for register, value in zip(registers, values)):
+            self.suppressed_writes += 1
+            return True
+        return False
@@ -0,0 +1,308 @@
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+from dynamixel_sdk.port_handler import LATENCY_TIMER
+from dynamixel_sdk.robotis_def import COMM_RX_TIMEOUT, COMM_SUCCESS
+
+from .dynamixel_control_tables import Register
+from .servo_group import ServoGroup
+from .utilities import DxlUtils
+
+__all__ = ["PartialRead", "ServoHealth", "ResilientReader"]
+
+utils = DxlUtils()
+
+
+class PartialRead(NamedTuple):
+    # One entry per servo in the order they were added, servos that did not answer have None
+    values: List[Optional[float]]
+    valid: List[bool]
+    timestamp: float
+    attempts: int
+
+    def is_complete(self) -> bool:
+        return all(self.valid)
+
+
+class ServoHealth:
+    # Outcome of the last reads of one servo, a read succeeded if any of its attempts did
+
+    def __init__(self, window: int):
+        self.results = deque(maxlen=window)
+        self.reads = 0
+        self.failures = 0
+        self.quarantined = False
+        self.last_probe = 0.0
+
+    def record(self, success: bool) -> None:
+        self.results.append(success)
+        self.reads += 1
+        if not success:
+            self.failures += 1
+
+    def get_error_rate(self) -> float:
+        return self.results.count(False) / len(self.results) if self.results else 0.0
+
+
+class ResilientReader:
+    # Reads one register of every servo of a group without raising on communication errors, for
+    # control loops that would rather run a cycle with one stale servo than stall. Servos missing
+    # from a sync read (lost or corrupt status packet) are read again without the others, up to
+    # max_retries times and only while the retry still fits in cycle_budget seconds.
+    #
+    # The SDK waits 2 * LATENCY_TIMER + 2 ms (34 ms) past the expected packet time before giving up
+    # on a status packet. With adaptive_timeout, the timeout is instead taken from the response
+    # times measured so far (smoothed time + 4 deviations, like TCP's retransmission timeout), once
+    # warmup reads completed. Servos failing at least quarantine_error_rate of their last reads, even
+    # after the retries, are quarantined: they are left out of the reads and only probed every
+    # probe_interval seconds until they answer again.
+    #
+    # Sync reads are used on Protocol 2.0, servos are read one by one on Protocol 1.0. Fast Sync
+    # Read is not used, a single corrupt byte would lose every servo of its combined status packet.
+
+    def __init__(
+        self,
+        group: ServoGroup,
+        max_retries: int = 2,
+        cycle_budget: float = None,
+        adaptive_timeout: bool = True,
+        min_timeout: float = 0.002,
+        warmup: int = 10,
+        quarantine_error_rate: Optional[float] = 0.5,
+        error_window: int = 50,
+        min_samples: int = 10,
+        probe_interval: float = 1.0,
+    ):
+        if max_retries < 0:
+            raise ValueError("max_retries must not be negative")
+        if cycle_budget is not None and cycle_budget <= 0:
+            raise ValueError("cycle_budget must be greater than 0")
+        if quarantine_error_rate is not None and not 0 < quarantine_error_rate <= 1:
+            raise ValueError("quarantine_error_rate must be between 0 and 1")
+        if min_samples > error_window:
+            raise ValueError("min_samples must not be greater than error_window")
+
+        self.group = group
+        self.max_retries = max_retries
+        self.cycle_budget = cycle_budget
+        self.adaptive_timeout = adaptive_timeout
+        self.min_timeout = min_timeout
+        self.warmup = warmup
+        self.quarantine_error_rate = quarantine_error_rate
+        self.error_window = error_window
+        self.min_samples = min_samples
+        self.probe_interval = probe_interval
+
+        self.health: Dict[int, ServoHealth] = {}
+        # Smoothed time the status packets take on top of their bytes (USB latency, return delay)
+        self._latency = 0.0
+        self._latency_deviation = 0.0
+        self._latency_samples = 0
+
+        self.reads = 0
+        self.incomplete_reads = 0
+        self.retries = 0
+
+    def _get_health(self, dxl_id: int) -> ServoHealth:
+        health = self.health.get(dxl_id)
+        if health is None:
+            health = self.health[dxl_id] = ServoHealth(self.error_window)
+        return health
+
+    def get_timeout(self, port, status_length: int) -> float:
+        # Seconds to wait for status_length bytes of status packets. Until warmup reads completed or
+        # without adaptive_timeout, this is the timeout the SDK would use.
+        wire_time = port.tx_time_per_byte * status_length / 1000
+        if not self.adaptive_timeout or self._latency_samples < self.warmup:
+            return wire_time + (2.0 * LATENCY_TIMER + 2.0) / 1000
+        return max(self.min_timeout, wire_time + self._latency + 4 * self._latency_deviation)
+
+    def _record_response_time(self, port, status_length: int, response_time: float) -> None:
+        # Only the time on top of the status bytes is estimated, so the estimate holds for reads of
+        # any number of servos
+        latency = max(0.0, response_time - port.tx_time_per_byte * status_length / 1000)
+        if self._latency_samples == 0:
+            self._latency = latency
+            self._latency_deviation = latency / 2
+        else:
+            self._latency_deviation = (
+                0.75 * self._latency_deviation + 0.25 * abs(self._latency - latency)
+            )
+            self._latency = 0.875 * self._latency + 0.125 * latency
+        self._latency_samples += 1
+
+    def _sync_read(self, servo, reg: Register, servo_ids: List[int]) -> Dict[int, bytes]:
+        # Collects every status packet that arrives before the timeout, instead of giving up at the
+        # first missing one like GroupSyncRead
+        port = servo.port_handler
+        packet_h = servo.packet_handler
+        status_length = (reg.size + 11) * len(servo_ids)
+
+        comm_result = packet_h.syncReadTx(
+            port, reg.address, reg.size, servo_ids, len(servo_ids), False
+        )
+        if comm_result != COMM_SUCCESS:
+            return {}
+
+        tx_time = time.perf_counter()
+        port.setPacketTimeoutMillis(self.get_timeout(port, status_length) * 1000)
+
+        received = {}
+        while len(received) < len(servo_ids):
+            rxpacket, comm_result = packet_h.rxPacket(port, False)
+            if comm_result == COMM_SUCCESS:
+                if rxpacket[4] in servo_ids:
+                    received[rxpacket[4]] = bytes(rxpacket[9 : 9 + reg.size])
+            elif comm_result == COMM_RX_TIMEOUT:
+                break
+            # A corrupt packet is dropped, the status packets of the other servos may still follow
+
+        if len(received) == len(servo_ids):
+            self._record_response_time(port, status_length, time.perf_counter() - tx_time)
+        return received
+
+    def _read_each(self, servo, reg: Register, servo_ids: List[int]) -> Dict[int, bytes]:
+        port = servo.port_handler
+        packet_h = servo.packet_handler
+        status_length = reg.size + 6
+
+        received = {}
+        for dxl_id in servo_ids:
+            if packet_h.readTx(port, dxl_id, reg.address, reg.size) != COMM_SUCCESS:
+                continue
+
+            tx_time = time.perf_counter()
+            port.setPacketTimeoutMillis(self.get_timeout(port, status_length) * 1000)
+
+            data, comm_result, _ = packet_h.readRx(port, dxl_id, reg.size)
+            if comm_result == COMM_SUCCESS:
+                received[dxl_id] = bytes(data)
+                self._record_response_time(port, status_length, time.perf_counter() - tx_time)
+        return received
+
+    def _get_attempt_time(self, servo, reg: Register, total_servos: int) -> float:
+        # Longest an attempt at reading total_servos servos can take
+        if servo.protocol_version == 1:
+            return self.get_timeout(servo.port_handler, reg.size + 6) * total_servos
+        return self.get_timeout(servo.port_handler, (reg.size + 11) * total_servos)
+
+    def read(self, register: str = "PRESENT_POSITION") -> PartialRead:
+        # Raw register values, one per servo
+        start_time = time.perf_counter()
+        ref_servo = self.group._get_ref_servo()
+        reg = ref_servo.control_table.get_register(register)
+        transact = self._read_each if ref_servo.protocol_version == 1 else self._sync_read
+
+        servo_ids = []
+        for dxl_id in self.group.servos:
+            health = self._get_health(dxl_id)
+            if health.quarantined:
+                if start_time - health.last_probe < self.probe_interval:
+                    continue
+                health.last_probe = start_time
+            servo_ids.append(dxl_id)
+
+        data: Dict[int, bytes] = {}
+        pending = servo_ids
+        attempts = 0
+        while pending:
+            if attempts > 0:
+                # Retries only go to the servos that are not quarantined
+                pending = [dxl_id for dxl_id in pending if not self.health[dxl_id].quarantined]
+                if not pending or attempts > self.max_retries:
+                    break
+                if self.cycle_budget is not None:
+                    attempt_time = self._get_attempt_time(ref_servo, reg, len(pending))
+                    if time.perf_counter() - start_time + attempt_time > self.cycle_budget:
+                        break
+                self.retries += 1
+
+            received = transact(ref_servo, reg, pending)
+            attempts += 1
+            data.update(received)
+            pending = [dxl_id for dxl_id in pending if dxl_id not in received]
+
+        # Recorded once per read, so retries that recover a servo do not count against it
+        for dxl_id in servo_ids:
+            self._record_result(dxl_id, dxl_id in data)
+
+        values = []
+        valid = []
+        for dxl_id, servo in self.group.servos.items():
+            if dxl_id in data:
+                value = reg.decode(data[dxl_id])
+                if servo.cache is not None:
+                    servo.cache.update(reg, value)
+                values.append(value)
+                valid.append(True)
+            else:
+                values.append(None)
+                valid.append(False)
+
+        self.reads += 1
+        if not all(valid):
+            self.incomplete_reads += 1
+        return PartialRead(values, valid, time.time(), attempts)
+
+    def _record_result(self, dxl_id: int, success: bool) -> None:
+        health = self.health[dxl_id]
+        health.record(success)
+
+        if health.quarantined and success:
+            health.quarantined = False
+            health.results.clear()
+            print(f"Servo with id {dxl_id} answered again, releasing it from quarantine")
+
+        elif (
+            not health.quarantined
+            and self.quarantine_error_rate is not None
+            and len(health.results) >= self.min_samples
+            and health.get_error_rate() >= self.quarantine_error_rate
+        ):
+            self.quarantine(dxl_id)
+
+    def get_positions(self, is_radian: bool = False) -> PartialRead:
+        raw_read = self.read("PRESENT_POSITION")
+        positions = [
+            None
+            if raw_position is None
+            else utils.pulse_to_angle(
+                pulse=raw_position, mid_val=servo.middle_pos_val, is_radian=is_radian
+            )
+            for servo, raw_position in zip(self.group.servos.values(), raw_read.values)
+        ]
+        return raw_read._replace(values=positions)
+
+    def quarantine(self, dxl_id: int) -> None:
+        health = self._get_health(dxl_id)
+        if not health.quarantined:
+            health.quarantined = True
+            health.last_probe = time.perf_counter()
+            print(
+                f"Quarantining servo with id {dxl_id}, "
+                f"{health.get_error_rate():.0%} of its last reads failed"
+            )
+
+    def release(self, dxl_id: int) -> None:
+        health = self._get_health(dxl_id)
+        health.quarantined = False
+        health.results.clear()
+
+    def get_quarantined(self) -> List[int]:
+        return [dxl_id for dxl_id, health in self.health.items() if health.quarantined]
+
+    def get_stats(self) -> Dict:
+        # Latencies are in seconds, they are only used once warmup reads completed
+        return {
+            "reads": self.reads,
+            "incomplete_reads": self.incomplete_reads,
+            "retries": self.retries,
+            "latency": self._latency,
+            "latency_deviation": self._latency_deviation,
+            "adaptive_timeout": self.adaptive_timeout and self._latency_samples >= self.warmup,
+            "error_rates": {
+                dxl_id: health.get_error_rate() for dxl_id, health in self.health.items()
+            },
+            "quarantined": self.get_quarantined(),
+        }
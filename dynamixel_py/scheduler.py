@@ -0,0 +1,338 @@
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+from dynamixel_sdk import GroupBulkRead, GroupSyncRead, GroupSyncWrite
+
+from .dynamixel_control_tables import Register
+from .dynamixel_handler import Servo
+from .protocol1 import Protocol1GroupRead
+from .utilities import DxlUtils
+
+__all__ = ["BusScheduler"]
+
+utils = DxlUtils()
+
+
+class _Request(NamedTuple):
+    priority: int
+    sequence: int
+    kind: str  # "read", "write" or "call"
+    servo: Optional[Servo]
+    register: Optional[Register]
+    value: Optional[int]
+    func: Optional[Callable]
+    future: Future
+
+
+class BusScheduler:
+    # Owns one port from a worker thread and runs requests queued from any thread. Every tick takes
+    # all pending requests and merges them: writes to the same register of several servos become one
+    # sync write, reads of the same register one sync read and reads of different registers one bulk
+    # read. On Protocol 1.0 buses all reads are merged into one Protocol1GroupRead, which bulk reads
+    # the MX servos and reads the others back to back. Batches run in order of their highest
+    # priority, then arrival. Within a tick the newest write to a register of a servo wins and
+    # ordering is only kept between batches.
+    #
+    # With rate_hz, ticks run at that rate so requests arriving in between are merged, otherwise a
+    # tick starts as soon as a request arrives and whatever queues up during the I/O is merged.
+
+    def __init__(self, port_handler, rate_hz: float = None):
+        if rate_hz is not None and rate_hz <= 0:
+            raise ValueError("rate_hz must be greater than 0")
+
+        self.port_handler = port_handler
+        self.period = 1.0 / rate_hz if rate_hz else None
+
+        self._condition = threading.Condition()
+        self._pending: List[_Request] = []
+        self._sequence = itertools.count()
+        self._stopping = False
+        self._thread = None
+
+        self.ticks = 0
+        self.requests = 0
+        self.transactions = 0
+
+    def _check_servo(self, servo: Servo) -> None:
+        if servo.port_handler is not self.port_handler:
+            raise ValueError(f"Servo with id {servo.servo_id} is not on the port of the scheduler")
+
+    def _queue(self, request_args: tuple, priority: int) -> Future:
+        future = Future()
+        with self._condition:
+            if self._stopping or not self.is_running():
+                raise RuntimeError("The scheduler is not running, call start first")
+            self._pending.append(_Request(priority, next(self._sequence), *request_args, future))
+            self._condition.notify()
+        return future
+
+    def read(self, servo: Servo, register: str, priority: int = 0) -> Future:
+        # The future resolves to the decoded register value
+        self._check_servo(servo)
+        reg = servo.control_table.get_register(register)
+        return self._queue(("read", servo, reg, None, None), priority)
+
+    def write(self, servo: Servo, register: str, value: int, priority: int = 0) -> Future:
+        # Group writes have no status packet, the future only reports communication errors
+        self._check_servo(servo)
+        reg = servo.control_table.get_register(register)
+        if reg.access == "R":
+            raise ValueError(f"Register {register} is read only")
+        reg.encode(value)  # Raising out of range values in the caller's thread
+        return self._queue(("write", servo, reg, value, None), priority)
+
+    def submit(self, func: Callable, *args, priority: int = 0, **kwargs) -> Future:
+        # Runs any other call that needs the port, eg: group.sync_get_positions, on the worker thread
+        return self._queue(
+            ("call", None, None, None, lambda: func(*args, **kwargs)), priority
+        )
+
+    def get_position(self, servo: Servo, is_radian: bool = False, priority: int = 0) -> float:
+        raw_position = self.read(servo, "PRESENT_POSITION", priority).result()
+        return utils.pulse_to_angle(
+            pulse=raw_position, mid_val=servo.middle_pos_val, is_radian=is_radian
+        )
+
+    def set_position(
+        self, servo: Servo, goal_pos: float, radian: bool = False, priority: int = 0
+    ) -> Future:
+        goal_pulse = utils.angle_to_pulse(
+            angle=goal_pos, mid_val=servo.middle_pos_val, is_radian=radian
+        )
+        return self.write(servo, "GOAL_POSITION", goal_pulse, priority)
+
+    def attach(self, servos: Union[Servo, List[Servo]]) -> None:
+        # Servo.read_register/write_register (and so get_position, set_position, torque_enabled, ...)
+        # of attached servos go through the scheduler, which makes them safe to call from any thread
+        if not isinstance(servos, list):
+            servos = [servos]
+        for servo in servos:
+            self._check_servo(servo)
+            servo.scheduler = self
+
+    def detach(self, servos: Union[Servo, List[Servo]]) -> None:
+        if not isinstance(servos, list):
+            servos = [servos]
+        for servo in servos:
+            if servo.scheduler is self:
+                servo.scheduler = None
+
+    def is_worker_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def start(self) -> None:
+        if self.is_running():
+            raise RuntimeError("Scheduler is already running")
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="dxl-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        # Requests already queued are still sent before the worker exits
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "ticks": self.ticks,
+            "requests": self.requests,
+            "transactions": self.transactions,
+        }
+
+    def _run(self) -> None:
+        next_tick = time.perf_counter()
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+
+            if self.period is not None:
+                next_tick = max(next_tick + self.period, time.perf_counter())
+                sleep_time = next_tick - time.perf_counter()
+                if sleep_time > 0 and not self._stopping:
+                    time.sleep(sleep_time)
+
+            with self._condition:
+                requests, self._pending = self._pending, []
+
+            self.ticks += 1
+            self.requests += len(requests)
+            self._run_tick(requests)
+
+    def _run_tick(self, requests: List[_Request]) -> None:
+        # Batches are keyed so that everything in one batch can go out as a single packet
+        batches: Dict[tuple, List[_Request]] = {}
+        for request in requests:
+            if request.kind == "call":
+                key = ("call", request.sequence)
+            elif request.kind == "write":
+                key = ("write", request.servo.protocol_version, request.register.address, request.register.size)
+            else:
+                key = ("read", request.servo.protocol_version)
+            batches.setdefault(key, []).append(request)
+
+        ordered_batches = sorted(
+            batches.items(),
+            key=lambda item: (
+                -max(request.priority for request in item[1]),
+                min(request.sequence for request in item[1]),
+            ),
+        )
+
+        for key, batch in ordered_batches:
+            try:
+                if key[0] == "call":
+                    self._run_call(batch[0])
+                elif key[0] == "write":
+                    self._run_writes(batch)
+                else:
+                    self._run_reads(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _run_call(self, request: _Request) -> None:
+        if request.future.set_running_or_notify_cancel():
+            self.transactions += 1
+            request.future.set_result(request.func())
+
+    def _run_writes(self, batch: List[_Request]) -> None:
+        # Keeping only the newest value per servo, every future of a coalesced write gets the result
+        latest: Dict[int, _Request] = {}
+        for request in batch:
+            latest[request.servo.servo_id] = request
+        servos = [request.servo for request in latest.values()]
+        packet_h = servos[0].packet_handler
+        register = batch[0].register
+
+        if len(latest) == 1:
+            request = next(iter(latest.values()))
+            comm_result, error = packet_h.writeTxRx(
+                self.port_handler,
+                request.servo.servo_id,
+                register.address,
+                register.size,
+                list(register.encode(request.value)),
+            )
+            self.transactions += 1
+            utils.print_comm_hardware_error(
+                pack_h_instance=packet_h, comm_result=comm_result, hardware_result=error
+            )
+        else:
+            sync_write = GroupSyncWrite(self.port_handler, packet_h, register.address, register.size)
+            for dxl_id, request in latest.items():
+                sync_write.addParam(dxl_id, list(register.encode(request.value)))
+            comm_result = sync_write.txPacket()
+            self.transactions += 1
+            utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+
+        for request in latest.values():
+            if request.servo.cache is not None:
+                request.servo.cache.update(register, request.value)
+
+        for request in batch:
+            if not request.future.done():
+                request.future.set_result(None)
+
+    def _run_reads(self, batch: List[_Request]) -> None:
+        # One read per (servo, register) no matter how many callers asked for it
+        wanted: Dict[tuple, List[_Request]] = {}
+        for request in batch:
+            wanted.setdefault((request.servo.servo_id, request.register), []).append(request)
+
+        packet_h = batch[0].servo.packet_handler
+        servo_ids = [dxl_id for dxl_id, _ in wanted]
+        registers = {register for _, register in wanted}
+
+        if len(wanted) == 1:
+            (dxl_id, register), _ = next(iter(wanted.items()))
+            data, comm_result, error = packet_h.readTxRx(
+                self.port_handler, dxl_id, register.address, register.size
+            )
+            self.transactions += 1
+            utils.print_comm_hardware_error(
+                pack_h_instance=packet_h, comm_result=comm_result, hardware_result=error
+            )
+            results = {(dxl_id, register): register.decode(data)}
+
+        elif (
+            len(registers) == 1
+            and len(set(servo_ids)) == len(servo_ids)
+            and batch[0].servo.protocol_version == 2
+        ):
+            register = next(iter(registers))
+            sync_read = GroupSyncRead(self.port_handler, packet_h, register.address, register.size)
+            for dxl_id in servo_ids:
+                sync_read.addParam(dxl_id)
+            comm_result = sync_read.txRxPacket()
+            self.transactions += 1
+            utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+            results = {
+                (dxl_id, register): register.decode(sync_read.data_dict[dxl_id])
+                for dxl_id in servo_ids
+            }
+
+        else:
+            servos = {request.servo.servo_id: request.servo for request in batch}
+            results = self._bulk_read(packet_h, list(wanted), servos)
+
+        for key, requests in wanted.items():
+            servo = requests[0].servo
+            if servo.cache is not None:
+                servo.cache.update(key[1], results[key])
+            for request in requests:
+                if request.future.set_running_or_notify_cancel():
+                    request.future.set_result(results[key])
+
+    def _bulk_read(
+        self, packet_h, wanted: List[tuple], servos: Dict[int, Servo]
+    ) -> Dict[tuple, int]:
+        # A bulk read reads one block per servo, so the registers of a servo are covered by the block
+        # spanning all of them and decoded from it
+        blocks: Dict[int, List[Register]] = {}
+        for dxl_id, register in wanted:
+            blocks.setdefault(dxl_id, []).append(register)
+
+        layout = []
+        for dxl_id, registers in blocks.items():
+            start_addr = min(register.address for register in registers)
+            end_addr = max(register.address + register.size for register in registers)
+            layout.append((dxl_id, start_addr, end_addr - start_addr))
+        spans = {dxl_id: start_addr for dxl_id, start_addr, _ in layout}
+
+        is_protocol1 = servos[layout[0][0]].protocol_version == 1
+        if is_protocol1:
+            # Protocol 1.0 has no sync read and only MX servos answer a bulk read
+            bulk_ids = [
+                dxl_id for dxl_id in blocks if servos[dxl_id].control_table.SUPPORTS_BULK_READ
+            ]
+            bulk_read = Protocol1GroupRead(self.port_handler, packet_h, tuple(layout), bulk_ids)
+        else:
+            bulk_read = GroupBulkRead(self.port_handler, packet_h)
+            for entry in layout:
+                bulk_read.addParam(*entry)
+
+        comm_result = bulk_read.txRxPacket()
+        self.transactions += 1
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+
+        results = {}
+        for dxl_id, register in wanted:
+            # Bulk read entries are [data, start_address, data_length], Protocol 1.0 reads only
+            # hold the data
+            data = bulk_read.data_dict[dxl_id] if is_protocol1 else bulk_read.data_dict[dxl_id][0]
+            offset = register.address - spans[dxl_id]
+            results[(dxl_id, register)] = register.decode(data[offset : offset + register.size])
+        return results
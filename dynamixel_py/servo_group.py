@@ -1,24 +1,73 @@
 from .dynamixel_handler import *
-from typing import Union, Dict, List
-from dynamixel_sdk import GroupSyncRead, GroupSyncWrite
-from .utilities import DxlUtils
+from typing import Union, Dict, List, Optional, Tuple
+from dynamixel_sdk import GroupSyncRead, GroupSyncWrite, GroupBulkRead, GroupBulkWrite
+from dynamixel_sdk.robotis_def import BROADCAST_ID, COMM_SUCCESS
+from .protocol1 import Protocol1GroupRead
+from .utilities import DxlUtils, import_numpy
+from math import isfinite, pi
 
 utils = DxlUtils()
 
+# Fast reads failing this many times in a row, each time with a normal read working right after, mean
+# the firmware does not support them
+FAST_READ_MAX_FAILURES = 3
+
+
+def _get_register_info(control_table, register: str) -> Tuple[int, int]:
+    reg = control_table.get_register(register)
+    return reg.address, reg.size
+
+
+def _get_register_range(reg: Register) -> Tuple[int, int]:
+    bits = 8 * reg.size
+    if reg.signed:
+        return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    return 0, (1 << bits) - 1
+
 
 class ServoGroup:
     def __init__(self):
         self.servos: Dict[int, Servo] = {}
         self.total_servos = 0
 
+        # Group handlers are kept alive between calls and keyed by (start_addr, data_length).
+        # They are rebuilt lazily whenever the group membership changes.
+        # Protocol 1.0 groups use a Protocol1GroupRead in place of the sync and bulk readers.
+        self._sync_readers: Dict[Tuple[int, int], GroupSyncRead] = {}
+        self._sync_writers: Dict[Tuple[int, int], GroupSyncWrite] = {}
+        # Bulk handlers are keyed by the (servo_id, start_addr, data_length) layout they were built for
+        self._bulk_readers: Dict[Tuple, GroupBulkRead] = {}
+        self._bulk_writers: Dict[Tuple, GroupBulkWrite] = {}
+
+        # Fast Sync/Bulk Read needs recent Protocol 2.0 firmware, these are cleared once it proves unsupported
+        self._fast_sync_read_supported = True
+        self._fast_bulk_read_supported = True
+        # Fast reads failed in a row while the normal read right after them worked
+        self._fast_sync_read_failures = 0
+        self._fast_bulk_read_failures = 0
+
+        # Per-servo calibration and packet buffers used by the ndarray based methods
+        self._array_calibration = None
+        self._array_buffers = None
+
+        # Registers mapped into the Indirect Data block by map_indirect_registers
+        self._indirect_layout = None
+
     def _add_servo(self, servo: Servo):
         if servo.servo_id in self.servos:
             raise ValueError(f"Servo with id {servo.servo_id} already exists.")
 
+        elif self.servos and servo.port_handler is not self._get_ref_servo().port_handler:
+            raise ValueError(
+                f"Servo with id {servo.servo_id} is on a different port than the group, "
+                f"use MultiBusGroup for servos spread over several ports"
+            )
+
         else:
             self.servos[servo.servo_id] = servo
             print(f"Added servo with id {servo.servo_id}")
             self.total_servos += 1
+            self._reset_group_state()
 
     def add_servos(self, servo_list: Union[Servo, List[Servo]]):
         if isinstance(servo_list, list):
@@ -31,6 +80,7 @@ class ServoGroup:
         if servo.servo_id in self.servos:
             del self.servos[servo.servo_id]
             self.total_servos -= 1
+            self._reset_group_state()
         else:
             raise ValueError(f"Unable to find servo with id {servo.servo_id}")
 
@@ -43,6 +93,7 @@ class ServoGroup:
 
     def remove_all_servos(self):
         self.servos.clear()
+        self._reset_group_state()
 
     def get_total_servos(self):
         return self.total_servos
@@ -50,96 +101,887 @@ class ServoGroup:
     def print_group_info(self):
         pass
 
-    def sync_get_positions(self, is_radian: bool = False):
-        ref_servo = self.servos[
-            list(self.servos)[0]  # Taking the first servo's config as reference
+    def enable_metrics(self, metrics: BusMetrics) -> None:
+        # Instruments the servos of the group, servos added later have to be instrumented separately
+        for servo in self.servos.values():
+            servo.enable_metrics(metrics)
+        self._reset_group_handlers()
+
+    def disable_metrics(self) -> None:
+        for servo in self.servos.values():
+            servo.disable_metrics()
+        self._reset_group_handlers()
+
+    def enable_fast_codec(self) -> None:
+        # Like enable_metrics, servos added later have to be switched separately
+        for servo in self.servos.values():
+            servo.enable_fast_codec()
+        self._reset_group_handlers()
+
+    def disable_fast_codec(self) -> None:
+        for servo in self.servos.values():
+            servo.disable_fast_codec()
+        self._reset_group_handlers()
+
+    def enable_cache(self, ttl: float = 0.0) -> None:
+        # Gives every servo of the group a RegisterCache, group writes then only send the servos whose
+        # value changed and reads are served from the caches when every servo can answer
+        for servo in self.servos.values():
+            servo.enable_cache(ttl)
+
+    def disable_cache(self) -> None:
+        for servo in self.servos.values():
+            servo.disable_cache()
+
+    def _reset_group_handlers(self):
+        # Only the group handlers are bound to the packet handlers, switching metrics or the codec
+        # keeps everything else
+        self._sync_readers.clear()
+        self._sync_writers.clear()
+        self._bulk_readers.clear()
+        self._bulk_writers.clear()
+
+    def _reset_group_state(self):
+        # Everything built for the previous group membership
+        self._reset_group_handlers()
+        self._fast_sync_read_supported = True
+        self._fast_bulk_read_supported = True
+        self._fast_sync_read_failures = 0
+        self._fast_bulk_read_failures = 0
+        self._array_calibration = None
+        self._array_buffers = None
+        self._indirect_layout = None
+
+    def _get_ref_servo(self) -> Servo:
+        # Taking the first servo's config as reference
+        return self.servos[list(self.servos)[0]]
+
+    def _get_protocol1_read(self, layout: Tuple[Tuple[int, int, int], ...]) -> Protocol1GroupRead:
+        ref_servo = self._get_ref_servo()
+        bulk_ids = [
+            dxl_id
+            for dxl_id, servo in self.servos.items()
+            if servo.control_table.SUPPORTS_BULK_READ
         ]
-        port_h = ref_servo.port_handler
+        return Protocol1GroupRead(
+            ref_servo.port_handler, ref_servo.packet_handler, layout, bulk_ids
+        )
+
+    def _get_sync_read(self, start_addr: int, data_length: int) -> GroupSyncRead:
+        key = (start_addr, data_length)
+        sync_read = self._sync_readers.get(key)
+
+        if sync_read is None and self._get_ref_servo().protocol_version == 1:
+            # Protocol 1.0 has no sync read
+            sync_read = self._get_protocol1_read(
+                tuple((dxl_id, start_addr, data_length) for dxl_id in self.servos.keys())
+            )
+            self._sync_readers[key] = sync_read
+
+        elif sync_read is None:
+            ref_servo = self._get_ref_servo()
+            sync_read = GroupSyncRead(
+                ref_servo.port_handler, ref_servo.packet_handler, start_addr, data_length
+            )
+
+            for dxl_id in self.servos.keys():
+                sync_read.addParam(dxl_id=dxl_id)
+
+            # Building the parameter list once, every following txRxPacket reuses it
+            sync_read.makeParam()
+            self._sync_readers[key] = sync_read
+
+        return sync_read
+
+    def _get_sync_write(self, start_addr: int, data_length: int) -> GroupSyncWrite:
+        key = (start_addr, data_length)
+        sync_write = self._sync_writers.get(key)
+
+        if sync_write is None:
+            ref_servo = self._get_ref_servo()
+            sync_write = GroupSyncWrite(
+                port=ref_servo.port_handler,
+                ph=ref_servo.packet_handler,
+                start_address=start_addr,
+                data_length=data_length,
+            )
+
+            for dxl_id in self.servos.keys():
+                success = sync_write.addParam(dxl_id=dxl_id, data=[0] * data_length)
+                if not success:
+                    raise RuntimeError(
+                        f"Failed to add servo with id {dxl_id} to group_sync_write"
+                    )
+
+            self._sync_writers[key] = sync_write
+
+        return sync_write
+
+    def _sync_read_txrx(self, sync_read: GroupSyncRead, fast: bool) -> int:
+        if fast and self._fast_sync_read_supported:
+            if not hasattr(sync_read, "fastSyncRead"):
+                print("Fast sync read is not available in this SDK, falling back to sync read")
+                self._fast_sync_read_supported = False
+                return sync_read.txRxPacket()
+
+            comm_result = sync_read.fastSyncRead()
+            if comm_result == COMM_SUCCESS:
+                self._fast_sync_read_failures = 0
+                return comm_result
+
+            # Only giving up on fast reads after several in a row failed where a normal read worked, so
+            # noisy cycles do not disable it
+            comm_result = sync_read.txRxPacket()
+            if comm_result == COMM_SUCCESS:
+                self._fast_sync_read_failures += 1
+                if self._fast_sync_read_failures >= FAST_READ_MAX_FAILURES:
+                    print("Fast sync read is not supported, falling back to sync read")
+                    self._fast_sync_read_supported = False
+            return comm_result
+
+        return sync_read.txRxPacket()
+
+    def _bulk_read_txrx(self, bulk_read: GroupBulkRead, fast: bool) -> int:
+        if fast and self._fast_bulk_read_supported:
+            if not hasattr(bulk_read, "fastBulkRead"):
+                print("Fast bulk read is not available in this SDK, falling back to bulk read")
+                self._fast_bulk_read_supported = False
+                return bulk_read.txRxPacket()
+
+            comm_result = bulk_read.fastBulkRead()
+            if comm_result == COMM_SUCCESS:
+                self._fast_bulk_read_failures = 0
+                return comm_result
+
+            # Only giving up on fast reads after several in a row failed where a normal read worked, so
+            # noisy cycles do not disable it
+            comm_result = bulk_read.txRxPacket()
+            if comm_result == COMM_SUCCESS:
+                self._fast_bulk_read_failures += 1
+                if self._fast_bulk_read_failures >= FAST_READ_MAX_FAILURES:
+                    print("Fast bulk read is not supported, falling back to bulk read")
+                    self._fast_bulk_read_supported = False
+            return comm_result
+
+        return bulk_read.txRxPacket()
+
+    def _check_values_length(self, values: List) -> None:
+        if len(values) != self.total_servos:
+            raise ValueError(
+                f"Expected {self.total_servos} values, one per servo, but got {len(values)}"
+            )
+
+    def _get_register_block(
+        self, registers: List[str]
+    ) -> Tuple[int, int, List[Tuple[int, int]]]:
+        control_table = self._get_ref_servo().control_table
+
+        registers_info = [
+            _get_register_info(control_table, register) for register in registers
+        ]
+
+        # A single sync write can only cover one contiguous block of the control table
+        ordered_info = sorted(registers_info)
+        for (addr, length), (next_addr, _) in zip(ordered_info, ordered_info[1:]):
+            if addr + length != next_addr:
+                raise ValueError(
+                    f"Registers {registers} do not form a contiguous block in control table "
+                    f"{control_table.__name__}"
+                )
+
+        start_addr = ordered_info[0][0]
+        data_length = ordered_info[-1][0] + ordered_info[-1][1] - start_addr
+        layout = [(addr - start_addr, length) for addr, length in registers_info]
+
+        return start_addr, data_length, layout
+
+    def sync_write(self, registers: Union[str, List[str]], values: List) -> None:
+        # Writes raw register values for every servo in a single packet. values holds one entry per
+        # servo, which is a sequence with one value per register when a list of registers is given
+        is_single_register = isinstance(registers, str)
+        if is_single_register:
+            registers = [registers]
+
+        self._check_values_length(values)
+
+        ref_servo = self._get_ref_servo()
         packet_h = ref_servo.packet_handler
-        start_addr = ref_servo.control_table.ADDR_PRESENT_POSITION
-        data_length = 4
+        start_addr, data_length, layout = self._get_register_block(registers)
+        regs = [ref_servo.control_table.get_register(register) for register in registers]
+        for reg in regs:
+            if reg.access == "R":
+                raise ValueError(f"Register {reg.name} is read only")
+
+        writes = []
+        for (dxl_id, servo), servo_values in zip(self.servos.items(), values):
+            if is_single_register:
+                servo_values = [servo_values]
+
+            if len(servo_values) != len(layout):
+                raise ValueError(
+                    f"Expected {len(layout)} values for servo with id {dxl_id}, "
+                    f"but got {len(servo_values)}"
+                )
 
-        sync_read = GroupSyncRead(port_h, packet_h, start_addr, data_length)
+            param_data = [0] * data_length
+            for (offset, length), reg, value in zip(layout, regs, servo_values):
+                param_data[offset : offset + length] = reg.encode(value)
+
+            writes.append((servo, servo_values, param_data))
+
+        self._send_sync_write(regs, start_addr, data_length, writes)
+
+    def _send_sync_write(
+        self,
+        regs: List[Register],
+        start_addr: int,
+        data_length: int,
+        writes: List[Tuple[Servo, List[int], List[int]]],
+    ) -> None:
+        # writes holds (servo, register values, parameter data) for every servo. Servos with a cache
+        # that already hold the values are left out of the packet, nothing is sent if none changed.
+        changed = [
+            write
+            for write in writes
+            if write[0].cache is None or not write[0].cache.skip_write(regs, write[1])
+        ]
+        if not changed:
+            return
 
-        for dxl_id in self.servos.keys():
-            sync_read.addParam(dxl_id=dxl_id)
+        ref_servo = self._get_ref_servo()
+        packet_h = ref_servo.packet_handler
+
+        if len(changed) == self.total_servos:
+            sync_write = self._get_sync_write(start_addr, data_length)
+            for servo, _, param_data in changed:
+                success = sync_write.changeParam(dxl_id=servo.servo_id, data=param_data)
+                if not success:
+                    raise RuntimeError(
+                        f"Failed to set {[reg.name for reg in regs]} for servo with id {servo.servo_id}"
+                    )
+            comm_result = sync_write.txPacket()
+        else:
+            # Only the servos that changed, packed straight into the sync write parameters
+            param = []
+            for servo, _, param_data in changed:
+                param.append(servo.servo_id)
+                param.extend(param_data)
+            comm_result = packet_h.syncWriteTxOnly(
+                ref_servo.port_handler, start_addr, data_length, param, len(param)
+            )
 
-        comm_result = sync_read.txRxPacket()
         utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
 
-        current_positions = []
-        for dxl_id in self.servos.keys():
-            if sync_read.isAvailable(dxl_id, start_addr, data_length):
-                raw_position = sync_read.getData(dxl_id, start_addr, data_length)
+        for servo, servo_values, _ in changed:
+            if servo.cache is not None:
+                for reg, value in zip(regs, servo_values):
+                    servo.cache.update(reg, value)
+
+    def _get_cached_values(self, regs: List[Register]) -> Optional[List[int]]:
+        # One value per servo if every servo can serve its register from the cache, None otherwise
+        values = []
+        for servo, reg in zip(self.servos.values(), regs):
+            value = servo.cache.get(reg) if servo.cache is not None else None
+            if value is None:
+                return None
+            values.append(value)
+
+        for servo in self.servos.values():
+            servo.cache.hits += 1
+        return values
+
+    def _update_caches(self, regs: List[Register], values: List[int]) -> None:
+        for servo, reg, value in zip(self.servos.values(), regs, values):
+            if servo.cache is not None:
+                servo.cache.update(reg, value)
+
+    def sync_get_positions(self, is_radian: bool = False, fast: bool = False):
+        ref_servo = self._get_ref_servo()
+        packet_h = ref_servo.packet_handler
+        reg = ref_servo.control_table.get_register("PRESENT_POSITION")
+        start_addr = reg.address
+        data_length = reg.size
+        regs = [reg] * self.total_servos
 
-                angle = utils.pulse_to_angle(
-                    pulse=raw_position,
-                    mid_val=self.servos[dxl_id].middle_pos_val,
-                    is_radian=is_radian,
+        raw_positions = self._get_cached_values(regs)
+        if raw_positions is None:
+            sync_read = self._get_sync_read(start_addr, data_length)
+
+            comm_result = self._sync_read_txrx(sync_read, fast)
+            utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+
+            raw_positions = []
+            for dxl_id in self.servos.keys():
+                if sync_read.isAvailable(dxl_id, start_addr, data_length):
+                    raw_positions.append(reg.decode(sync_read.data_dict[dxl_id]))
+                else:
+                    raise RuntimeError(
+                        f"group_sync_read failed for servo with id: {dxl_id}"
+                    )
+            self._update_caches(regs, raw_positions)
+
+        return [
+            utils.pulse_to_angle(
+                pulse=raw_position, mid_val=servo.middle_pos_val, is_radian=is_radian
+            )
+            for servo, raw_position in zip(self.servos.values(), raw_positions)
+        ]
+
+    def _goal_position_to_pulse(self, servo: Servo, goal_position: float, is_radian: bool) -> int:
+        # int() raises ValueError for NaN but OverflowError for infinity
+        if not isfinite(goal_position):
+            raise ValueError(
+                f"Goal position {goal_position} for servo with id {servo.servo_id} is not finite"
+            )
+        return utils.angle_to_pulse(
+            angle=goal_position, mid_val=servo.middle_pos_val, is_radian=is_radian
+        )
+
+    def check_goal_positions(self, goal_positions: List[float], is_radian: bool = False) -> None:
+        # Raises the ValueError sync_set_positions would raise for these goals, without using the bus
+        self._check_values_length(goal_positions)
+
+        reg = self._get_ref_servo().control_table.get_register("GOAL_POSITION")
+        for servo, goal_position in zip(self.servos.values(), goal_positions):
+            reg.encode(self._goal_position_to_pulse(servo, goal_position, is_radian))
+
+    def sync_set_positions(self, goal_positions: List[float], is_radian: bool = False):
+        self._check_values_length(goal_positions)
+
+        ref_servo = self._get_ref_servo()
+        reg = ref_servo.control_table.get_register("GOAL_POSITION")
+
+        writes = []
+        for servo, goal_position in zip(self.servos.values(), goal_positions):
+            goal_pos = self._goal_position_to_pulse(servo, goal_position, is_radian)
+            writes.append((servo, [goal_pos], reg.encode(goal_pos)))
+
+        self._send_sync_write([reg], reg.address, reg.size, writes)
+
+    def sync_torques_enabled(self, is_enabled: bool = False):
+        reg = self._get_ref_servo().control_table.get_register("TORQUE_ENABLE")
+
+        value = 1 if is_enabled else 0
+        writes = [(servo, [value], [value]) for servo in self.servos.values()]
+        self._send_sync_write([reg], reg.address, reg.size, writes)
+
+    def stage_write(self, registers: Union[str, List[str]], values: List) -> None:
+        # Like sync_write, but every servo gets its values with REG_WRITE and only applies them on the
+        # next action(). There is no group REG_WRITE, so staging takes one transaction per servo, but
+        # the servos start together however long staging took. A servo holds one staged write, the
+        # registers of a call are staged as one block.
+        is_single_register = isinstance(registers, str)
+        if is_single_register:
+            registers = [registers]
+
+        self._check_values_length(values)
+
+        ref_servo = self._get_ref_servo()
+        start_addr, data_length, layout = self._get_register_block(registers)
+        regs = [ref_servo.control_table.get_register(register) for register in registers]
+        for reg in regs:
+            if reg.access == "R":
+                raise ValueError(f"Register {reg.name} is read only")
+
+        # Encoding every value first, so a bad value does not leave only some servos staged
+        params = []
+        for dxl_id, servo_values in zip(self.servos.keys(), values):
+            if is_single_register:
+                servo_values = [servo_values]
+
+            if len(servo_values) != len(layout):
+                raise ValueError(
+                    f"Expected {len(layout)} values for servo with id {dxl_id}, "
+                    f"but got {len(servo_values)}"
+                )
+
+            param_data = [0] * data_length
+            for (offset, length), reg, value in zip(layout, regs, servo_values):
+                param_data[offset : offset + length] = reg.encode(value)
+            params.append(param_data)
+
+        for servo, param_data in zip(self.servos.values(), params):
+            dxl_comm_result, dxl_error = servo.packet_handler.regWriteTxRx(
+                servo.port_handler, servo.servo_id, start_addr, data_length, param_data
+            )
+            servo._check_status(dxl_comm_result, dxl_error)
+            if servo.cache is not None:
+                for reg in regs:
+                    servo.cache.stage(reg)
+
+    def stage_positions(self, goal_positions: List[float], is_radian: bool = False) -> None:
+        self._check_values_length(goal_positions)
+
+        goal_pulses = []
+        for servo, goal_position in zip(self.servos.values(), goal_positions):
+            servo._set_goal_pos(angle=goal_position, is_radian=is_radian)
+            goal_pulses.append(servo.goal_pos)
+        self.stage_write("GOAL_POSITION", goal_pulses)
+
+    def action(self) -> None:
+        # One broadcast ACTION per protocol used by the group. Every servo on the port applies its
+        # staged write, including servos staged through other groups or on their own.
+        packet_handlers = {}
+        for servo in self.servos.values():
+            packet_handlers.setdefault(servo.protocol_version, servo.packet_handler)
+
+        port_h = self._get_ref_servo().port_handler
+        for packet_h in packet_handlers.values():
+            comm_result = packet_h.action(port_h, BROADCAST_ID)
+            utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+
+        for servo in self.servos.values():
+            if servo.cache is not None:
+                servo.cache.clear_staged()
+
+    def _get_bulk_registers(self, registers: Union[str, List[str]]) -> List[Register]:
+        # Every servo resolves the register against its own control table
+        if isinstance(registers, str):
+            registers = [registers] * self.total_servos
+
+        self._check_values_length(registers)
+
+        return [
+            servo.control_table.get_register(register)
+            for servo, register in zip(self.servos.values(), registers)
+        ]
+
+    def _get_bulk_layout(self, regs: List[Register]) -> Tuple[Tuple[int, int, int], ...]:
+        return tuple(
+            (dxl_id, reg.address, reg.size) for dxl_id, reg in zip(self.servos.keys(), regs)
+        )
+
+    def _get_bulk_read(self, layout: Tuple[Tuple[int, int, int], ...]) -> GroupBulkRead:
+        bulk_read = self._bulk_readers.get(layout)
+
+        if bulk_read is None and self._get_ref_servo().protocol_version == 1:
+            bulk_read = self._get_protocol1_read(layout)
+            self._bulk_readers[layout] = bulk_read
+
+        elif bulk_read is None:
+            ref_servo = self._get_ref_servo()
+            bulk_read = GroupBulkRead(ref_servo.port_handler, ref_servo.packet_handler)
+
+            for dxl_id, start_addr, data_length in layout:
+                success = bulk_read.addParam(
+                    dxl_id=dxl_id, start_address=start_addr, data_length=data_length
                 )
+                if not success:
+                    raise RuntimeError(
+                        f"Failed to add servo with id {dxl_id} to group_bulk_read"
+                    )
+
+            bulk_read.makeParam()
+            self._bulk_readers[layout] = bulk_read
+
+        return bulk_read
+
+    def _get_bulk_write(self, layout: Tuple[Tuple[int, int, int], ...]) -> GroupBulkWrite:
+        bulk_write = self._bulk_writers.get(layout)
+
+        if bulk_write is None:
+            ref_servo = self._get_ref_servo()
+            if ref_servo.protocol_version == 1:
+                raise RuntimeError("bulk_write is only available in Protocol 2.0")
+
+            bulk_write = GroupBulkWrite(ref_servo.port_handler, ref_servo.packet_handler)
+
+            for dxl_id, start_addr, data_length in layout:
+                success = bulk_write.addParam(
+                    dxl_id=dxl_id,
+                    start_address=start_addr,
+                    data_length=data_length,
+                    data=[0] * data_length,
+                )
+                if not success:
+                    raise RuntimeError(
+                        f"Failed to add servo with id {dxl_id} to group_bulk_write"
+                    )
+
+            self._bulk_writers[layout] = bulk_write
+
+        return bulk_write
+
+    def bulk_read(
+        self, registers: Union[str, List[str]] = "PRESENT_POSITION", fast: bool = False
+    ) -> List[int]:
+        # registers is either one register name used for every servo or one name per servo.
+        # Address and length are taken from each servo's own control table.
+        packet_h = self._get_ref_servo().packet_handler
+        regs = self._get_bulk_registers(registers)
+
+        cached_values = self._get_cached_values(regs)
+        if cached_values is not None:
+            return cached_values
 
-                current_positions.append(angle)
+        layout = self._get_bulk_layout(regs)
+
+        bulk_read = self._get_bulk_read(layout)
+
+        comm_result = self._bulk_read_txrx(bulk_read, fast)
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+
+        values = []
+        for (dxl_id, start_addr, data_length), reg in zip(layout, regs):
+            if bulk_read.isAvailable(dxl_id, start_addr, data_length):
+                # Bulk read entries are [data, start_address, data_length], Protocol 1.0 reads only
+                # hold the data
+                data = bulk_read.data_dict[dxl_id]
+                if not isinstance(bulk_read, Protocol1GroupRead):
+                    data = data[0]
+                values.append(reg.decode(data))
             else:
                 raise RuntimeError(
-                    f"group_sync_read failed for servo with id: {dxl_id}"
+                    f"group_bulk_read failed for servo with id: {dxl_id}"
                 )
 
-        sync_read.clearParam()
+        self._update_caches(regs, values)
+        return values
 
-        return current_positions
+    def bulk_write(self, registers: Union[str, List[str]], values: List[int]) -> None:
+        self._check_values_length(values)
 
-    def sync_set_positions(self, goal_positions: List[float], is_radian: bool = False):
-        ref_servo = self.servos[list(self.servos)[0]]
-        port_h = ref_servo.port_handler
+        ref_servo = self._get_ref_servo()
         packet_h = ref_servo.packet_handler
-        start_addr = ref_servo.control_table.ADDR_GOAL_POSITION
-        data_length = 4
+        regs = self._get_bulk_registers(registers)
+        for reg in regs:
+            if reg.access == "R":
+                raise ValueError(f"Register {reg.name} is read only")
+        layout = self._get_bulk_layout(regs)
+
+        # Servos with a cache that already hold their value are left out of the packet
+        changed = [
+            (entry, reg, value)
+            for entry, reg, value, servo in zip(layout, regs, values, self.servos.values())
+            if servo.cache is None or not servo.cache.skip_write([reg], [value])
+        ]
+        if not changed:
+            return
+
+        if ref_servo.protocol_version == 1:
+            comm_result = self._protocol1_bulk_write(changed)
+        elif len(changed) == self.total_servos:
+            bulk_write = self._get_bulk_write(layout)
+
+            for (dxl_id, start_addr, data_length), reg, value in changed:
+                success = bulk_write.changeParam(
+                    dxl_id=dxl_id,
+                    start_address=start_addr,
+                    data_length=data_length,
+                    data=list(reg.encode(value)),
+                )
+                if not success:
+                    raise RuntimeError(f"Failed to bulk write servo with id {dxl_id}")
 
-        sync_write = GroupSyncWrite(
-            port=port_h, ph=packet_h, start_address=start_addr, data_length=data_length
-        )
+            comm_result = bulk_write.txPacket()
+        else:
+            # Bulk write parameters are [id, address, length, data] per servo
+            param = []
+            for (dxl_id, start_addr, data_length), reg, value in changed:
+                param.append(dxl_id)
+                param.extend(start_addr.to_bytes(2, "little"))
+                param.extend(data_length.to_bytes(2, "little"))
+                param.extend(reg.encode(value))
+            comm_result = packet_h.bulkWriteTxOnly(ref_servo.port_handler, param, len(param))
 
-        for i, dxl_id in enumerate(self.servos.keys()):
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+
+        for ((dxl_id, _, _), reg, value) in changed:
+            cache = self.servos[dxl_id].cache
+            if cache is not None:
+                cache.update(reg, value)
+
+    def _protocol1_bulk_write(
+        self, changed: List[Tuple[Tuple[int, int, int], Register, int]]
+    ) -> int:
+        # Protocol 1.0 has no bulk write, servos writing the same register share one sync write
+        ref_servo = self._get_ref_servo()
+        packet_h = ref_servo.packet_handler
+
+        params: Dict[Tuple[int, int], List[int]] = {}
+        for (dxl_id, start_addr, data_length), reg, value in changed:
+            param = params.setdefault((start_addr, data_length), [])
+            param.append(dxl_id)
+            param.extend(reg.encode(value))
+
+        for (start_addr, data_length), param in params.items():
+            comm_result = packet_h.syncWriteTxOnly(
+                ref_servo.port_handler, start_addr, data_length, param, len(param)
+            )
+            if comm_result != COMM_SUCCESS:
+                return comm_result
+        return COMM_SUCCESS
+
+    def bulk_get_positions(self, is_radian: bool = False, fast: bool = False) -> List[float]:
+        raw_positions = self.bulk_read("PRESENT_POSITION", fast=fast)
+
+        return [
+            utils.pulse_to_angle(
+                pulse=raw_position, mid_val=servo.middle_pos_val, is_radian=is_radian
+            )
+            for servo, raw_position in zip(self.servos.values(), raw_positions)
+        ]
+
+    def bulk_set_positions(self, goal_positions: List[float], is_radian: bool = False) -> None:
+        self._check_values_length(goal_positions)
 
-            goal_pos = utils.angle_to_pulse(
-                angle=goal_positions[i],
-                mid_val=self.servos[dxl_id].middle_pos_val,
-                is_radian=is_radian,
+        goal_pulses = [
+            utils.angle_to_pulse(
+                angle=goal_position, mid_val=servo.middle_pos_val, is_radian=is_radian
+            )
+            for servo, goal_position in zip(self.servos.values(), goal_positions)
+        ]
+        self.bulk_write("GOAL_POSITION", goal_pulses)
+
+    def map_indirect_registers(self, registers: List[str]) -> None:
+        # Points the Indirect Address table of every servo at the given registers, so they can be read
+        # back to back from the Indirect Data block with a single sync read. The mapping lives in RAM,
+        # it has to be redone after the servos are power cycled or the group membership changes.
+        ref_servo = self._get_ref_servo()
+        if ref_servo.protocol_version == 1:
+            raise RuntimeError("Indirect addressing is only available in Protocol 2.0")
+
+        ref_control_table = ref_servo.control_table
+        address_addr, address_length = _get_register_info(ref_control_table, "INDIRECT_ADDRESS_1")
+        data_addr, _ = _get_register_info(ref_control_table, "INDIRECT_DATA_1")
+
+        regs = tuple(ref_control_table.get_register(register) for register in registers)
+        data_length = sum(reg.size for reg in regs)
+
+        if data_length > ref_control_table.INDIRECT_DATA_COUNT:
+            raise ValueError(
+                f"Registers {registers} need {data_length} bytes, but only "
+                f"{ref_control_table.INDIRECT_DATA_COUNT} Indirect Data bytes are available"
             )
 
-            param_data = utils.convert_to_bytes(value=goal_pos, data_bytes=data_length)
-            success = sync_write.addParam(dxl_id=dxl_id, data=param_data)
+        # One Indirect Address entry per mapped byte, each servo uses the addresses of its own table
+        addresses = []
+        for dxl_id, servo in self.servos.items():
+            if _get_register_info(servo.control_table, "INDIRECT_DATA_1")[0] != data_addr:
+                raise ValueError(
+                    f"Servo with id {dxl_id} has a different Indirect Data address than the group"
+                )
 
+            servo_addresses = []
+            for register in registers:
+                addr, length = _get_register_info(servo.control_table, register)
+                servo_addresses.extend(range(addr, addr + length))
+            addresses.append(servo_addresses)
+
+        table_length = data_length * address_length
+        sync_write = self._get_sync_write(address_addr, table_length)
+        for dxl_id, servo_addresses in zip(self.servos.keys(), addresses):
+            param_data = []
+            for addr in servo_addresses:
+                param_data.extend(utils.convert_to_bytes(data_bytes=address_length, value=addr))
+
+            success = sync_write.changeParam(dxl_id=dxl_id, data=param_data)
             if not success:
-                raise RuntimeError(f"Failed to set goal_pos for servo with id {dxl_id}")
+                raise RuntimeError(f"Failed to set indirect addresses for servo with id {dxl_id}")
 
-            comm_result = sync_write.txPacket()
-            utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
-            sync_write.clearParam()
+        comm_result = sync_write.txPacket()
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=ref_servo.packet_handler)
+
+        # Sync write has no status packets, reading the table back to make sure every servo took it
+        sync_read = self._get_sync_read(address_addr, table_length)
+        comm_result = self._sync_read_txrx(sync_read, fast=False)
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=ref_servo.packet_handler)
+
+        for dxl_id, servo_addresses in zip(self.servos.keys(), addresses):
+            table = sync_read.data_dict[dxl_id]
+            mapped_addresses = [
+                table[i] | (table[i + 1] << 8) for i in range(0, table_length, address_length)
+            ]
+            if mapped_addresses != servo_addresses:
+                raise RuntimeError(
+                    f"Failed to set indirect addresses for servo with id {dxl_id}, "
+                    f"make sure its torque is disabled"
+                )
 
-    def sync_torques_enabled(self, is_enabled: bool = False):
-        ref_servo = self.servos[list(self.servos)[0]]
+        # The mapped registers sit back to back, so one precompiled struct decodes a whole record
+        self._indirect_layout = (data_addr, data_length, tuple(registers), get_struct(regs))
+
+    def sync_read_indirect(self, fast: bool = False) -> List[Dict[str, int]]:
+        # Reads every register mapped by map_indirect_registers in one transaction and returns one
+        # dict of register values per servo, in the order the servos were added
+        if self._indirect_layout is None:
+            raise RuntimeError(
+                "No indirect registers are mapped for the current servos, call map_indirect_registers first"
+            )
+
+        data_addr, data_length, registers, decoder = self._indirect_layout
+        ref_control_table = self._get_ref_servo().control_table
+        cache_regs = {register: ref_control_table.get_register(register) for register in registers}
+        packet_h = self._get_ref_servo().packet_handler
+
+        sync_read = self._get_sync_read(data_addr, data_length)
+
+        comm_result = self._sync_read_txrx(sync_read, fast)
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+
+        records = []
+        for dxl_id in self.servos.keys():
+            if not sync_read.isAvailable(dxl_id, data_addr, data_length):
+                raise RuntimeError(
+                    f"group_sync_read failed for servo with id: {dxl_id}"
+                )
+
+            records.append(
+                dict(zip(registers, decoder.unpack(bytes(sync_read.data_dict[dxl_id]))))
+            )
+
+            cache = self.servos[dxl_id].cache
+            if cache is not None:
+                for register, value in records[-1].items():
+                    cache.update(cache_regs[register], value)
+
+        return records
+
+    def enable_array_mode(self, offsets=None, directions=None) -> None:
+        # offsets are in pulses and directions are +1 or -1, one per servo in the order they were added.
+        # angle = direction * (pulse - offset) converted with the servo's middle_pos_val
+        np = import_numpy("Array mode")
+
+        total_servos = self.total_servos
+        offsets = np.zeros(total_servos) if offsets is None else np.asarray(offsets, dtype=float)
+        directions = (
+            np.ones(total_servos) if directions is None else np.asarray(directions, dtype=float)
+        )
+        self._check_values_length(offsets)
+        self._check_values_length(directions)
+
+        if not np.all(np.abs(directions) == 1):
+            raise ValueError("Directions must be either 1 or -1")
+
+        self._array_calibration = {
+            "middle_pos_vals": np.array(
+                [servo.middle_pos_val for servo in self.servos.values()], dtype=float
+            ),
+            "offsets": offsets,
+            "directions": directions,
+        }
+        self._array_buffers = None
+
+    def _get_array_buffers(self) -> Dict:
+        # The calibration is dropped whenever the group membership changes
+        if self._array_calibration is None:
+            raise RuntimeError(
+                "Array mode is not enabled for the current servos, call enable_array_mode first"
+            )
+
+        if self._array_buffers is None:
+            np = import_numpy("Array mode")
+            ref_control_table = self._get_ref_servo().control_table
+            read_length = ref_control_table.LEN_PRESENT_POSITION
+            write_length = ref_control_table.LEN_GOAL_POSITION
+            total_servos = self.total_servos
+
+            # Sync write parameters are [id, data...] per servo, the ids never change so they are set once
+            # and the goal pulses are written straight into the buffer through a strided view
+            tx_param = bytearray(total_servos * (1 + write_length))
+            tx_param[:: 1 + write_length] = bytes(self.servos.keys())
+            tx_pulses = np.ndarray(
+                shape=(total_servos,),
+                dtype=f"<i{write_length}",
+                buffer=tx_param,
+                offset=1,
+                strides=(1 + write_length,),
+            )
+
+            rx_data = bytearray(total_servos * read_length)
+            rx_pulses = np.frombuffer(rx_data, dtype=f"<i{read_length}")
+
+            self._array_buffers = {
+                "tx_param": tx_param,
+                "tx_pulses": tx_pulses,
+                "write_length": write_length,
+                "rx_data": rx_data,
+                "rx_pulses": rx_pulses,
+                "read_length": read_length,
+            }
+
+        return self._array_buffers
+
+    def sync_get_positions_array(self, is_radian: bool = False, fast: bool = False):
+        buffers = self._get_array_buffers()
+        calibration = self._array_calibration
+
+        ref_servo = self._get_ref_servo()
+        packet_h = ref_servo.packet_handler
+        start_addr = ref_servo.control_table.ADDR_PRESENT_POSITION
+        data_length = buffers["read_length"]
+
+        sync_read = self._get_sync_read(start_addr, data_length)
+
+        comm_result = self._sync_read_txrx(sync_read, fast)
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
+
+        rx_data = buffers["rx_data"]
+        for i, dxl_id in enumerate(self.servos.keys()):
+            if not sync_read.isAvailable(dxl_id, start_addr, data_length):
+                raise RuntimeError(
+                    f"group_sync_read failed for servo with id: {dxl_id}"
+                )
+            rx_data[i * data_length : (i + 1) * data_length] = sync_read.data_dict[dxl_id]
+
+        scale = pi if is_radian else 180.0
+        return (
+            calibration["directions"]
+            * (buffers["rx_pulses"] - calibration["offsets"])
+            * scale
+            / calibration["middle_pos_vals"]
+        )
+
+    def sync_set_positions_array(self, goal_positions, is_radian: bool = False) -> None:
+        buffers = self._get_array_buffers()
+        calibration = self._array_calibration
+
+        # Only looked up in sys.modules, array mode already imported NumPy
+        np = import_numpy("Array mode")
+        goal_positions = np.asarray(goal_positions, dtype=float)
+        self._check_values_length(goal_positions)
+
+        ref_servo = self._get_ref_servo()
         port_h = ref_servo.port_handler
         packet_h = ref_servo.packet_handler
-        start_addr = ref_servo.control_table.ADDR_TORQUE_ENABLE
-        data_length = 1
+        start_addr = ref_servo.control_table.ADDR_GOAL_POSITION
 
-        sync_write = GroupSyncWrite(
-            port=port_h, ph=packet_h, start_address=start_addr, data_length=data_length
+        scale = pi if is_radian else 180.0
+        goal_pulses = (
+            calibration["directions"] * goal_positions * calibration["middle_pos_vals"] / scale
+            + calibration["offsets"]
         )
 
-        for dxl_id in self.servos.keys():
-            param_data = [1 if is_enabled else 0]
-            success = sync_write.addParam(dxl_id=dxl_id, data=bytes(param_data))
-            if not success:
-                raise RuntimeError(f"Failed to set torque for servo with ID {dxl_id}")
+        # astype would wrap goals the register cannot hold into arbitrary pulses. Pulses are truncated,
+        # so anything strictly between min - 1 and max + 1 fits, NaN fails both comparisons.
+        goal_reg = ref_servo.control_table.get_register("GOAL_POSITION")
+        min_pulse, max_pulse = _get_register_range(goal_reg)
+        invalid = ~((goal_pulses > min_pulse - 1) & (goal_pulses < max_pulse + 1))
+        if invalid.any():
+            index = int(np.argmax(invalid))
+            servo = list(self.servos.values())[index]
+            if not np.isfinite(goal_positions[index]):
+                raise ValueError(
+                    f"Goal position {goal_positions[index]} for servo with id {servo.servo_id} is "
+                    f"not finite"
+                )
+            raise ValueError(
+                f"Goal position {goal_positions[index]} for servo with id {servo.servo_id} does not "
+                f"fit in register {goal_reg.name} ({goal_reg.size} bytes, "
+                f"{'signed' if goal_reg.signed else 'unsigned'})"
+            )
 
-        comm_result = sync_write.txPacket()
-        utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
-        sync_write.clearParam()
+        # Truncating like DxlUtils.angle_to_pulse and packing into the little-endian buffer in one go
+        buffers["tx_pulses"][:] = goal_pulses.astype(buffers["tx_pulses"].dtype)
 
-    def bulk_read(self):
-        pass
+        tx_param = buffers["tx_param"]
+        comm_result = packet_h.syncWriteTxOnly(
+            port_h, start_addr, buffers["write_length"], tx_param, len(tx_param)
+        )
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=packet_h)
 
-    def bulk_write(self):
-        pass
+        # Array writes always send every servo, the caches are only kept up to date
+        if any(servo.cache is not None for servo in self.servos.values()):
+            self._update_caches(
+                [goal_reg] * self.total_servos, buffers["tx_pulses"].tolist()
+            )
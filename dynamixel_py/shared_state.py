@@ -0,0 +1,247 @@
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+
+from .bus_poller import GroupState
+from .servo_group import ServoGroup
+
+__all__ = ["SharedStatePublisher", "SharedStateClient"]
+
+DEFAULT_NAME = "dynamixel_py_state"
+
+# Block layout: header, servo ids padded to 8 bytes, then the state and the command sections. Both
+# sections are [sequence, timestamp, one float64 per servo] and start 8-byte aligned. The header ends
+# with the id of the publisher's resource tracker.
+_MAGIC = b"DXLSHM\0\0"
+_VERSION = 2
+_HEADER = struct.Struct("<8sHHIQ")
+_SEQUENCE_SIZE = 8
+_FLAG_RADIAN = 1
+# Longest a reader waits for a write in progress. A write takes microseconds, but a writer preempted
+# halfway through keeps it in progress for a whole scheduler time slice.
+_READ_TIMEOUT = 0.1
+
+
+def _get_tracker_id() -> int:
+    # The resource tracker is shared with child processes through its pipe, whose inode identifies it
+    if os.name != "posix":
+        return 0
+    from multiprocessing import resource_tracker
+
+    return os.fstat(resource_tracker.getfd()).st_ino
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Only the creating process may unlink the block. Before Python 3.13 every process attaching to
+    # it registers it with the resource tracker, which unlinks it when that process exits. The tracker
+    # keeps one entry per block though, so the creating process and its children, which share the
+    # publisher's tracker, must leave that entry alone.
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name)
+        if _HEADER.unpack_from(shm.buf, 0)[4] != _get_tracker_id():
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class _Section:
+    # A [sequence, timestamp, values] section guarded by a seqlock: the writer makes the sequence odd,
+    # writes the values and makes it even again, readers retry until they copied the values between
+    # two reads of the same even sequence. There must be only one writer at a time.
+
+    def __init__(self, buffer, offset: int, total_servos: int):
+        # The sequence goes through an aligned 8-byte memoryview item, which is copied in one store.
+        # struct.pack_into zero-fills before packing, so a reader could see a sequence of 0 or half of
+        # an update.
+        self._sequence = buffer[offset : offset + _SEQUENCE_SIZE].cast("Q")
+        self._buffer = buffer
+        self._data_offset = offset + _SEQUENCE_SIZE
+        self._data = struct.Struct("<d" + "d" * total_servos)
+        self.size = _SEQUENCE_SIZE + self._data.size
+        # Odd sequence a read gave up on, reads return None right away while it is still there
+        self._abandoned_sequence = None
+
+    def get_sequence(self) -> int:
+        return self._sequence[0]
+
+    def write(self, timestamp: float, values: Sequence[float]) -> int:
+        sequence = self._sequence[0]
+        self._sequence[0] = sequence + 1
+        self._data.pack_into(self._buffer, self._data_offset, timestamp, *values)
+        self._sequence[0] = sequence + 2
+        return (sequence + 2) // 2
+
+    def read(
+        self, timeout: float = _READ_TIMEOUT
+    ) -> Optional[Tuple[int, float, Tuple[float, ...]]]:
+        # (number of writes, timestamp, values), or None if nothing was written yet or the same write
+        # stayed in progress for timeout seconds, eg: the writer died halfway through an update.
+        # A writer that keeps publishing only makes the reader retry.
+        stuck_sequence = None
+        deadline = None
+        while True:
+            sequence = self._sequence[0]
+            if sequence == 0 or sequence == self._abandoned_sequence:
+                return None
+            if not sequence & 1:
+                timestamp, *values = self._data.unpack_from(self._buffer, self._data_offset)
+                if self._sequence[0] == sequence:
+                    return sequence // 2, timestamp, tuple(values)
+                continue
+
+            if sequence != stuck_sequence:
+                stuck_sequence = sequence
+                deadline = time.perf_counter() + timeout
+            elif time.perf_counter() > deadline:
+                self._abandoned_sequence = sequence
+                return None
+
+    def release(self) -> None:
+        # The shared memory can only be closed once no view into it is left
+        self._sequence.release()
+
+
+class SharedStatePublisher:
+    # Publishes the state of a ServoGroup owned by this process into a shared memory block, and picks
+    # up goal positions that other processes write into it with SharedStateClient. Nothing is
+    # pickled, positions and goals are packed in place as float64. step can be passed straight to a
+    # ControlLoop running around the group:
+    #     ControlLoop(publisher.step, rate_hz=500, group=servo_group)
+
+    def __init__(self, group: ServoGroup, name: str = DEFAULT_NAME, is_radian: bool = False):
+        self.group = group
+        self.name = name
+        self.is_radian = is_radian
+        self.servo_ids = list(group.servos.keys())
+
+        total_servos = len(self.servo_ids)
+        ids_size = (total_servos + 7) // 8 * 8
+        state_offset = _HEADER.size + ids_size
+        section_size = _SEQUENCE_SIZE + 8 * (total_servos + 1)
+
+        self._shm = shared_memory.SharedMemory(name, create=True, size=state_offset + 2 * section_size)
+        buffer = self._shm.buf
+        _HEADER.pack_into(
+            buffer,
+            0,
+            _MAGIC,
+            _VERSION,
+            _FLAG_RADIAN if is_radian else 0,
+            total_servos,
+            _get_tracker_id(),
+        )
+        buffer[_HEADER.size : _HEADER.size + total_servos] = bytes(self.servo_ids)
+
+        self._state = _Section(buffer, state_offset, total_servos)
+        self._command = _Section(buffer, state_offset + section_size, total_servos)
+        self._command_sequence = 0
+
+    def publish(self, positions: Sequence[float], timestamp: float = None) -> int:
+        # Returns the sequence number of the published state
+        if timestamp is None:
+            timestamp = time.time()
+        return self._state.write(timestamp, positions)
+
+    def take_goal_positions(self) -> Optional[List[float]]:
+        # Goal positions written by a client since the last call, None if there are none. A client that
+        # died while writing leaves the command section half written, it is then ignored.
+        command = self._command.read()
+        if command is None or command[0] == self._command_sequence:
+            return None
+        self._command_sequence = command[0]
+        return list(command[2])
+
+    def step(self, positions: List[float]) -> Optional[List[float]]:
+        # ControlLoop callback: publishes the positions read this cycle and returns the newest goals
+        self.publish(positions)
+        return self.take_goal_positions()
+
+    def poll(self, fast: bool = False) -> None:
+        # One read/publish/write cycle for loops that do not use ControlLoop
+        goal_positions = self.take_goal_positions()
+        if goal_positions is not None:
+            self.group.sync_set_positions(goal_positions, is_radian=self.is_radian)
+        self.publish(self.group.sync_get_positions(is_radian=self.is_radian, fast=fast))
+
+    def close(self) -> None:
+        # Removes the block, clients still attached keep their mapping until they close it
+        self._state.release()
+        self._command.release()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedStateClient:
+    # Attaches to the block of a SharedStatePublisher from any process. get_state never touches the
+    # serial port and set_positions only writes into the block, the owning process sends the goals
+    # on its next cycle. Only one process should send goal positions at a time.
+
+    def __init__(self, name: str = DEFAULT_NAME):
+        self.name = name
+        self._shm = _attach(name)
+        buffer = self._shm.buf
+
+        magic, version, flags, total_servos, _ = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self._shm.close()
+            raise ValueError(f"Shared memory block {name} was not created by SharedStatePublisher")
+
+        self.is_radian = bool(flags & _FLAG_RADIAN)
+        self.servo_ids = list(buffer[_HEADER.size : _HEADER.size + total_servos])
+
+        state_offset = _HEADER.size + (total_servos + 7) // 8 * 8
+        self._state = _Section(buffer, state_offset, total_servos)
+        self._command = _Section(buffer, state_offset + self._state.size, total_servos)
+
+    def get_state(self) -> Optional[GroupState]:
+        # Newest published state, None until the first publish or if the publisher died mid-write
+        state = self._state.read()
+        if state is None:
+            return None
+        sequence, timestamp, positions = state
+        return GroupState(positions, timestamp, sequence)
+
+    def get_positions(self) -> Optional[Tuple[float, ...]]:
+        state = self.get_state()
+        return None if state is None else state.positions
+
+    def wait_for_state(self, sequence: int = 0, timeout: float = None) -> Optional[GroupState]:
+        # Polls until a state newer than sequence is published, None on timeout
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            state = self.get_state()
+            if state is not None and state.sequence > sequence:
+                return state
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(0.0001)
+
+    def set_positions(self, goal_positions: Sequence[float]) -> None:
+        # Only the newest goal is kept, in the units (degrees or radians) of the publisher
+        if len(goal_positions) != len(self.servo_ids):
+            raise ValueError(
+                f"Expected {len(self.servo_ids)} goal positions, but got {len(goal_positions)}"
+            )
+        self._command.write(time.time(), goal_positions)
+
+    def close(self) -> None:
+        self._state.release()
+        self._command.release()
+        self._shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
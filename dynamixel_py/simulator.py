@@ -0,0 +1,485 @@
+import random
+import time
+from typing import Dict, List, Optional
+
+from dynamixel_sdk import PortHandler
+from dynamixel_sdk.robotis_def import *
+
+from .codec import checksum, crc16
+from .dynamixel_control_tables import control_tables
+
+__all__ = ["SimulatedServo", "SimulatedPortHandler"]
+
+MODEL_NUMBERS = {
+    name: control_table.MODEL_NUMBER
+    for tables in control_tables.values()
+    for name, control_table in tables.items()
+}
+
+def _add_stuffing(data: bytes) -> bytes:
+    return data.replace(b"\xff\xff\xfd", b"\xff\xff\xfd\xfd")
+
+
+def _remove_stuffing(data: bytes) -> bytes:
+    return data.replace(b"\xff\xff\xfd\xfd", b"\xff\xff\xfd")
+
+
+class SimulatedServo:
+    # Register file of a single servo, laid out with the addresses of its control table
+
+    FAST_READ_MIN_FIRMWARE = 45
+
+    def __init__(
+        self,
+        servo_id: int,
+        control_table: str,
+        protocol_version: int = 2,
+        firmware_version: int = 52,
+        return_delay: float = 0.0,
+        drop_rate: float = 0.0,
+        corrupt_rate: float = 0.0,
+        baud_rate: int = None,
+    ):
+        if control_table not in control_tables.get(protocol_version, {}):
+            raise ValueError(
+                f"Invalid control table {control_table} for protocol version {protocol_version}"
+            )
+
+        self.servo_id = servo_id
+        self.protocol_version = protocol_version
+        self.control_table = control_tables[protocol_version][control_table]
+        self.model_number = self.control_table.MODEL_NUMBER
+        self.firmware_version = firmware_version
+        # Seconds the servo waits before answering, set from the Return Delay Time register whenever it
+        # is written (2 us per unit)
+        self.return_delay = return_delay
+        # Probability that a status packet of this servo is lost, or arrives with a bad CRC/checksum
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        # Baud rate the servo listens at, None follows the port until the BAUD_RATE register is written
+        self.baud_rate = baud_rate
+
+        self.registers = bytearray(1024)
+        self._registered_write = None
+
+        # Like the real servos, every Indirect Address starts out pointing at its own Indirect Data byte
+        if hasattr(self.control_table, "ADDR_INDIRECT_ADDRESS_1"):
+            for i in range(self.control_table.INDIRECT_DATA_COUNT):
+                entry_addr = self.control_table.ADDR_INDIRECT_ADDRESS_1 + 2 * i
+                self.registers[entry_addr : entry_addr + 2] = (
+                    self.control_table.ADDR_INDIRECT_DATA_1 + i
+                ).to_bytes(2, "little")
+
+        self.write_register(
+            self.control_table.ADDR_MODEL_NUMBER,
+            self.model_number.to_bytes(2, "little"),
+        )
+        self.write_register(self.control_table.ADDR_FIRMWARE_VERSION, bytes([firmware_version]))
+        # Set directly, return delays the register cannot hold are kept
+        self.registers[self.control_table.ADDR_RETURN_DELAY_TIME] = min(254, round(return_delay / 2e-6))
+        if baud_rate is not None:
+            self.write_register(
+                self.control_table.ADDR_BAUD_RATE, bytes([self.control_table.BAUD_RATES[baud_rate]])
+            )
+
+        middle_pos_val = 512 if control_table == "AX12" else 2048
+        position_length = self.control_table.LEN_PRESENT_POSITION
+        self.write_register(
+            self.control_table.ADDR_PRESENT_POSITION,
+            middle_pos_val.to_bytes(position_length, "little"),
+        )
+
+    def supports_fast_read(self) -> bool:
+        return self.protocol_version == 2 and self.firmware_version >= self.FAST_READ_MIN_FIRMWARE
+
+    def _resolve_indirect(self, address: int) -> int:
+        # Indirect Data bytes stand for the register byte their Indirect Address points to
+        data_addr = getattr(self.control_table, "ADDR_INDIRECT_DATA_1", None)
+        if data_addr is None or not data_addr <= address < data_addr + self.control_table.INDIRECT_DATA_COUNT:
+            return address
+
+        entry_addr = self.control_table.ADDR_INDIRECT_ADDRESS_1 + 2 * (address - data_addr)
+        return int.from_bytes(self.registers[entry_addr : entry_addr + 2], "little")
+
+    def read_register(self, address: int, length: int) -> bytes:
+        return bytes(self.registers[self._resolve_indirect(i)] for i in range(address, address + length))
+
+    def write_register(self, address: int, data: bytes) -> None:
+        for i, value in enumerate(data):
+            self.registers[self._resolve_indirect(address + i)] = value
+        self._update_state(address, len(data))
+
+    def register_write(self, address: int, data: bytes) -> None:
+        self._registered_write = (address, bytes(data))
+
+    def action(self) -> bool:
+        if self._registered_write is None:
+            return False
+        self.write_register(*self._registered_write)
+        self._registered_write = None
+        return True
+
+    def _update_state(self, address: int, length: int) -> None:
+        # Like the real servos, a new baud rate is used from the next packet on
+        baud_addr = self.control_table.ADDR_BAUD_RATE
+        if address <= baud_addr < address + length:
+            for baud_rate, value in self.control_table.BAUD_RATES.items():
+                if value == self.registers[baud_addr]:
+                    self.baud_rate = baud_rate
+
+        delay_addr = self.control_table.ADDR_RETURN_DELAY_TIME
+        if address <= delay_addr < address + length:
+            self.return_delay = self.registers[delay_addr] * 2e-6
+
+        # The simulated servos reach their goal position instantly while torque is enabled
+        goal_addr = self.control_table.ADDR_GOAL_POSITION
+        torque_addr = self.control_table.ADDR_TORQUE_ENABLE
+        if address < goal_addr + self.control_table.LEN_GOAL_POSITION and goal_addr < address + length:
+            if self.registers[torque_addr]:
+                self.registers[
+                    self.control_table.ADDR_PRESENT_POSITION : self.control_table.ADDR_PRESENT_POSITION
+                    + self.control_table.LEN_PRESENT_POSITION
+                ] = self.registers[goal_addr : goal_addr + self.control_table.LEN_GOAL_POSITION]
+
+
+class SimulatedPortHandler(PortHandler):
+    # Stands in for the SDK's PortHandler. Instruction packets written to it are parsed and answered
+    # by the simulated servos with real Protocol 1.0/2.0 status packets. With realtime enabled, the
+    # status bytes only become readable after the time the packets would take on the wire at the
+    # current baud rate, so throughput measured against it follows the real bus. Above max_baud_rate
+    # the servos still get the instruction packets, but every status packet is lost, like on a cable
+    # too long for that baud rate.
+
+    def __init__(
+        self, port_name: str = "simulated", realtime: bool = True, max_baud_rate: int = None
+    ):
+        super().__init__(port_name)
+        self.realtime = realtime
+        self.max_baud_rate = max_baud_rate
+        self.servos: Dict[int, SimulatedServo] = {}
+
+        # Each chunk is [start_time, data, bytes_already_read]
+        self._rx_chunks: List[list] = []
+        self._bus_free_time = 0.0
+
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.packets_written = 0
+
+    def add_servo(self, servo: SimulatedServo) -> SimulatedServo:
+        if servo.servo_id in self.servos:
+            raise ValueError(f"Simulated servo with id {servo.servo_id} already exists.")
+        self.servos[servo.servo_id] = servo
+        return servo
+
+    def add_servos(self, servo_list: List[SimulatedServo]) -> None:
+        for servo in servo_list:
+            self.add_servo(servo)
+
+    # PortHandler overrides
+
+    def setupPort(self, cflag_baud):
+        self.is_open = True
+        self.tx_time_per_byte = (1000.0 / self.baudrate) * 10.0
+        self._rx_chunks.clear()
+        return True
+
+    def closePort(self):
+        self.is_open = False
+
+    def clearPort(self):
+        self._rx_chunks.clear()
+
+    def getBytesAvailable(self):
+        now = time.perf_counter()
+        return sum(self._available(chunk, now) for chunk in self._rx_chunks)
+
+    def readPort(self, length):
+        now = time.perf_counter()
+        data = bytearray()
+
+        while self._rx_chunks and len(data) < length:
+            chunk = self._rx_chunks[0]
+            available = self._available(chunk, now)
+            if available == 0:
+                break
+
+            taken = min(available, length - len(data))
+            data += chunk[1][chunk[2] : chunk[2] + taken]
+            chunk[2] += taken
+            if chunk[2] == len(chunk[1]):
+                self._rx_chunks.pop(0)
+            else:
+                break
+
+        self.bytes_read += len(data)
+        return bytes(data)
+
+    def writePort(self, packet):
+        packet = bytes(packet)
+        self.bytes_written += len(packet)
+        self.packets_written += 1
+
+        now = time.perf_counter()
+        byte_time = self._byte_time()
+        # The instruction packet has to be fully transmitted before any servo can answer
+        start_time = max(now, self._bus_free_time) + len(packet) * byte_time
+        tx_end_time = start_time
+        self._bus_free_time = start_time
+
+        for delay, response in self._handle_packet(packet):
+            response = self._inject_faults(response)
+            if response is None:
+                continue
+            start_time += delay
+            self._rx_chunks.append([start_time, response, 0])
+            start_time += len(response) * byte_time
+            self._bus_free_time = start_time
+
+        # Returning once the instruction packet left the adapter, so writes cannot outrun the bus
+        while time.perf_counter() < tx_end_time:
+            pass
+
+        return len(packet)
+
+    def _inject_faults(self, response: bytes) -> Optional[bytes]:
+        if self.max_baud_rate is not None and self.baudrate > self.max_baud_rate:
+            return None
+        # Fast Sync/Bulk Read status packets hold several servos and are passed through as they are
+        servo = self.servos.get(response[4] if response[:3] == b"\xff\xff\xfd" else response[2])
+        if servo is None:
+            return response
+        if random.random() < servo.drop_rate:
+            return None
+        if random.random() < servo.corrupt_rate:
+            return response[:-1] + bytes([response[-1] ^ 0xFF])
+        return response
+
+    def _byte_time(self) -> float:
+        # 10 bits per byte: start bit, 8 data bits and stop bit
+        return 10.0 / self.baudrate if self.realtime else 0.0
+
+    def _available(self, chunk: list, now: float) -> int:
+        byte_time = self._byte_time()
+        if byte_time == 0.0:
+            return len(chunk[1]) - chunk[2]
+        if now < chunk[0]:
+            return 0
+        received = min(len(chunk[1]), int((now - chunk[0]) / byte_time))
+        return max(0, received - chunk[2])
+
+    # Packet handling
+
+    def _handle_packet(self, packet: bytes) -> List:
+        if packet[:4] == b"\xff\xff\xfd\x00":
+            return self._handle_protocol2(packet)
+        elif packet[:2] == b"\xff\xff":
+            return self._handle_protocol1(packet)
+        return []
+
+    def _get_servo(self, servo_id: int, protocol_version: int) -> Optional[SimulatedServo]:
+        servo = self.servos.get(servo_id)
+        if servo is None or not self._is_listening(servo, protocol_version):
+            return None
+        return servo
+
+    def _protocol_servos(self, protocol_version: int) -> List[SimulatedServo]:
+        return [
+            self.servos[servo_id]
+            for servo_id in sorted(self.servos)
+            if self._is_listening(self.servos[servo_id], protocol_version)
+        ]
+
+    def _is_listening(self, servo: SimulatedServo, protocol_version: int) -> bool:
+        # Servos at another baud rate only see garbage and ignore the packet
+        return servo.protocol_version == protocol_version and (
+            servo.baud_rate is None or servo.baud_rate == self.baudrate
+        )
+
+    def _status2(self, servo_id: int, error: int, params: bytes = b"") -> bytes:
+        body = _add_stuffing(bytes([INST_STATUS, error]) + params)
+        packet = bytes([0xFF, 0xFF, 0xFD, 0x00, servo_id]) + (len(body) + 2).to_bytes(2, "little") + body
+        return packet + crc16(packet).to_bytes(2, "little")
+
+    def _fast_status2(self, segments: List) -> bytes:
+        # One status packet for every servo: [ERR ID DATA CRC] per servo, the last CRC closes the packet
+        length = 1 + sum(len(data) + 4 for _, _, data in segments)
+        packet = bytearray([0xFF, 0xFF, 0xFD, 0x00, BROADCAST_ID]) + length.to_bytes(2, "little")
+        packet.append(INST_STATUS)
+        for servo_id, error, data in segments:
+            packet += bytes([error, servo_id]) + data
+            packet += crc16(packet).to_bytes(2, "little")
+        return bytes(packet)
+
+    def _handle_protocol2(self, packet: bytes) -> List:
+        if len(packet) < 10:
+            return []
+
+        servo_id = packet[4]
+        length = int.from_bytes(packet[5:7], "little")
+        if len(packet) != length + 7 or crc16(packet[:-2]) != int.from_bytes(packet[-2:], "little"):
+            return []
+
+        instruction = packet[7]
+        params = _remove_stuffing(packet[8:-2])
+        responses = []
+
+        if instruction == INST_PING:
+            if servo_id == BROADCAST_ID:
+                targets = self._protocol_servos(2)
+            else:
+                servo = self._get_servo(servo_id, 2)
+                targets = [servo] if servo is not None else []
+            for servo in targets:
+                data = servo.model_number.to_bytes(2, "little") + bytes([servo.firmware_version])
+                responses.append((servo.return_delay, self._status2(servo.servo_id, 0, data)))
+
+        elif instruction == INST_READ:
+            servo = self._get_servo(servo_id, 2)
+            if servo is not None:
+                address = int.from_bytes(params[0:2], "little")
+                data_length = int.from_bytes(params[2:4], "little")
+                data = servo.read_register(address, data_length)
+                responses.append((servo.return_delay, self._status2(servo_id, 0, data)))
+
+        elif instruction in (INST_WRITE, INST_REG_WRITE):
+            address = int.from_bytes(params[0:2], "little")
+            if servo_id == BROADCAST_ID:
+                targets = self._protocol_servos(2)
+            else:
+                servo = self._get_servo(servo_id, 2)
+                targets = [servo] if servo is not None else []
+            for servo in targets:
+                if instruction == INST_WRITE:
+                    servo.write_register(address, params[2:])
+                else:
+                    servo.register_write(address, params[2:])
+                if servo_id != BROADCAST_ID:
+                    responses.append((servo.return_delay, self._status2(servo_id, 0)))
+
+        elif instruction == INST_ACTION:
+            if servo_id == BROADCAST_ID:
+                targets = self._protocol_servos(2)
+            else:
+                servo = self._get_servo(servo_id, 2)
+                targets = [servo] if servo is not None else []
+            # The SDK does not wait for a status packet after ACTION
+            for servo in targets:
+                servo.action()
+
+        elif instruction in (INST_SYNC_READ, INST_FAST_SYNC_READ):
+            address = int.from_bytes(params[0:2], "little")
+            data_length = int.from_bytes(params[2:4], "little")
+            requests = [(dxl_id, address, data_length) for dxl_id in params[4:]]
+            responses.extend(self._read_many(requests, instruction == INST_FAST_SYNC_READ))
+
+        elif instruction in (INST_BULK_READ, INST_FAST_BULK_READ):
+            requests = [
+                (
+                    params[i],
+                    int.from_bytes(params[i + 1 : i + 3], "little"),
+                    int.from_bytes(params[i + 3 : i + 5], "little"),
+                )
+                for i in range(0, len(params) - 4, 5)
+            ]
+            responses.extend(self._read_many(requests, instruction == INST_FAST_BULK_READ))
+
+        elif instruction == INST_SYNC_WRITE:
+            address = int.from_bytes(params[0:2], "little")
+            data_length = int.from_bytes(params[2:4], "little")
+            for i in range(4, len(params), data_length + 1):
+                servo = self._get_servo(params[i], 2)
+                if servo is not None:
+                    servo.write_register(address, params[i + 1 : i + 1 + data_length])
+
+        elif instruction == INST_BULK_WRITE:
+            i = 0
+            while i + 5 <= len(params):
+                address = int.from_bytes(params[i + 1 : i + 3], "little")
+                data_length = int.from_bytes(params[i + 3 : i + 5], "little")
+                servo = self._get_servo(params[i], 2)
+                if servo is not None:
+                    servo.write_register(address, params[i + 5 : i + 5 + data_length])
+                i += 5 + data_length
+
+        return responses
+
+    def _read_many(self, requests: List, fast: bool) -> List:
+        servos = [(self._get_servo(dxl_id, 2), address, length) for dxl_id, address, length in requests]
+
+        if not fast:
+            return [
+                (servo.return_delay, self._status2(servo.servo_id, 0, servo.read_register(address, length)))
+                for servo, address, length in servos
+                if servo is not None
+            ]
+
+        # Servos with old firmware ignore the fast instructions, so the host times out and falls back
+        if any(servo is None or not servo.supports_fast_read() for servo, _, _ in servos):
+            return []
+
+        segments = [
+            (servo.servo_id, 0, servo.read_register(address, length))
+            for servo, address, length in servos
+        ]
+        return [(servos[0][0].return_delay, self._fast_status2(segments))]
+
+    def _status1(self, servo_id: int, error: int, params: bytes = b"") -> bytes:
+        packet = bytes([0xFF, 0xFF, servo_id, len(params) + 2, error]) + params
+        return packet + bytes([checksum(packet[2:])])
+
+    def _handle_protocol1(self, packet: bytes) -> List:
+        if len(packet) < 6:
+            return []
+
+        servo_id = packet[2]
+        length = packet[3]
+        if len(packet) != length + 4 or checksum(packet[2:-1]) != packet[-1]:
+            return []
+
+        instruction = packet[4]
+        params = packet[5:-1]
+        responses = []
+        servo = self._get_servo(servo_id, 1)
+
+        if instruction == INST_PING and servo is not None:
+            responses.append((servo.return_delay, self._status1(servo_id, 0)))
+
+        elif instruction == INST_READ and servo is not None:
+            data = servo.read_register(params[0], params[1])
+            responses.append((servo.return_delay, self._status1(servo_id, 0, data)))
+
+        elif instruction in (INST_WRITE, INST_REG_WRITE):
+            targets = self._protocol_servos(1) if servo_id == BROADCAST_ID else [servo] if servo else []
+            for target in targets:
+                if instruction == INST_WRITE:
+                    target.write_register(params[0], params[1:])
+                else:
+                    target.register_write(params[0], params[1:])
+                if servo_id != BROADCAST_ID:
+                    responses.append((target.return_delay, self._status1(servo_id, 0)))
+
+        elif instruction == INST_ACTION:
+            targets = self._protocol_servos(1) if servo_id == BROADCAST_ID else [servo] if servo else []
+            for target in targets:
+                target.action()
+                if servo_id != BROADCAST_ID:
+                    responses.append((target.return_delay, self._status1(servo_id, 0)))
+
+        elif instruction == INST_SYNC_WRITE:
+            address = params[0]
+            data_length = params[1]
+            for i in range(2, len(params), data_length + 1):
+                target = self._get_servo(params[i], 1)
+                if target is not None:
+                    target.write_register(address, params[i + 1 : i + 1 + data_length])
+
+        elif instruction == INST_BULK_READ:
+            # params: 0x00 then [LEN ID ADDR] per servo
+            for i in range(1, len(params) - 2, 3):
+                target = self._get_servo(params[i + 1], 1)
+                if target is not None and target.control_table.SUPPORTS_BULK_READ:
+                    data = target.read_register(params[i + 2], params[i])
+                    responses.append((target.return_delay, self._status1(target.servo_id, 0, data)))
+
+        return responses
@@ -0,0 +1,280 @@
+import mmap
+import os
+import struct
+import time
+from math import pi
+from typing import Dict, List, Sequence
+
+from .servo_group import ServoGroup
+from .trajectory import TrajectoryPlayer
+from .utilities import import_numpy
+
+__all__ = ["TelemetryRecorder", "TelemetryReader"]
+
+# File layout: header, ids, register names, padding to header_size, then fixed size records of
+# [timestamp, positions * servos, register values * registers * servos], all little-endian
+_MAGIC = b"DXLTLM\0\0"
+_VERSION = 1
+_HEADER = struct.Struct("<8sHHHHIIQQ")
+# Offset of the record count in the header, rewritten after every record in ring buffer mode
+_COUNT = struct.Struct("<Q")
+_COUNT_OFFSET = _HEADER.size - _COUNT.size
+_FLAG_RADIAN = 1
+# Every record field is 8 bytes: float64 timestamp and positions, int64 register values
+_FLOAT = struct.Struct("<d")
+_INT = struct.Struct("<q")
+
+
+class TelemetryRecorder:
+    # Appends timestamped group state to a binary file of fixed size records. With capacity set, the
+    # file is preallocated and memory-mapped as a ring buffer holding the last capacity records,
+    # otherwise records are appended to the end of the file. Every value is packed straight into its
+    # slot of the memory map or of a record buffer allocated once, so recording builds no lists or
+    # argument tuples per sample.
+
+    def __init__(
+        self,
+        path: str,
+        servo_ids: Sequence[int],
+        registers: Sequence[str] = (),
+        capacity: int = None,
+        is_radian: bool = False,
+    ):
+        self.path = path
+        self.servo_ids = list(servo_ids)
+        self.registers = list(registers)
+        self.capacity = capacity
+        self.is_radian = is_radian
+        self.count = 0
+
+        total_servos = len(self.servo_ids)
+        # Timestamp, positions and register values, 8 bytes each
+        self._record_size = 8 * (1 + total_servos + len(self.registers) * total_servos)
+        names = "\0".join(self.registers).encode()
+        header_size = _HEADER.size + total_servos + len(names)
+        self._header_size = (header_size + 63) // 64 * 64
+
+        header = bytearray(self._header_size)
+        _HEADER.pack_into(
+            header,
+            0,
+            _MAGIC,
+            _VERSION,
+            _FLAG_RADIAN if is_radian else 0,
+            total_servos,
+            len(self.registers),
+            self._header_size,
+            self._record_size,
+            capacity or 0,
+            0,
+        )
+        header[_HEADER.size : _HEADER.size + total_servos] = bytes(self.servo_ids)
+        header[_HEADER.size + total_servos : header_size] = names
+
+        self._file = open(path, "w+b")
+        self._file.write(header)
+
+        if capacity is not None:
+            if capacity <= 0:
+                raise ValueError("capacity must be greater than 0")
+            self._file.truncate(self._header_size + capacity * self._record_size)
+            self._mmap = mmap.mmap(self._file.fileno(), 0)
+            self._buffer = None
+        else:
+            self._mmap = None
+            self._buffer = bytearray(self._record_size)
+
+    @classmethod
+    def for_group(
+        cls,
+        path: str,
+        group: ServoGroup,
+        registers: Sequence[str] = (),
+        capacity: int = None,
+        is_radian: bool = False,
+    ) -> "TelemetryRecorder":
+        return cls(path, list(group.servos.keys()), registers, capacity, is_radian)
+
+    def record(
+        self,
+        positions: Sequence[float],
+        values: List[Dict[str, int]] = None,
+        timestamp: float = None,
+    ) -> None:
+        # values holds one dict per servo with the registers given to the recorder, like the records
+        # returned by ServoGroup.sync_read_indirect
+        if timestamp is None:
+            timestamp = time.time()
+        if len(positions) != len(self.servo_ids):
+            raise ValueError(f"Expected {len(self.servo_ids)} positions, but got {len(positions)}")
+        if self.registers and (values is None or len(values) != len(self.servo_ids)):
+            raise ValueError(
+                f"Expected values for registers {self.registers} of {len(self.servo_ids)} servos"
+            )
+
+        if self._mmap is not None:
+            target = self._mmap
+            offset = self._header_size + (self.count % self.capacity) * self._record_size
+        else:
+            target = self._buffer
+            offset = 0
+
+        pack_float = _FLOAT.pack_into
+        pack_float(target, offset, timestamp)
+        for position in positions:
+            offset += 8
+            pack_float(target, offset, position)
+
+        # Register values are stored register by register, one value per servo
+        pack_int = _INT.pack_into
+        for register in self.registers:
+            for servo_values in values:
+                offset += 8
+                pack_int(target, offset, servo_values[register])
+
+        self.count += 1
+        if self._mmap is not None:
+            # The count is updated after the record so a reader never sees a half written record as valid
+            _COUNT.pack_into(self._mmap, _COUNT_OFFSET, self.count)
+        else:
+            self._file.write(self._buffer)
+
+    def record_group(self, group: ServoGroup, fast: bool = False) -> None:
+        # Reads the group and records the result. The extra registers are read with one
+        # sync_read_indirect, so they must be mapped with group.map_indirect_registers first. If
+        # PRESENT_POSITION is one of them the positions are taken from the same read.
+        if not self.registers:
+            self.record(group.sync_get_positions(is_radian=self.is_radian, fast=fast))
+            return
+
+        values = group.sync_read_indirect(fast=fast)
+        if "PRESENT_POSITION" in self.registers:
+            scale = pi if self.is_radian else 180.0
+            positions = [
+                servo_values["PRESENT_POSITION"] * scale / servo.middle_pos_val
+                for servo_values, servo in zip(values, group.servos.values())
+            ]
+        else:
+            positions = group.sync_get_positions(is_radian=self.is_radian, fast=fast)
+        self.record(positions, values)
+
+    def flush(self) -> None:
+        if self._mmap is not None:
+            self._mmap.flush()
+        else:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+        else:
+            self._file.seek(_COUNT_OFFSET)
+            self._file.write(_COUNT.pack(self.count))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TelemetryReader:
+    # Memory-maps a file written by TelemetryRecorder as NumPy arrays. Records of a ring buffer are
+    # returned oldest first, which copies them once the buffer has wrapped around.
+
+    def __init__(self, path: str):
+        # Recording does not need NumPy, it is only imported to read recordings
+        np = import_numpy("TelemetryReader")
+
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            (
+                magic,
+                version,
+                flags,
+                total_servos,
+                total_registers,
+                header_size,
+                record_size,
+                capacity,
+                count,
+            ) = _HEADER.unpack(header)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"{path} is not a telemetry file written by TelemetryRecorder")
+            extra = f.read(header_size - _HEADER.size)
+
+        self.path = path
+        self.is_radian = bool(flags & _FLAG_RADIAN)
+        self.servo_ids = list(extra[:total_servos])
+        names = extra[total_servos:].rstrip(b"\0").decode()
+        self.registers = names.split("\0") if total_registers else []
+        self.capacity = capacity or None
+
+        fields = [("timestamp", "<f8"), ("positions", "<f8", (total_servos,))]
+        fields += [(register, "<i8", (total_servos,)) for register in self.registers]
+        self.dtype = np.dtype(fields)
+        if self.dtype.itemsize != record_size:
+            raise ValueError(f"Unexpected record size {record_size} in {path}")
+
+        if capacity:
+            records = np.memmap(path, dtype=self.dtype, mode="r", offset=header_size, shape=(capacity,))
+            if count > capacity:
+                start = count % capacity
+                records = np.concatenate((records[start:], records[:start]))
+            else:
+                records = records[:count]
+        else:
+            # Appended files are read up to the last complete record, so a file still being written works
+            total_records = (os.path.getsize(path) - header_size) // record_size
+            records = (
+                np.memmap(path, dtype=self.dtype, mode="r", offset=header_size, shape=(total_records,))
+                if total_records
+                else np.zeros(0, dtype=self.dtype)
+            )
+
+        self.records = records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def positions(self):
+        # (T x N) positions, in radians if the recorder used is_radian
+        return self.records["positions"]
+
+    def get_register(self, register: str):
+        if register not in self.registers:
+            raise ValueError(f"Register {register} was not recorded, recorded: {self.registers}")
+        return self.records[register]
+
+    def get_rate_hz(self) -> float:
+        # Median sample rate of the recording
+        if len(self) < 2:
+            raise ValueError("At least two records are needed to compute the rate")
+        np = import_numpy("TelemetryReader")
+        return 1.0 / float(np.median(np.diff(self.timestamps)))
+
+    def replay(
+        self, group: ServoGroup, rate_hz: float = None, **kwargs
+    ) -> TrajectoryPlayer:
+        # Player streaming the recorded positions back to group at the recorded (or the given) rate
+        if list(group.servos.keys()) != self.servo_ids:
+            raise ValueError(
+                f"The group servos {list(group.servos.keys())} do not match the recorded servos "
+                f"{self.servo_ids}"
+            )
+        return TrajectoryPlayer(
+            group,
+            self.positions,
+            rate_hz=rate_hz or self.get_rate_hz(),
+            is_radian=self.is_radian,
+            **kwargs,
+        )
@@ -0,0 +1,224 @@
+import struct
+import threading
+import time
+from math import pi
+from typing import Dict, Iterable, Iterator, List, Sequence, Union
+
+from .control_loop import ControlLoop
+from .dynamixel_control_tables import get_struct
+from .servo_group import ServoGroup
+from .utilities import DxlUtils
+
+__all__ = ["TrajectoryPlayer"]
+
+utils = DxlUtils()
+
+
+class TrajectoryPlayer:
+    # Streams goal positions to a ServoGroup at a fixed rate. waypoints is a (T x N) array or list of
+    # rows, or any iterable/generator of rows, with one goal position per servo in the order the servos
+    # were added. Sized inputs are encoded into sync write packets before playback starts, generators
+    # are encoded one row at a time. With interpolation > 1, that many commands are sent per waypoint,
+    # linearly interpolated towards the next one, so the bus runs at rate_hz * interpolation.
+
+    def __init__(
+        self,
+        group: ServoGroup,
+        waypoints: Union[Sequence[Sequence[float]], Iterable[Sequence[float]]],
+        rate_hz: float,
+        is_radian: bool = False,
+        interpolation: int = 1,
+        busy_wait: float = 0.0,
+    ):
+        if interpolation < 1:
+            raise ValueError("interpolation must be 1 or greater")
+        if group.get_total_servos() == 0:
+            raise ValueError("The group has no servos")
+
+        self.group = group
+        self.rate_hz = rate_hz
+        self.is_radian = is_radian
+        self.interpolation = interpolation
+
+        ref_servo = group._get_ref_servo()
+        self._port_handler = ref_servo.port_handler
+        self._packet_handler = ref_servo.packet_handler
+        self._goal_reg = ref_servo.control_table.get_register("GOAL_POSITION")
+
+        # A sync write parameter block is [id, goal position] per servo, packed by one struct
+        id_reg = ref_servo.control_table.get_register("ID")
+        self._encoder = get_struct((id_reg, self._goal_reg) * group.get_total_servos())
+        self._ids = list(group.servos.keys())
+        self._middle_pos_vals = [servo.middle_pos_val for servo in group.servos.values()]
+
+        if hasattr(waypoints, "__len__"):
+            packets = [self._encode(row) for row in self._interpolate(waypoints)]
+            self.total_commands = len(packets)
+            self._commands = iter(packets)
+        else:
+            self.total_commands = None
+            self._commands = (self._encode(row) for row in self._interpolate(waypoints))
+
+        self._loop = ControlLoop(
+            self._step, rate_hz * interpolation, busy_wait=busy_wait, history_size=100000
+        )
+        self._thread = None
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+
+        self.commands_sent = 0
+        self.aborted = False
+        self.finished = False
+        # Error that stopped playback, eg: a generator row out of range of the goal position register
+        self.error = None
+        self._start_time = None
+        self._end_time = None
+        self._paused_time = 0.0
+        self._pause_start = None
+
+    def _interpolate(self, waypoints: Iterable[Sequence[float]]) -> Iterator[List[float]]:
+        total_servos = len(self._ids)
+        previous = None
+        for row in waypoints:
+            row = [float(value) for value in row]
+            if len(row) != total_servos:
+                raise ValueError(
+                    f"Expected {total_servos} values per waypoint, one per servo, but got {len(row)}"
+                )
+
+            if previous is not None:
+                for step in range(self.interpolation):
+                    fraction = step / self.interpolation
+                    yield [p + (c - p) * fraction for p, c in zip(previous, row)]
+            previous = row
+
+        if previous is not None:
+            yield previous
+
+    def _encode(self, row: List[float]) -> bytes:
+        scale = pi if self.is_radian else 180.0
+        values = []
+        for dxl_id, middle_pos_val, angle in zip(self._ids, self._middle_pos_vals, row):
+            # Truncating like DxlUtils.angle_to_pulse
+            values += (dxl_id, int(middle_pos_val * angle / scale))
+        try:
+            return self._encoder.pack(*values)
+        except struct.error:
+            raise ValueError(f"Waypoint {row} is out of range of register {self._goal_reg.name}")
+
+    def _step(self, _) -> None:
+        # ControlLoop carries on after a failed cycle, playback stops instead and _run raises the error
+        try:
+            self._send_next_command()
+        except Exception as e:
+            self.error = e
+            self.aborted = True
+            self._loop.stop()
+
+    def _send_next_command(self) -> None:
+        if not self._resume_event.is_set():
+            # Holding the last command while paused, the loop keeps its schedule
+            return
+
+        packet = next(self._commands, None)
+        if packet is None:
+            self.finished = True
+            self._loop.stop()
+            return
+
+        comm_result = self._packet_handler.syncWriteTxOnly(
+            self._port_handler, self._goal_reg.address, self._goal_reg.size, packet, len(packet)
+        )
+        utils.print_comm_error(comm_result=comm_result, pack_h_instance=self._packet_handler)
+        self.commands_sent += 1
+
+    def _run(self) -> None:
+        # The goal positions are written without going through the servos, so their caches are stale
+        for servo in self.group.servos.values():
+            if servo.cache is not None:
+                servo.cache.invalidate("GOAL_POSITION")
+
+        self._start_time = time.perf_counter()
+        try:
+            # The loop was reset by play or start, so an abort before this point is kept
+            self._loop.run(reset=False)
+        finally:
+            self._end_time = time.perf_counter()
+            if self._pause_start is not None:
+                self._paused_time += self._end_time - self._pause_start
+                self._pause_start = None
+
+        if self.error is not None:
+            raise self.error
+
+    def play(self) -> Dict[str, float]:
+        # Blocks until the trajectory is done or aborted from another thread, returns get_report()
+        self._loop.reset()
+        self._run()
+        return self.get_report()
+
+    def start(self) -> None:
+        if self._thread_is_alive():
+            raise RuntimeError("Trajectory is already playing")
+        self._loop.reset()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _thread_is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout: float = None) -> bool:
+        # Returns True once a trajectory started with start() is done
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self._thread_is_alive()
+
+    def is_playing(self) -> bool:
+        return self._thread_is_alive() and self._resume_event.is_set()
+
+    def pause(self) -> None:
+        if self._resume_event.is_set():
+            self._pause_start = time.perf_counter()
+            self._resume_event.clear()
+
+    def resume(self) -> None:
+        if not self._resume_event.is_set():
+            self._paused_time += time.perf_counter() - self._pause_start
+            self._pause_start = None
+            self._resume_event.set()
+
+    def abort(self, timeout: float = None) -> None:
+        # Stops streaming after the current command, the servos keep the last goal they received
+        self.aborted = not self.finished
+        self._loop.stop()
+        self.wait(timeout)
+
+    def get_report(self) -> Dict[str, float]:
+        # Timing of the commands sent so far. Deadlines missed because of overruns delay the rest of
+        # the trajectory instead of dropping commands, they are counted in missed_cycles.
+        stats = self._loop.get_stats()
+
+        end_time = self._end_time if self._end_time is not None else time.perf_counter()
+        elapsed = end_time - self._start_time if self._start_time is not None else 0.0
+        paused_time = self._paused_time
+        if self._pause_start is not None:
+            paused_time += end_time - self._pause_start
+        active_time = elapsed - paused_time
+
+        return {
+            "command_rate_hz": self.rate_hz * self.interpolation,
+            "achieved_rate_hz": self.commands_sent / active_time if active_time > 0 else 0.0,
+            "commands_sent": self.commands_sent,
+            "total_commands": self.total_commands,
+            "elapsed": elapsed,
+            "paused_time": paused_time,
+            "finished": self.finished,
+            "aborted": self.aborted,
+            "overruns": stats["overruns"],
+            "missed_cycles": stats["missed_cycles"],
+            "latency_p50": stats["latency_p50"],
+            "latency_p99": stats["latency_p99"],
+            "latency_max": stats["latency_max"],
+            "jitter_std": stats["jitter_std"],
+            "jitter_max": stats["jitter_max"],
+        }
@@ -4,6 +4,18 @@ from dynamixel_sdk.robotis_def import *
 from dynamixel_sdk.packet_handler import PacketHandler
 
 
+def import_numpy(feature: str):
+    # NumPy is optional and takes longer to import than the rest of the library, so it is only
+    # imported once a feature that needs it is used
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError(
+            f"{feature} requires numpy, install it with `pip install dynamixel_py[numpy]`"
+        )
+    return numpy
+
+
 class DxlUtils:
 
     def print_comm_hardware_error(
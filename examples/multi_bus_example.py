@@ -0,0 +1,27 @@
+import time
+from dynamixel_py import DxlComm, Servo, MultiBusGroup
+
+# One DxlComm per U2D2 / USB2Dynamixel adapter
+left_bus = DxlComm(port="/dev/ttyUSB0", baud_rate=1000000)
+right_bus = DxlComm(port="/dev/ttyUSB1", baud_rate=1000000)
+
+# Every servo is bound to the bus it is connected to, ids only need to be unique per bus
+servo1 = Servo(servo_id=1, control_table="XL330", comm=left_bus)
+servo2 = Servo(servo_id=2, control_table="XL330", comm=left_bus)
+servo3 = Servo(servo_id=1, control_table="XL430", comm=right_bus)
+servo4 = Servo(servo_id=2, control_table="XL430", comm=right_bus)
+
+arm = MultiBusGroup()
+arm.add_servos([servo1, servo2, servo3, servo4])
+
+print(f"{arm.get_total_servos()} servos on {arm.get_total_buses()} buses")
+
+arm.sync_torques_enabled(True)
+
+# Both buses are read and written at the same time
+arm.sync_set_positions([180, 180, 180, 180])
+time.sleep(1)
+print(arm.sync_get_positions())
+
+arm.sync_torques_enabled(False)
+arm.close()
@@ -0,0 +1,45 @@
+import pytest
+
+from dynamixel_py import DxlComm, Servo, ServoGroup, SimulatedPortHandler, SimulatedServo
+
+
+@pytest.fixture
+def make_bus():
+    # Builds a simulated bus and a group holding all of its servos, eg: make_bus({1: "XL330"}).
+    # servo_options maps a servo id to extra SimulatedServo arguments like drop_rate.
+    def make_bus(models, protocol_version=2, servo_options=None, baud_rate=57600, **port_options):
+        port_options.setdefault("realtime", False)
+        port = SimulatedPortHandler(**port_options)
+        for dxl_id, model in models.items():
+            options = (servo_options or {}).get(dxl_id, {})
+            port.add_servo(SimulatedServo(dxl_id, model, protocol_version, **options))
+
+        comm = DxlComm(baud_rate=baud_rate, port_handler=port)
+        group = ServoGroup()
+        group.add_servos(
+            [Servo(dxl_id, model, protocol_version, comm=comm) for dxl_id, model in models.items()]
+        )
+        return port, comm, group
+
+    return make_bus
+
+
+@pytest.fixture
+def sim_register():
+    # Value of a register as the simulated servo holds it, without going through the bus
+    def sim_register(port, dxl_id, register):
+        servo = port.servos[dxl_id]
+        reg = servo.control_table.get_register(register)
+        return reg.decode(servo.read_register(reg.address, reg.size))
+
+    return sim_register
+
+
+@pytest.fixture
+def set_sim_register():
+    def set_sim_register(port, dxl_id, register, value):
+        servo = port.servos[dxl_id]
+        reg = servo.control_table.get_register(register)
+        servo.write_register(reg.address, reg.encode(value))
+
+    return set_sim_register
@@ -0,0 +1,45 @@
+import pytest
+
+from dynamixel_py import tune_bus
+
+
+def test_tune_bus_stops_below_first_unreliable_baud_rate(make_bus, tmp_path):
+    # Status packets are lost above 1 Mbps, like on a cable too long for faster baud rates
+    port, comm, _ = make_bus(
+        {1: "XL330", 2: "XL330"},
+        servo_options={1: {"baud_rate": 57600}, 2: {"baud_rate": 57600}},
+        max_baud_rate=1000000,
+    )
+
+    report = tune_bus(
+        comm,
+        servo_ids=range(1, 4),
+        verify_reads=10,
+        measure_cycles=5,
+        cache_path=str(tmp_path / "bus_cache.json"),
+    )
+
+    assert report.servo_ids == [1, 2]
+    assert report.baud_rate_before == 57600
+    assert report.baud_rate_after == 1000000
+    assert comm.baud_rate == 1000000
+    assert [servo.baud_rate for servo in port.servos.values()] == [1000000, 1000000]
+    assert [servo.return_delay for servo in port.servos.values()] == [0.0, 0.0]
+    # The simulated port has no latency timer
+    assert report.latency_timer_after is None
+
+
+def test_tune_bus_needs_torque_disabled(make_bus, tmp_path):
+    port, comm, group = make_bus({1: "XL330", 2: "XL330"})
+    group.servos[2].torque_enabled(True)
+
+    with pytest.raises(RuntimeError, match="Disable the torque"):
+        tune_bus(comm, servo_ids=[1, 2], cache_path=str(tmp_path / "bus_cache.json"))
+    assert comm.baud_rate == 57600
+
+
+def test_tune_bus_without_servos(make_bus, tmp_path):
+    _, comm, _ = make_bus({1: "XL330"})
+
+    with pytest.raises(RuntimeError, match="No servos found"):
+        tune_bus(comm, servo_ids=[5, 6], cache_path=str(tmp_path / "bus_cache.json"))
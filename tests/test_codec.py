@@ -0,0 +1,109 @@
+import pytest
+from dynamixel_sdk import Protocol2PacketHandler
+
+from dynamixel_py import SimulatedPortHandler, SimulatedServo
+from dynamixel_py.codec import FastProtocol2PacketHandler, crc16
+
+
+class RecordingPortHandler(SimulatedPortHandler):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.packets = []
+
+    def writePort(self, packet):
+        self.packets.append(bytes(packet))
+        return super().writePort(packet)
+
+
+@pytest.fixture
+def port():
+    port = RecordingPortHandler(realtime=False)
+    port.add_servos([SimulatedServo(dxl_id, "XL330", 2) for dxl_id in (1, 2)])
+    port.openPort()
+    return port
+
+
+def _sent(port, handler, send):
+    port.packets.clear()
+    send(handler)
+    port.is_using = False
+    port.clearPort()
+    return port.packets
+
+
+# Every packet the codec builds, none of them needs byte stuffing
+TX_PACKETS = {
+    "read": lambda handler, port: handler.readTxRx(port, 1, 132, 4),
+    "write": lambda handler, port: handler.writeTxRx(port, 1, 112, 4, [100, 0, 0, 0]),
+    "write_only": lambda handler, port: handler.writeTxOnly(port, 2, 65, 1, [1]),
+    "sync_read": lambda handler, port: handler.syncReadTx(port, 132, 4, [1, 2], 2, False),
+    "fast_sync_read": lambda handler, port: handler.syncReadTx(port, 132, 4, [1, 2], 2, True),
+    "sync_write": lambda handler, port: handler.syncWriteTxOnly(
+        port, 112, 4, [1, 10, 0, 0, 0, 2, 20, 1, 0, 0], 10
+    ),
+    "bulk_read": lambda handler, port: handler.bulkReadTx(
+        port, [1, 132, 0, 4, 0, 2, 146, 0, 1, 0], 10, False
+    ),
+    "fast_bulk_read": lambda handler, port: handler.bulkReadTx(
+        port, [1, 132, 0, 4, 0, 2, 146, 0, 1, 0], 10, True
+    ),
+    "bulk_write": lambda handler, port: handler.bulkWriteTxOnly(
+        port, [1, 112, 0, 4, 0, 30, 0, 0, 0, 2, 65, 0, 1, 0, 1], 15
+    ),
+}
+
+
+@pytest.mark.parametrize("name", TX_PACKETS)
+def test_packets_match_the_sdk(port, name):
+    send = TX_PACKETS[name]
+    sdk_packets = _sent(port, Protocol2PacketHandler(), lambda handler: send(handler, port))
+    codec_packets = _sent(port, FastProtocol2PacketHandler(), lambda handler: send(handler, port))
+    assert codec_packets == sdk_packets
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        bytes([0x00, 0x08, 0x00, 0x00]),
+        # Sent back byte stuffed by the servo
+        bytes([0xFF, 0xFF, 0xFD, 0x00]),
+    ],
+)
+def test_status_packets_match_the_sdk(port, value):
+    port.servos[1].write_register(132, value)
+
+    sdk_data, sdk_result, sdk_error = Protocol2PacketHandler().readTxRx(port, 1, 132, 4)
+    data, result, error = FastProtocol2PacketHandler().readTxRx(port, 1, 132, 4)
+    assert (bytes(data), result, error) == (bytes(sdk_data), sdk_result, sdk_error)
+    assert bytes(data) == value
+
+
+@pytest.mark.parametrize("fast_option", [False, True])
+def test_sync_read_status_packets_match_the_sdk(port, fast_option):
+    port.servos[2].write_register(132, bytes([0x10, 0x20, 0x30, 0x40]))
+
+    responses = []
+    for handler in (Protocol2PacketHandler(), FastProtocol2PacketHandler()):
+        handler.syncReadTx(port, 132, 4, [1, 2], 2, fast_option)
+        packets = [handler.rxPacket(port, fast_option) for _ in range(1 if fast_option else 2)]
+        responses.append([(list(packet), result) for packet, result in packets])
+    assert responses[1] == responses[0]
+
+
+def test_crc_matches_the_sdk():
+    handler = Protocol2PacketHandler()
+    data = list(range(256)) * 3
+    assert crc16(data) == handler.updateCRC(0, data, len(data))
+    assert crc16(bytes(data[10:]), 1234) == handler.updateCRC(1234, data[10:], len(data) - 10)
+
+
+def test_parameters_holding_a_header_are_byte_stuffed(port):
+    # The SDK sends these unstuffed, the servo would take FF FF FD for the start of a new packet
+    value = [0xFF, 0xFF, 0xFD, 0x00]
+    packets = _sent(
+        port,
+        FastProtocol2PacketHandler(),
+        lambda handler: handler.writeTxRx(port, 1, 112, 4, value),
+    )
+    assert b"\xff\xff\xfd\xfd\x00" in packets[0]
+    assert port.servos[1].read_register(112, 4) == bytes(value)
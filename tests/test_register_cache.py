@@ -0,0 +1,81 @@
+def test_servo_skips_unchanged_writes(make_bus, sim_register):
+    port, _, group = make_bus({1: "XL330"})
+    servo = group.servos[1]
+    servo.enable_cache()
+
+    packets = port.packets_written
+    servo.write_register("PROFILE_VELOCITY", 100)
+    servo.write_register("PROFILE_VELOCITY", 100)
+    assert port.packets_written - packets == 1
+    assert servo.cache.suppressed_writes == 1
+
+    servo.write_register("PROFILE_VELOCITY", 101)
+    assert sim_register(port, 1, "PROFILE_VELOCITY") == 101
+
+    # Served from the cache without a transaction
+    packets = port.packets_written
+    assert servo.read_register("PROFILE_VELOCITY") == 101
+    assert port.packets_written == packets
+
+
+def test_registers_changed_by_the_firmware_are_always_written(make_bus):
+    port, _, group = make_bus({1: "XL330"})
+    servo = group.servos[1]
+    servo.enable_cache()
+
+    packets = port.packets_written
+    servo.write_register("TORQUE_ENABLE", 1)
+    servo.write_register("TORQUE_ENABLE", 1)
+    servo.write_register("LED", 1)
+    servo.write_register("LED", 1)
+    assert port.packets_written - packets == 4
+
+
+def test_group_sync_write_only_sends_changed_servos(make_bus, sim_register):
+    port, _, group = make_bus({1: "XL330", 2: "XL330"})
+    group.enable_cache()
+
+    group.sync_write("PROFILE_VELOCITY", [10, 20])
+    packets = port.packets_written
+    group.sync_write("PROFILE_VELOCITY", [10, 20])
+    assert port.packets_written == packets
+
+    # Servo 2 changes and servo 1 does not, only servo 2 is in the packet
+    port.servos[1].write_register(
+        port.servos[1].control_table.ADDR_PROFILE_VELOCITY, (99).to_bytes(4, "little")
+    )
+    group.sync_write("PROFILE_VELOCITY", [10, 30])
+    assert port.packets_written - packets == 1
+    assert sim_register(port, 1, "PROFILE_VELOCITY") == 99
+    assert sim_register(port, 2, "PROFILE_VELOCITY") == 30
+
+
+def test_group_bulk_write_only_sends_changed_servos(make_bus):
+    port, _, group = make_bus({1: "XL330", 2: "XL430"})
+    group.enable_cache()
+
+    group.bulk_write("PROFILE_VELOCITY", [10, 20])
+    packets = port.packets_written
+    group.bulk_write("PROFILE_VELOCITY", [10, 20])
+    assert port.packets_written == packets
+    assert group.bulk_read("PROFILE_VELOCITY") == [10, 20]
+    assert port.packets_written == packets
+
+
+def test_staged_registers_are_not_served_from_the_cache(make_bus):
+    port, _, group = make_bus({1: "XL330"})
+    servo = group.servos[1]
+    servo.enable_cache()
+
+    servo.write_register("PROFILE_VELOCITY", 10)
+    servo.stage_register("PROFILE_VELOCITY", 20)
+    assert servo.read_register("PROFILE_VELOCITY") == 10
+
+    servo.action()
+    packets = port.packets_written
+    assert servo.read_register("PROFILE_VELOCITY") == 20
+    assert port.packets_written - packets == 1
+
+    # Once read back, the value is cached again
+    servo.write_register("PROFILE_VELOCITY", 20)
+    assert servo.cache.suppressed_writes == 1
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from dynamixel_py import ResilientReader
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(0)
+
+
+@pytest.mark.parametrize("protocol_version, model", [(2, "XL330"), (1, "AX12")])
+def test_retries_recover_lost_status_packets(make_bus, protocol_version, model):
+    _, _, group = make_bus(
+        {1: model, 2: model},
+        protocol_version=protocol_version,
+        servo_options={2: {"drop_rate": 0.3}},
+    )
+    reader = ResilientReader(group, max_retries=2)
+
+    reads = [reader.read() for _ in range(200)]
+    assert sum(read.valid[1] for read in reads) / len(reads) > 0.9
+    assert all(read.valid[0] for read in reads)
+    assert reader.retries > 0
+    # Reads recovered by a retry do not count as failures
+    assert reader.get_quarantined() == []
+
+
+def test_dead_servo_is_quarantined_and_released(make_bus):
+    port, _, group = make_bus(
+        {1: "XL330", 2: "XL330", 3: "XL330"}, servo_options={3: {"drop_rate": 1.0}}
+    )
+    reader = ResilientReader(group, min_samples=5, probe_interval=0.0)
+
+    for _ in range(5):
+        read = reader.read()
+    assert reader.get_quarantined() == [3]
+    assert read.values[:2] == [2048, 2048]
+    assert read.values[2] is None
+    assert read.valid == [True, True, False]
+    assert not read.is_complete()
+
+    # Quarantined servos are not retried
+    assert reader.read().attempts == 1
+
+    port.servos[3].drop_rate = 0.0
+    read = reader.read()
+    assert read.is_complete()
+    assert reader.get_quarantined() == []
+
+
+def test_quarantined_servo_is_only_probed_every_probe_interval(make_bus):
+    port, _, group = make_bus({1: "XL330", 2: "XL330"}, servo_options={2: {"drop_rate": 1.0}})
+    reader = ResilientReader(group, min_samples=5, probe_interval=60.0)
+
+    for _ in range(5):
+        reader.read()
+    assert reader.get_quarantined() == [2]
+
+    port.servos[2].drop_rate = 0.0
+    packets = port.packets_written
+    assert reader.read().valid == [True, False]
+    assert port.packets_written - packets == 1
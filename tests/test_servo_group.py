@@ -0,0 +1,190 @@
+import pytest
+
+from dynamixel_py.servo_group import FAST_READ_MAX_FAILURES
+
+
+def test_sync_set_and_get_positions(make_bus, sim_register):
+    port, _, group = make_bus({1: "XL330", 2: "XL330", 3: "XL330"})
+    group.sync_torques_enabled(True)
+
+    group.sync_set_positions([90.0, -90.0, 45.0])
+    assert [sim_register(port, dxl_id, "GOAL_POSITION") for dxl_id in (1, 2, 3)] == [
+        1024,
+        -1024,
+        512,
+    ]
+
+    packets = port.packets_written
+    assert group.sync_get_positions() == [90.0, -90.0, 45.0]
+    assert port.packets_written - packets == 1
+
+
+def test_sync_write_multiple_registers_in_one_packet(make_bus, sim_register):
+    port, _, group = make_bus({1: "XL330", 2: "XL330"})
+
+    packets = port.packets_written
+    group.sync_write(["PROFILE_ACCELERATION", "PROFILE_VELOCITY"], [[10, 100], [20, 200]])
+    assert port.packets_written - packets == 1
+
+    assert sim_register(port, 1, "PROFILE_ACCELERATION") == 10
+    assert sim_register(port, 1, "PROFILE_VELOCITY") == 100
+    assert sim_register(port, 2, "PROFILE_ACCELERATION") == 20
+    assert sim_register(port, 2, "PROFILE_VELOCITY") == 200
+
+
+def test_sync_write_rejects_non_contiguous_registers(make_bus):
+    _, _, group = make_bus({1: "XL330"})
+    with pytest.raises(ValueError):
+        group.sync_write(["PROFILE_VELOCITY", "GOAL_PWM"], [[1, 2]])
+
+
+def test_bulk_write_and_read_mixed_models(make_bus, sim_register):
+    port, _, group = make_bus({1: "XL330", 2: "XL430"})
+
+    group.bulk_write(["PROFILE_VELOCITY", "GOAL_PWM"], [50, 300])
+    assert sim_register(port, 1, "PROFILE_VELOCITY") == 50
+    assert sim_register(port, 2, "GOAL_PWM") == 300
+
+    packets = port.packets_written
+    assert group.bulk_read(["PROFILE_VELOCITY", "GOAL_PWM"]) == [50, 300]
+    # The simulated servos start at their middle position
+    assert group.bulk_get_positions() == [180.0, 180.0]
+    assert port.packets_written - packets == 2
+
+
+def test_protocol1_sync_write_and_read(make_bus, sim_register):
+    port, _, group = make_bus({1: "AX12", 2: "AX12"}, protocol_version=1)
+    group.sync_torques_enabled(True)
+
+    group.sync_set_positions([90.0, 45.0])
+    assert [sim_register(port, dxl_id, "GOAL_POSITION") for dxl_id in (1, 2)] == [256, 128]
+
+    # AX servos do not answer Bulk Read, every servo is read on its own
+    packets = port.packets_written
+    assert group.sync_get_positions()[0] == 90.0
+    assert port.packets_written - packets == 2
+
+
+def test_protocol1_bulk_read_and_write(make_bus, sim_register):
+    port, _, group = make_bus({1: "MX12", 2: "MX12"}, protocol_version=1)
+
+    # Servos writing different registers get one sync write per register
+    group.bulk_write(["MOVING_SPEED", "TORQUE_LIMIT"], [100, 500])
+    assert sim_register(port, 1, "MOVING_SPEED") == 100
+    assert sim_register(port, 2, "TORQUE_LIMIT") == 500
+
+    # MX servos answer a single Bulk Read
+    packets = port.packets_written
+    assert group.bulk_read(["MOVING_SPEED", "TORQUE_LIMIT"]) == [100, 500]
+    assert port.packets_written - packets == 1
+
+
+@pytest.mark.parametrize(
+    "write",
+    [
+        lambda group: group.sync_write("PRESENT_POSITION", [0, 0]),
+        lambda group: group.bulk_write(["GOAL_POSITION", "PRESENT_TEMPERATURE"], [0, 0]),
+        lambda group: group.stage_write("PRESENT_POSITION", [0, 0]),
+    ],
+)
+def test_group_writes_reject_read_only_registers(make_bus, write):
+    port, _, group = make_bus({1: "XL330", 2: "XL330"})
+
+    packets = port.packets_written
+    with pytest.raises(ValueError, match="read only"):
+        write(group)
+    assert port.packets_written == packets
+
+
+@pytest.mark.parametrize("goal", [float("nan"), float("inf"), 1e12])
+def test_sync_set_positions_rejects_invalid_goals(make_bus, goal):
+    port, _, group = make_bus({1: "XL330", 2: "XL330"})
+
+    packets = port.packets_written
+    with pytest.raises(ValueError):
+        group.sync_set_positions([0.0, goal])
+    assert port.packets_written == packets
+
+
+def test_fast_sync_read(make_bus):
+    port, _, group = make_bus({1: "XL330", 2: "XL330"})
+    group.sync_torques_enabled(True)
+    group.sync_set_positions([90.0, -90.0])
+
+    packets = port.packets_written
+    assert group.sync_get_positions(fast=True) == [90.0, -90.0]
+    assert group.bulk_get_positions(fast=True) == [90.0, -90.0]
+    assert port.packets_written - packets == 2
+
+
+def test_fast_sync_read_falls_back_on_old_firmware(make_bus):
+    # The simulated servos ignore fast reads below firmware 45, like the real ones
+    port, _, group = make_bus(
+        {1: "XL330", 2: "XL330"}, servo_options={2: {"firmware_version": 40}}
+    )
+
+    # Every failed fast read is followed by a normal one
+    for _ in range(FAST_READ_MAX_FAILURES):
+        packets = port.packets_written
+        assert group.sync_get_positions(fast=True) == [180.0, 180.0]
+        assert port.packets_written - packets == 2
+
+    packets = port.packets_written
+    assert group.sync_get_positions(fast=True) == [180.0, 180.0]
+    assert port.packets_written - packets == 1
+
+
+@pytest.mark.parametrize("model", ["XL330", "XC330", "XL430"])
+def test_indirect_mapping(make_bus, set_sim_register, model):
+    port, _, group = make_bus({1: model, 2: model})
+    registers = ["PRESENT_POSITION", "PRESENT_VELOCITY", "PRESENT_TEMPERATURE"]
+    group.map_indirect_registers(registers)
+
+    for dxl_id in (1, 2):
+        set_sim_register(port, dxl_id, "PRESENT_POSITION", 1000 * dxl_id)
+        set_sim_register(port, dxl_id, "PRESENT_VELOCITY", -5 * dxl_id)
+        set_sim_register(port, dxl_id, "PRESENT_TEMPERATURE", 30 + dxl_id)
+
+    packets = port.packets_written
+    assert group.sync_read_indirect() == [
+        {"PRESENT_POSITION": 1000, "PRESENT_VELOCITY": -5, "PRESENT_TEMPERATURE": 31},
+        {"PRESENT_POSITION": 2000, "PRESENT_VELOCITY": -10, "PRESENT_TEMPERATURE": 32},
+    ]
+    assert port.packets_written - packets == 1
+
+
+def test_indirect_mapping_needs_protocol2(make_bus):
+    _, _, group = make_bus({1: "MX12"}, protocol_version=1)
+    with pytest.raises(RuntimeError):
+        group.map_indirect_registers(["PRESENT_POSITION"])
+
+
+@pytest.mark.parametrize(
+    "protocol_version, model, middle_pos_val",
+    [(2, "XL330", 2048), (1, "AX12", 512)],
+)
+def test_staged_positions_start_on_action(
+    make_bus, sim_register, protocol_version, model, middle_pos_val
+):
+    port, _, group = make_bus({1: model, 2: model}, protocol_version=protocol_version)
+    group.sync_torques_enabled(True)
+
+    group.stage_positions([90.0, 45.0])
+    assert [sim_register(port, dxl_id, "GOAL_POSITION") for dxl_id in (1, 2)] == [0, 0]
+
+    group.action()
+    assert [sim_register(port, dxl_id, "GOAL_POSITION") for dxl_id in (1, 2)] == [
+        middle_pos_val // 2,
+        middle_pos_val // 4,
+    ]
+    assert group.sync_get_positions() == [90.0, 45.0]
+
+
+def test_servo_stage_register_and_action(make_bus, sim_register):
+    port, _, group = make_bus({1: "XL330", 2: "XL330"})
+    servo = group.servos[1]
+
+    servo.stage_register("PROFILE_VELOCITY", 77)
+    assert sim_register(port, 1, "PROFILE_VELOCITY") == 0
+    servo.action()
+    assert sim_register(port, 1, "PROFILE_VELOCITY") == 77
@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+import uuid
+
+import pytest
+
+from dynamixel_py import SharedStateClient, SharedStatePublisher
+
+
+@pytest.fixture
+def publisher(make_bus):
+    _, _, group = make_bus({1: "XL330", 2: "XL330", 3: "XL330"})
+    group.sync_torques_enabled(True)
+    with SharedStatePublisher(group, name=f"dxl_test_{uuid.uuid4().hex[:12]}") as publisher:
+        yield publisher
+
+
+def test_client_gets_published_state(publisher):
+    with SharedStateClient(publisher.name) as client:
+        assert client.servo_ids == [1, 2, 3]
+        assert client.get_state() is None
+
+        sequence = publisher.publish([1.0, 2.0, 3.0], timestamp=12.5)
+        state = client.get_state()
+        assert state.positions == (1.0, 2.0, 3.0)
+        assert state.timestamp == 12.5
+        assert state.sequence == sequence
+
+        publisher.publish([4.0, 5.0, 6.0])
+        assert client.wait_for_state(sequence, timeout=1.0).positions == (4.0, 5.0, 6.0)
+
+
+def test_client_goals_reach_the_servos(publisher):
+    with SharedStateClient(publisher.name) as client:
+        client.set_positions([90.0, -90.0, 45.0])
+        publisher.poll()
+        assert client.get_positions() == (90.0, -90.0, 45.0)
+
+        # Every goal is taken once
+        assert publisher.take_goal_positions() is None
+
+        with pytest.raises(ValueError):
+            client.set_positions([0.0])
+
+
+def test_half_written_command_is_ignored(publisher):
+    with SharedStateClient(publisher.name) as client:
+        client.set_positions([1.0, 2.0, 3.0])
+        assert publisher.take_goal_positions() == [1.0, 2.0, 3.0]
+
+        # A client that died between the two sequence stores leaves the sequence odd
+        client._command._sequence[0] += 1
+        assert publisher.take_goal_positions() is None
+
+        # Only the first read waits for the write to finish
+        start_time = time.perf_counter()
+        assert publisher.take_goal_positions() is None
+        assert time.perf_counter() - start_time < 0.05
+
+
+def _count_torn_reads(name, duration, queue):
+    client = SharedStateClient(name)
+    client.wait_for_state(timeout=5.0)
+
+    reads = torn = 0
+    sequence = 0
+    end_time = time.perf_counter() + duration
+    while time.perf_counter() < end_time:
+        state = client.get_state()
+        reads += 1
+        if len(set(state.positions)) != 1 or state.sequence < sequence:
+            torn += 1
+        sequence = state.sequence
+    client.close()
+    queue.put((reads, torn))
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs the fork start method"
+)
+def test_reads_from_another_process_are_never_torn(publisher):
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    reader = context.Process(target=_count_torn_reads, args=(publisher.name, 0.5, queue))
+    reader.start()
+
+    # Every state holds the same value for all servos, a torn read would mix two of them
+    count = 0
+    while reader.is_alive():
+        count += 1
+        publisher.publish([float(count)] * 3)
+
+    reads, torn = queue.get(timeout=5.0)
+    reader.join()
+    assert reads > 0
+    assert torn == 0